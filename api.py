@@ -1,15 +1,71 @@
-import streamlit as st
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from bot.assistant import TixOBot
-from config import OPENAI_API_KEY, BOT_NAME, BOT_PERSONA, DEFAULT_LANGUAGE
+import bot.assistant as assistant
+from bot.assistant import TixOBot, completion_cache, semantic_cache
+from bot.knowledge_base import find_best_faq_matches
+from bot.llm_dispatcher import PRIORITY_BATCH
+from bot.sessions import SessionConflict, SessionManager
+from utils.logs import configure_logging
+from utils.metrics import REGISTRY
+from config import (
+    BOT_NAME,
+    BOT_PERSONA,
+    DEFAULT_LANGUAGE,
+    SESSION_MAX_SESSIONS,
+    SESSION_TTL_SECONDS,
+    SESSION_DB_PATH,
+    SESSION_PURGE_INTERVAL_SECONDS,
+    SESSION_LEASE_SECONDS,
+    SERVE_MODE,
+    BATCH_MAX_ITEMS,
+    BATCH_MAX_CONCURRENCY,
+    BATCH_FAQ_SCORER,
+    warn_if_unconfigured
+)
+
+# La interfaz de Streamlit vive en main.py y embed_ui.py; este módulo solo sirve la API REST
+logger = logging.getLogger(__name__)
+
+async def purge_sessions_periodically(interval: float) -> None:
+    # La caché de sesiones solo descarta las expiradas al acceder a ellas; esto
+    # libera la memoria y borra las filas vencidas del almacén SQLite
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(sessions.purge_expired)
+            sessions.release_idle_locks()
+        except Exception as e:
+            logger.warning("No se pudieron purgar las sesiones expiradas: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Al arrancar el servidor, no al importar el módulo: importar api no abre el hilo de logs ni avisa por stdout
+    configure_logging()
+    warn_if_unconfigured()
+    # Cliente de OpenAI, despachador, puntuadores de FAQs y notificador de handoff
+    await asyncio.to_thread(assistant.warm_up)
+    purger = None
+    if SESSION_PURGE_INTERVAL_SECONDS > 0:
+        purger = asyncio.create_task(purge_sessions_periodically(SESSION_PURGE_INTERVAL_SECONDS))
+    yield
+    if purger is not None:
+        purger.cancel()
 
 # Initialize FastAPI
 app = FastAPI(
     title="Tix-o-bot API",
     description="API REST sencilla para chatbot para Tix.do",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # FastAPI models
@@ -24,6 +80,12 @@ class ChatResponse(BaseModel):
     language_used: str
     timestamp: str
 
+class BatchChatRequest(BaseModel):
+    items: List[ChatRequest]
+
+class BatchChatResponse(BaseModel):
+    responses: List[ChatResponse]
+
 # Token for simple authentication
 API_TOKEN = "tixdo_secure_token"
 
@@ -32,11 +94,48 @@ async def verify_token(authorization: str = Header(...)):
     if token_type.lower() != "bearer" or token != API_TOKEN:
         raise HTTPException(status_code=403, detail="Invalid or missing token")
 
+def create_bot(user_id: str = "Anónimo") -> TixOBot:
+    return TixOBot(name=BOT_NAME, persona=BOT_PERSONA, default_language=DEFAULT_LANGUAGE, user_id=user_id)
+
+# Sesiones por usuario: el estado de la conversación se conserva entre peticiones
+sessions = SessionManager(
+    factory=create_bot,
+    max_sessions=SESSION_MAX_SESSIONS,
+    ttl=SESSION_TTL_SECONDS,
+    db_path=SESSION_DB_PATH or None,
+    # Con varios workers (serve.py) las sesiones viven en un SQLite compartido
+    shared=SERVE_MODE == "shared",
+    lease_ttl=SESSION_LEASE_SECONDS
+)
+
+@asynccontextmanager
+async def chat_session(user_id: str = None) -> AsyncIterator[TixOBot]:
+    if not user_id:
+        # Sin user_id no hay sesión que conservar
+        yield create_bot()
+        return
+    async with sessions.lock(user_id):
+        # En modo compartido el candado solo vale para este worker: se reclama también en el almacén
+        try:
+            owner = await sessions.claim(user_id)
+        except SessionConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        try:
+            # get/save leen y escriben SQLite: fuera del event loop
+            bot = await asyncio.to_thread(sessions.get, user_id)
+            yield bot
+            try:
+                await asyncio.to_thread(sessions.save, user_id, bot)
+            except SessionConflict as e:
+                raise HTTPException(status_code=409, detail=str(e))
+        finally:
+            await asyncio.to_thread(sessions.release, user_id, owner)
+
 @app.post("/api/chat", response_model=ChatResponse, dependencies=[Depends(verify_token)])
 async def chat_endpoint(chat_request: ChatRequest):
     selected_lang = chat_request.language
-    bot = TixOBot(name=BOT_NAME, persona=BOT_PERSONA, default_language=DEFAULT_LANGUAGE)
-    response = bot.get_response(chat_request.message, language=selected_lang)
+    async with chat_session(chat_request.user_id) as bot:
+        response = await bot.async_get_response(chat_request.message, language=selected_lang)
 
     return ChatResponse(
         response=response,
@@ -45,75 +144,111 @@ async def chat_endpoint(chat_request: ChatRequest):
         timestamp=datetime.utcnow().isoformat() + "Z"
     )
 
-# Streamlit UI starts here
-if not OPENAI_API_KEY:
-    st.error("⚠️ No se ha configurado la API key de OpenAI. Por favor, configura la variable OPENAI_API_KEY en el archivo .env")
-    st.stop()
-
-st.set_page_config(
-    page_title=f"{BOT_NAME} | Asistente Virtual de Tix.do",
-    page_icon="🎫",
-    layout="centered"
-)
-
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-    st.session_state.welcome_shown = False
-
-if "bot" not in st.session_state:
-    st.session_state.bot = TixOBot(
-        name=BOT_NAME,
-        persona=BOT_PERSONA,
-        default_language=DEFAULT_LANGUAGE
+async def prefetch_faq_matches(items: List[ChatRequest]) -> List[Optional[Tuple[Optional[str], float]]]:
+    # Un solo lote de búsqueda de FAQs por idioma
+    results: List[Optional[Tuple[Optional[str], float]]] = [None] * len(items)
+    by_language: Dict[str, List[int]] = {}
+    for i, item in enumerate(items):
+        by_language.setdefault(item.language, []).append(i)
+    for language, indexes in by_language.items():
+        matches = await asyncio.to_thread(
+            find_best_faq_matches, [items[i].message for i in indexes], language, BATCH_FAQ_SCORER or None
+        )
+        for i, match in zip(indexes, matches):
+            results[i] = match
+    return results
+
+@app.post("/api/chat/batch", response_model=BatchChatResponse, dependencies=[Depends(verify_token)])
+async def chat_batch_endpoint(batch: BatchChatRequest):
+    items = batch.items
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)")
+
+    faq_results = await prefetch_faq_matches(items)
+
+    # Los mensajes de un mismo usuario se procesan en orden; usuarios distintos en paralelo
+    groups: Dict[str, List[int]] = {}
+    for i, item in enumerate(items):
+        groups.setdefault(item.user_id or f"__anonymous_{i}", []).append(i)
+
+    responses: List[Optional[str]] = [None] * len(items)
+    llm_semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+    async def run_group(indexes: List[int]):
+        async with chat_session(items[indexes[0]].user_id) as bot:
+            for i in indexes:
+                responses[i] = await bot.async_get_response(
+                    items[i].message,
+                    language=items[i].language,
+                    faq_result=faq_results[i],
+                    llm_semaphore=llm_semaphore,
+                    # Los lotes ceden el turno a las conversaciones en vivo
+                    priority=PRIORITY_BATCH
+                )
+
+    await asyncio.gather(*(run_group(indexes) for indexes in groups.values()))
+
+    timestamp = datetime.utcnow().isoformat() + "Z"
+    return BatchChatResponse(responses=[
+        ChatResponse(response=response, bot_name=BOT_NAME, language_used=item.language, timestamp=timestamp)
+        for item, response in zip(items, responses)
+    ])
+
+def sse_event(data: dict, event: str = None) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n" if event else f"data: {payload}\n\n"
+
+async def chat_stream_events(chat_request: ChatRequest) -> AsyncIterator[str]:
+    started = time.perf_counter()
+    first_token_ms = None
+    async with chat_session(chat_request.user_id) as bot:
+        async for delta in bot.astream_response(chat_request.message, language=chat_request.language):
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - started) * 1000
+            yield sse_event({"delta": delta})
+    yield sse_event({
+        "bot_name": BOT_NAME,
+        "language_used": chat_request.language,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "time_to_first_token_ms": first_token_ms
+    }, event="done")
+
+@app.post("/api/chat/stream", dependencies=[Depends(verify_token)])
+async def chat_stream_endpoint(chat_request: ChatRequest):
+    # Server-Sent Events: un evento "data" por fragmento y un evento "done" final
+    return StreamingResponse(
+        chat_stream_events(chat_request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
-st.title(f"🎫 {BOT_NAME}")
-st.caption("Asistente virtual de Tix.do - Tu acompañante para eventos")
-
-if not st.session_state.messages and not st.session_state.welcome_shown:
-    welcome_message = st.session_state.bot.get_welcome_message()
-    st.session_state.messages.append({"role": "assistant", "content": welcome_message})
-    st.session_state.welcome_shown = True
-
-for message in st.session_state.messages:
-    avatar = "👤" if message["role"] == "user" else "🤖"
-    alignment = "flex-end" if message["role"] == "user" else "flex-start"
-    bg_color = "#c0c9cd" if message["role"] == "user" else "#000000"
-    with st.container():
-        st.markdown(f"""
-        <div class="message-container" style="justify-content: {alignment};">
-            <div class="message-content" style="background-color: {bg_color};">{message["content"]}</div>
-            <div class="{'user-avatar' if avatar == '👤' else 'bot-avatar'}">{avatar}</div>
-        </div>
-        """, unsafe_allow_html=True)
-
-def submit_message():
-    user_message = st.session_state.user_input
-    if user_message.strip():
-        st.session_state.messages.append({"role": "user", "content": user_message})
-        selected_lang = "es" if st.session_state.language == "Español" else "en"
-        bot_response = st.session_state.bot.get_response(user_message, language=selected_lang)
-        st.session_state.messages.append({"role": "assistant", "content": bot_response})
-
-with st.form(key="message_form", clear_on_submit=True):
-    st.text_input("Escribe tu pregunta aquí:", key="user_input")
-    col1, col2 = st.columns([4, 1])
-    with col1:
-        st.form_submit_button(label="Enviar", on_click=submit_message)
-    with col2:
-        if st.form_submit_button(label="Limpiar"):
-            st.session_state.messages = []
-            st.session_state.welcome_shown = False
-
-with st.sidebar:
-    selected_language = st.selectbox("Idioma / Language", ["Español", "English"], index=0 if DEFAULT_LANGUAGE == "es" else 1)
-    st.session_state.language = selected_language
-    st.subheader("Sobre Tix-o-bot")
-    st.write("Asistente virtual para Tix.do, la plataforma líder de eventos en República Dominicana.")
-    st.divider()
-    st.caption(f"© {datetime.now().year} Tix.do")
-    st.caption("Desarrollado por Ean Jimenez")
-    st.divider()
-    if st.button("Reiniciar conversación"):
-        st.session_state.messages = []
-        st.session_state.welcome_shown = False
+@app.get("/api/sessions/stats", dependencies=[Depends(verify_token)])
+async def sessions_stats_endpoint():
+    # Con varios workers cada uno informa de sus propias sesiones en memoria
+    return {**sessions.stats(), "worker_pid": os.getpid()}
+
+# Estado de sesiones y cachés, actualizado en cada lectura de /metrics
+SESSIONS_ACTIVE = REGISTRY.gauge("tixobot_sessions_active", "Sesiones en memoria")
+SESSIONS_MEMORY = REGISTRY.gauge("tixobot_sessions_memory_bytes", "Memoria aproximada de las sesiones en bytes")
+CACHE_ENTRIES = REGISTRY.gauge("tixobot_cache_entries", "Entradas en cada caché", ["cache"])
+CACHE_LOOKUPS = REGISTRY.gauge("tixobot_cache_lookups", "Búsquedas en cada caché por resultado", ["cache", "result"])
+LLM_QUEUED = REGISTRY.gauge("tixobot_llm_queued", "Peticiones al modelo esperando en el despachador")
+
+def update_state_metrics() -> None:
+    session_stats = sessions.stats()
+    SESSIONS_ACTIVE.set(session_stats["size"])
+    SESSIONS_MEMORY.set(session_stats["memory_bytes"])
+    caches = [("completion", completion_cache.stats())]
+    if semantic_cache is not None:
+        caches.append(("semantic", semantic_cache.stats()))
+    for name, stats in caches:
+        CACHE_ENTRIES.set(stats["size"], cache=name)
+        CACHE_LOOKUPS.set(stats["hits"], cache=name, result="hit")
+        CACHE_LOOKUPS.set(stats["misses"], cache=name, result="miss")
+    LLM_QUEUED.set(assistant.dispatcher.stats()["queued"])
+
+@app.get("/metrics", dependencies=[Depends(verify_token)])
+async def metrics_endpoint():
+    # Formato de texto de Prometheus
+    update_state_metrics()
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
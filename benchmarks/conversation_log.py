@@ -0,0 +1,124 @@
+"""
+Registro de conversaciones: volcado completo del JSON frente al registro de anexado.
+
+Simula varias sesiones que guardan su conversación después de cada mensaje:
+
+- volcado: el esquema anterior (save_conversation_log), que reescribía la
+  conversación entera como JSON indentado en cada mensaje y la leía entera
+  con json.load.
+- registro: utils.conversation_log.ConversationLog, que encola el mensaje y
+  lo escribe un hilo en segundo plano en un JSONL rotado y comprimido; la
+  lectura recorre los segmentos sin cargarlos enteros.
+
+El informe muestra el costo por mensaje en el hilo que atiende al usuario,
+el tiempo hasta tenerlo todo en disco, los bytes escritos y la memoria pico
+de la lectura.
+
+Uso:
+    python -m benchmarks.conversation_log [--sessions N] [--messages N] [--max-bytes B]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from benchmarks.replay import percentiles
+from utils.conversation_log import ConversationLog, log_segments, read_log, summarize
+
+
+def _message(session: int, turn: int) -> Dict[str, Any]:
+    role = "user" if turn % 2 == 0 else "assistant"
+    return {"conversation_id": f"sesion-{session}", "language": "es", "role": role,
+            "content": f"Mensaje {turn} de la sesión {session}: ¿dónde compro boletos para el evento?"}
+
+
+def _written_bytes(paths: List[str]) -> int:
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def run_dump(directory: str, sessions: int, messages: int) -> Dict[str, Any]:
+    """Esquema anterior: un archivo JSON por sesión reescrito en cada mensaje."""
+    latencies: List[float] = []
+    conversations: Dict[int, List[Dict[str, Any]]] = {i: [] for i in range(sessions)}
+    written = 0
+    started = time.perf_counter()
+    for turn in range(messages):
+        for session in range(sessions):
+            conversations[session].append({"ts": time.time(), **_message(session, turn)})
+            path = os.path.join(directory, f"sesion-{session}.json")
+            start = time.perf_counter()
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(conversations[session], f, ensure_ascii=False, indent=2)
+            latencies.append(time.perf_counter() - start)
+            written += os.path.getsize(path)
+    elapsed = time.perf_counter() - started
+    paths = [os.path.join(directory, f"sesion-{i}.json") for i in range(sessions)]
+
+    tracemalloc.start()
+    read_started = time.perf_counter()
+    count = 0
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            count += len(json.load(f))
+    read_seconds = time.perf_counter() - read_started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"latency": percentiles(latencies), "elapsed": elapsed, "written": written,
+            "on_disk": _written_bytes(paths), "read_seconds": read_seconds, "read_peak": peak, "read": count}
+
+
+def run_log(directory: str, sessions: int, messages: int, max_bytes: int) -> Dict[str, Any]:
+    """Registro de anexado con hilo escritor, rotación y compresión."""
+    path = os.path.join(directory, "conversations.jsonl")
+    log = ConversationLog(path, max_bytes=max_bytes)
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for turn in range(messages):
+        for session in range(sessions):
+            start = time.perf_counter()
+            log.append(_message(session, turn))
+            latencies.append(time.perf_counter() - start)
+    log.flush()
+    elapsed = time.perf_counter() - started
+    log.close()
+
+    tracemalloc.start()
+    read_started = time.perf_counter()
+    stats = summarize(read_log(path))
+    read_seconds = time.perf_counter() - read_started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    segments = log_segments(path)
+    return {"latency": percentiles(latencies), "elapsed": elapsed, "written": log.stats()["bytes"],
+            "on_disk": _written_bytes(segments), "segments": len(segments), "read_seconds": read_seconds,
+            "read_peak": peak, "read": stats["messages"]}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Volcado completo frente a registro de anexado")
+    parser.add_argument("--sessions", type=int, default=50, help="Sesiones simultáneas")
+    parser.add_argument("--messages", type=int, default=200, help="Mensajes por sesión")
+    parser.add_argument("--max-bytes", type=int, default=1024 * 1024, help="Tamaño de rotación del registro")
+    args = parser.parse_args(argv)
+
+    total = args.sessions * args.messages
+    print(f"{args.sessions} sesiones × {args.messages} mensajes = {total} mensajes")
+    with tempfile.TemporaryDirectory() as dump_dir, tempfile.TemporaryDirectory() as log_dir:
+        dump = run_dump(dump_dir, args.sessions, args.messages)
+        log = run_log(log_dir, args.sessions, args.messages, args.max_bytes)
+
+    print(f"{'Esquema':<10} {'p50 µs':>8} {'p99 µs':>8} {'Total s':>8} {'Escrito MB':>11} {'En disco MB':>11} "
+          f"{'Lectura s':>10} {'Pico lectura MB':>16}")
+    for name, report in (("volcado", dump), ("registro", log)):
+        print(f"{name:<10} {report['latency']['p50'] * 1000:>8.1f} {report['latency']['p99'] * 1000:>8.1f} "
+              f"{report['elapsed']:>8.2f} {report['written'] / 1e6:>11.1f} {report['on_disk'] / 1e6:>11.2f} "
+              f"{report['read_seconds']:>10.2f} {report['read_peak'] / 1e6:>16.2f}")
+    print(f"\nEl registro quedó en {log['segments']} archivos (gzip salvo el activo); "
+          f"mensajes leídos: volcado {dump['read']}, registro {log['read']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Latencia de cola del bot con el modelo degradado, con y sin plazo de respuesta.
+
+Lanza el servidor simulado de OpenAI (benchmarks/fake_openai_server.py) con
+una fracción de respuestas muy lentas y reproduce la transcripción con
+TixOBot.get_response usando el SDK real, en varias conversaciones a la vez.
+Cada configuración usa un despachador y cachés nuevos (la caché de
+respuestas está apagada para que todas las preguntas lleguen al modelo).
+
+- sin plazo: se espera al modelo lo que tarde.
+- plazo: RESPONSE_DEADLINE_SECONDS; al vencer se cancela la llamada y se
+  responde con la mejor FAQ por debajo del umbral o el mensaje de respaldo.
+- plazo + cobertura: además, LLM_HEDGE_PERCENTILE lanza una segunda
+  petición si la primera tarda más que ese percentil de las recientes.
+
+Uso:
+    python -m benchmarks.deadline [transcripcion.jsonl] [--repeat N] [--concurrency N]
+        [--latency S] [--slow-rate P] [--slow-latency S] [--deadline S] [--hedge-percentile Q]
+"""
+import argparse
+import contextlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import bot.assistant as assistant
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.replay import DEFAULT_TRANSCRIPT, _delta, answered_by, load_conversations, percentiles, quiet_logs
+from benchmarks.scaling import free_port
+from bot.completion_cache import CompletionCache
+from bot.llm_dispatcher import LLMDispatcher
+from config import BOT_NAME, BOT_PERSONA, DEFAULT_LANGUAGE
+
+API_KEY = "sk-local-fake-key"
+
+
+@contextlib.contextmanager
+def configured(base_url: str, deadline: float, hedge_percentile: float) -> Iterator[LLMDispatcher]:
+    """
+    Apunta bot.assistant al servidor simulado con el plazo y la cobertura indicados.
+
+    Yields:
+        Despachador nuevo instalado en bot.assistant
+    """
+    from openai import AsyncOpenAI
+
+    dispatcher = LLMDispatcher(
+        client_factory=lambda: AsyncOpenAI(api_key=API_KEY, base_url=base_url, max_retries=0),
+        max_concurrency=assistant.dispatcher.max_concurrency,
+    )
+    replacements = {
+        "OPENAI_API_KEY": API_KEY,
+        "dispatcher": dispatcher,
+        "completion_cache": CompletionCache(mode="off"),
+        "semantic_cache": None,
+        "RESPONSE_DEADLINE_SECONDS": deadline,
+        "LLM_HEDGE_PERCENTILE": hedge_percentile,
+    }
+    saved = {name: getattr(assistant, name) for name in replacements}
+    for name, value in replacements.items():
+        setattr(assistant, name, value)
+    try:
+        yield dispatcher
+    finally:
+        dispatcher.stop()
+        for name, value in saved.items():
+            setattr(assistant, name, value)
+
+
+def replay(conversations: List[Tuple[str, List[Dict[str, str]]]], concurrency: int) -> List[float]:
+    """
+    Reproduce las conversaciones (cada una en orden, varias a la vez).
+
+    Returns:
+        Latencia de cada mensaje en segundos
+    """
+    def run(conversation: Tuple[str, List[Dict[str, str]]]) -> List[float]:
+        conversation_id, messages = conversation
+        bot = assistant.TixOBot(name=BOT_NAME, persona=BOT_PERSONA,
+                                default_language=DEFAULT_LANGUAGE, user_id=conversation_id)
+        latencies = []
+        for record in messages:
+            started = time.perf_counter()
+            bot.get_response(record["content"], record.get("language", DEFAULT_LANGUAGE))
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return [latency for latencies in pool.map(run, conversations) for latency in latencies]
+
+
+def run_mode(conversations: List[Tuple[str, List[Dict[str, str]]]], args: argparse.Namespace,
+             deadline: float, hedge_percentile: float) -> Dict[str, Any]:
+    server = FakeOpenAIServer(latency=args.latency, slow_rate=args.slow_rate,
+                              slow_latency=args.slow_latency, seed=3)
+    base_url = server.start(free_port())
+    try:
+        with configured(base_url, deadline, hedge_percentile) as dispatcher:
+            before = answered_by()
+            started = time.perf_counter()
+            latencies = replay(conversations, args.concurrency)
+            elapsed = time.perf_counter() - started
+            stats = dispatcher.stats()
+        report = percentiles(latencies)
+        report.update({
+            "max": round(max(latencies) * 1000, 3) if latencies else 0.0,
+            "elapsed": elapsed,
+            "answered_by": _delta(answered_by(), before),
+            "upstream": sum(server.responses.values()),
+            "cancelled": server.cancelled,
+            "upstream_calls": stats["upstream_calls"],
+        })
+    finally:
+        server.stop()
+    return report
+
+
+def print_report(reports: List[Tuple[str, Dict[str, Any]]]) -> None:
+    print(f"{'Modo':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8} "
+          f"{'Al servidor':>11} {'Abandonadas':>11}")
+    for name, report in reports:
+        print(f"{name:<22} {report['p50']:>8.0f} {report['p95']:>8.0f} {report['p99']:>8.0f} "
+              f"{report['max']:>8.0f} {report['upstream']:>11} {report['cancelled']:>11}")
+    print()
+    for name, report in reports:
+        print(f"{name:<22} respondido por: {report['answered_by']}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Latencia de cola con plazo de respuesta y cobertura")
+    parser.add_argument("transcript", nargs="?", default=DEFAULT_TRANSCRIPT)
+    parser.add_argument("--repeat", type=int, default=4, help="Veces que se replica la transcripción")
+    parser.add_argument("--concurrency", type=int, default=8, help="Conversaciones simultáneas")
+    parser.add_argument("--latency", type=float, default=0.3, help="Segundos por respuesta normal")
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="Fracción de respuestas lentas")
+    parser.add_argument("--slow-latency", type=float, default=4.0, help="Segundos de las respuestas lentas")
+    parser.add_argument("--deadline", type=float, default=1.5, help="Plazo por respuesta en segundos")
+    parser.add_argument("--hedge-percentile", type=float, default=0.9, help="Percentil para la cobertura")
+    args = parser.parse_args(argv)
+
+    conversations = load_conversations(args.transcript, args.repeat)
+    messages = sum(len(m) for _, m in conversations)
+    print(f"{messages} mensajes · {args.slow_rate:.0%} de respuestas a {args.slow_latency:.1f} s · "
+          f"plazo {args.deadline:.1f} s · cobertura p{args.hedge_percentile * 100:.0f}")
+    modes = [
+        ("sin plazo", 0.0, 0.0),
+        (f"plazo {args.deadline:g} s", args.deadline, 0.0),
+        (f"plazo + cobertura p{args.hedge_percentile * 100:.0f}", args.deadline, args.hedge_percentile),
+    ]
+    reports = []
+    with quiet_logs():
+        for name, deadline, hedge in modes:
+            reports.append((name, run_mode(conversations, args, deadline, hedge)))
+    print_report(reports)
+
+
+if __name__ == "__main__":
+    main()
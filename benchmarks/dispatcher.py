@@ -0,0 +1,187 @@
+"""
+Despachador de llamadas al modelo frente a llamadas directas bajo límites de uso.
+
+Lanza el servidor simulado de OpenAI (benchmarks/fake_openai_server.py) con
+un límite de peticiones por minuto y le envía de golpe una ráfaga de
+peticiones con el SDK real: una parte repetidas (la misma pregunta en varias
+conversaciones) y con prioridades mezcladas (handoff, normal y lote).
+
+- directo: cada petición llama a AsyncOpenAI por su cuenta, con los
+  reintentos del SDK.
+- despachador: las peticiones pasan por bot.llm_dispatcher.LLMDispatcher
+  con el mismo límite que el servidor.
+
+El informe compara llamadas al servidor, 429 recibidos, errores finales,
+peticiones agrupadas y latencia por prioridad.
+
+Uso:
+    python -m benchmarks.dispatcher [--requests N] [--duplicates P] [--rpm N]
+        [--latency S] [--error-rate P] [--concurrency N]
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.replay import percentiles
+from benchmarks.scaling import free_port
+from bot.llm_dispatcher import LLMDispatcher, PRIORITY_BATCH, PRIORITY_HANDOFF, PRIORITY_NORMAL
+from config import GPT_MODEL
+
+PRIORITY_NAMES = {PRIORITY_HANDOFF: "handoff", PRIORITY_NORMAL: "normal", PRIORITY_BATCH: "lote"}
+API_KEY = "sk-local-fake-key"
+
+
+def make_workload(count: int, duplicates: float, seed: int = 7) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Genera la ráfaga de peticiones.
+
+    Args:
+        count: Número de peticiones
+        duplicates: Fracción de peticiones que repiten una pregunta anterior
+        seed: Semilla
+
+    Returns:
+        Lista de (prioridad, argumentos de chat.completions.create)
+    """
+    rng = random.Random(seed)
+    questions: List[str] = []
+    workload = []
+    for i in range(count):
+        if questions and rng.random() < duplicates:
+            question = rng.choice(questions)
+        else:
+            question = f"¿Pregunta {i} sobre boletos del evento?"
+            questions.append(question)
+        roll = rng.random()
+        priority = PRIORITY_HANDOFF if roll < 0.1 else PRIORITY_BATCH if roll < 0.4 else PRIORITY_NORMAL
+        request = {
+            "model": GPT_MODEL, "max_tokens": 150, "temperature": 0.7,
+            "messages": [{"role": "system", "content": "Eres Camila."}, {"role": "user", "content": question}],
+        }
+        workload.append((priority, request))
+    return workload
+
+
+async def _timed(call, priority: int, results: List[Tuple[int, float, bool]]) -> None:
+    started = time.perf_counter()
+    try:
+        await call
+        ok = True
+    except Exception:
+        ok = False
+    results.append((priority, time.perf_counter() - started, ok))
+
+
+async def run_direct(base_url: str, workload: List[Tuple[int, Dict[str, Any]]],
+                     concurrency: int) -> List[Tuple[int, float, bool]]:
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key=API_KEY, base_url=base_url)
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[Tuple[int, float, bool]] = []
+
+    async def call(request: Dict[str, Any]) -> Any:
+        async with semaphore:
+            return await client.chat.completions.create(**request)
+
+    await asyncio.gather(*(_timed(call(request), priority, results) for priority, request in workload))
+    await client.close()
+    return results
+
+
+async def run_dispatcher(dispatcher: LLMDispatcher,
+                         workload: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, float, bool]]:
+    results: List[Tuple[int, float, bool]] = []
+    await asyncio.gather(*(_timed(dispatcher.acomplete(request, priority), priority, results)
+                           for priority, request in workload))
+    return results
+
+
+def summarize(results: List[Tuple[int, float, bool]], server: FakeOpenAIServer, elapsed: float) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "ok": sum(1 for _, _, ok in results if ok),
+        "errors": sum(1 for _, _, ok in results if not ok),
+        "upstream": sum(server.responses.values()),
+        "rate_limited": server.responses[429],
+        "server_errors": server.responses[500],
+        "max_concurrent": server.max_concurrent,
+        "elapsed": elapsed,
+        "latency": {},
+    }
+    for priority, name in PRIORITY_NAMES.items():
+        report["latency"][name] = percentiles([latency for p, latency, ok in results if p == priority and ok])
+    return report
+
+
+def run_mode(mode: str, workload: List[Tuple[int, Dict[str, Any]]], args: argparse.Namespace) -> Dict[str, Any]:
+    server = FakeOpenAIServer(latency=args.latency, rpm=args.rpm, error_rate=args.error_rate,
+                              seed=1)
+    base_url = server.start(free_port())
+    try:
+        started = time.perf_counter()
+        if mode == "directo":
+            results = asyncio.run(run_direct(base_url, workload, args.concurrency))
+            report = summarize(results, server, time.perf_counter() - started)
+            report["coalesced"] = 0
+        else:
+            from openai import AsyncOpenAI
+
+            dispatcher = LLMDispatcher(
+                client_factory=lambda: AsyncOpenAI(api_key=API_KEY, base_url=base_url, max_retries=0),
+                requests_per_minute=args.rpm, max_concurrency=args.concurrency,
+            )
+            try:
+                results = asyncio.run(run_dispatcher(dispatcher, workload))
+            finally:
+                dispatcher.stop()
+            report = summarize(results, server, time.perf_counter() - started)
+            report["coalesced"] = dispatcher.coalesced
+    finally:
+        server.stop()
+    return report
+
+
+def print_report(reports: List[Tuple[str, Dict[str, Any]]]) -> None:
+    print(f"{'Modo':<12} {'Correctas':>9} {'Errores':>8} {'Al servidor':>11} {'429':>5} {'500':>5} "
+          f"{'Agrupadas':>9} {'Simult.':>7} {'Tiempo s':>9}")
+    for mode, report in reports:
+        print(f"{mode:<12} {report['ok']:>9} {report['errors']:>8} {report['upstream']:>11} "
+              f"{report['rate_limited']:>5} {report['server_errors']:>5} {report['coalesced']:>9} "
+              f"{report['max_concurrent']:>7} {report['elapsed']:>9.1f}")
+    print()
+    print(f"{'Modo':<12} {'Prioridad':<9} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for mode, report in reports:
+        for name, stats in report["latency"].items():
+            print(f"{mode:<12} {name:<9} {stats['count']:>5} {stats['p50']:>9.0f} {stats['p95']:>9.0f} "
+                  f"{stats['p99']:>9.0f}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Despachador de llamadas al modelo frente a llamadas directas")
+    parser.add_argument("--requests", type=int, default=400, help="Peticiones de la ráfaga")
+    parser.add_argument("--duplicates", type=float, default=0.3, help="Fracción de preguntas repetidas")
+    parser.add_argument("--rpm", type=int, default=240, help="Límite de peticiones por minuto del servidor")
+    parser.add_argument("--latency", type=float, default=0.3, help="Segundos por respuesta del servidor")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Probabilidad de 500 del servidor")
+    parser.add_argument("--concurrency", type=int, default=32, help="Llamadas simultáneas al servidor")
+    parser.add_argument("--modes", nargs="+", default=["directo", "despachador"],
+                        choices=["directo", "despachador"])
+    args = parser.parse_args(argv)
+
+    workload = make_workload(args.requests, args.duplicates)
+    unique = len({request["messages"][-1]["content"] for _, request in workload})
+    print(f"{args.requests} peticiones ({unique} distintas) · límite {args.rpm}/min · "
+          f"latencia {args.latency * 1000:.0f} ms · errores {args.error_rate:.0%}")
+    reports = []
+    for mode in args.modes:
+        reports.append((mode, run_mode(mode, workload, args)))
+        print(f"  {mode}: {reports[-1][1]['ok']} correctas en {reports[-1][1]['elapsed']:.1f} s")
+    print()
+    print_report(reports)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Servidor local con la forma de la API de OpenAI para pruebas de carga.
+
+Atiende POST /v1/chat/completions (respuesta completa o por partes con
+Server-Sent Events) con una latencia configurable, un límite de peticiones
+por minuto que se repone de forma continua, como el de OpenAI (al superarlo
+responde 429 con Retry-After), y una tasa de errores 500 aleatorios; una
+fracción de respuestas lentas simula un proveedor degradado. Con
+OPENAI_BASE_URL apuntando a él, el bot y los benchmarks usan el SDK real de
+OpenAI sin gastar cuota.
+
+Uso:
+    python -m benchmarks.fake_openai_server [--port 8100] [--latency S] [--rpm N] [--error-rate P]
+        [--slow-rate P] [--slow-latency S]
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=sk-local-fake-key python test_bot.py
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class FakeOpenAIServer:
+    """
+    Aplicación FastAPI que imita chat.completions con límites de uso.
+
+    Uso:
+        server = FakeOpenAIServer(latency=0.2, rpm=600)
+        server.start(port)  # en un hilo; server.stop() al terminar
+    """
+
+    def __init__(self, latency: float = 0.3, chunk_latency: float = 0.01, rpm: int = 0,
+                 error_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 5.0,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            latency: Segundos hasta la respuesta completa (o el primer fragmento)
+            chunk_latency: Segundos entre fragmentos en modo stream
+            rpm: Peticiones por minuto (0 = sin límite); se admite una ráfaga de hasta rpm
+            error_rate: Probabilidad de responder 500
+            slow_rate: Probabilidad de que una respuesta tarde slow_latency
+            slow_latency: Segundos de las respuestas lentas
+            seed: Semilla de los errores y respuestas lentas aleatorios
+        """
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.cancelled = 0
+        # (host, puerto) de cada cliente: una entrada por conexión TCP
+        self.connections: Set[Tuple[str, int]] = set()
+        self.responses: Counter = Counter()
+        self.max_concurrent = 0
+        self._concurrent = 0
+        self._budget = float(rpm)
+        self._updated = time.monotonic()
+        self._random = random.Random(seed)
+        self._counter = itertools.count(1)
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.app = FastAPI()
+        self.app.post("/v1/chat/completions")(self.chat_completions)
+
+    def _retry_after(self) -> float:
+        """Consume una petición del presupuesto; devuelve los segundos de espera si no alcanza."""
+        if self.rpm <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._budget = min(float(self.rpm), self._budget + (now - self._updated) * self.rpm / 60.0)
+        self._updated = now
+        if self._budget < 1.0:
+            return (1.0 - self._budget) * 60.0 / self.rpm
+        self._budget -= 1.0
+        return 0.0
+
+    @staticmethod
+    def _error(status: int, message: str, kind: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+        body = {"error": {"message": message, "type": kind, "param": None, "code": None}}
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    async def chat_completions(self, request: Request):
+        if request.client:
+            self.connections.add((request.client.host, request.client.port))
+        body: Dict[str, Any] = await request.json()
+        wait = self._retry_after()
+        if wait:
+            self.responses[429] += 1
+            return self._error(429, "Rate limit reached for requests", "requests",
+                               {"Retry-After": f"{wait:.3f}"})
+        if self._random.random() < self.error_rate:
+            self.responses[500] += 1
+            return self._error(500, "The server had an error while processing your request.", "server_error")
+
+        self.responses[200] += 1
+        messages: List[Dict[str, str]] = body.get("messages", [])
+        number = next(self._counter)
+        question = messages[-1]["content"] if messages else ""
+        answer = f"Respuesta simulada {number} para: {question}"
+        usage = {
+            "prompt_tokens": sum(len(m.get("content", "")) for m in messages) // 4,
+            "completion_tokens": len(answer) // 4,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"chatcmpl-fake-{number}", "created": int(time.time()),
+                "model": body.get("model", "gpt-3.5-turbo")}
+
+        latency = self.slow_latency if self._random.random() < self.slow_rate else self.latency
+        self._concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self._concurrent)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            self._concurrent -= 1
+        if await request.is_disconnected():
+            # El cliente canceló la llamada antes de la respuesta
+            self.cancelled += 1
+        if body.get("stream"):
+            return StreamingResponse(self._stream(base, answer, usage), media_type="text/event-stream")
+        return {
+            **base, "object": "chat.completion", "usage": usage,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": answer}}],
+        }
+
+    async def _stream(self, base: Dict[str, Any], answer: str, usage: Dict[str, int]) -> AsyncIterator[str]:
+        for word in answer.split(" "):
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "finish_reason": None, "delta": {"content": word + " "}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(self.chunk_latency)
+        yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    def start(self, port: int, host: str = "127.0.0.1") -> str:
+        """
+        Arranca el servidor en un hilo y espera a que acepte conexiones.
+
+        Args:
+            port: Puerto local
+            host: Interfaz de escucha
+
+        Returns:
+            URL base para OPENAI_BASE_URL
+        """
+        config = uvicorn.Config(self.app, host=host, port=port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name="fake-openai", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("El servidor simulado de OpenAI no arrancó")
+            time.sleep(0.05)
+        return f"http://{host}:{port}/v1"
+
+    def stop(self) -> None:
+        """Detiene el servidor arrancado con start()."""
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=10)
+            self._server = None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Servidor local con la forma de la API de OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.3, help="Segundos por respuesta")
+    parser.add_argument("--rpm", type=int, default=0, help="Peticiones por minuto antes de responder 429 (0 = sin límite)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de responder 500")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Probabilidad de una respuesta lenta")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="Segundos de las respuestas lentas")
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer(latency=args.latency, rpm=args.rpm, error_rate=args.error_rate,
+                              slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    print(f"OPENAI_BASE_URL=http://{args.host}:{args.port}/v1")
+    uvicorn.run(server.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
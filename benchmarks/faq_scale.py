@@ -0,0 +1,162 @@
+"""
+Escalabilidad de la búsqueda de FAQs con bases sintéticas de 10k a 1M entradas.
+
+Genera preguntas en español e inglés combinando plantillas con nombres de
+eventos y lugares inventados, construye FaqIndex (y opcionalmente el
+puntuador TF-IDF) y mide el tiempo de construcción, la memoria y la
+latencia de consulta con variantes ruidosas de preguntas existentes
+(palabras omitidas y errores de tipeo), cuya respuesta esperada se conoce.
+Con --mmap también compila el índice binario (bot/faq_index.py) y mide las
+consultas sobre el archivo abierto con mmap.
+
+Uso:
+    python -m benchmarks.faq_scale [tamaño ...] [--queries N] [--tfidf] [--mmap]
+
+    python -m benchmarks.faq_scale 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import List, Tuple
+
+from bot.faq_index import MmapFaqIndex, write_index
+from bot.knowledge_base import FaqIndex, TfidfFaqScorer
+from benchmarks.replay import percentiles
+
+SPANISH_TEMPLATES = [
+    "¿Cómo compro entradas para {event} en {place}?",
+    "¿A qué hora empieza {event} en {place}?",
+    "¿Hay parqueo para {event} en {place}?",
+    "¿Puedo pedir un reembolso de {event}?",
+    "¿Dónde retiro las boletas de {event} en {place}?",
+    "¿Cuánto cuesta la zona VIP de {event}?",
+    "¿Pueden entrar menores a {event} en {place}?",
+]
+ENGLISH_TEMPLATES = [
+    "How do I buy tickets for {event} at {place}?",
+    "What time does {event} start at {place}?",
+    "Is there parking for {event} at {place}?",
+    "Can I get a refund for {event}?",
+    "Where do I pick up tickets for {event} at {place}?",
+    "How much is the VIP area at {event}?",
+]
+SYLLABLES = ["ra", "me", "lo", "su", "ti", "ba", "no", "ca", "de", "vi", "ro", "ma", "la", "pe", "sol", "mar"]
+
+
+def _name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def synthetic_faqs(size: int, seed: int = 0) -> List[Tuple[str, str, str]]:
+    """
+    Genera una base de FAQs sintética.
+
+    Args:
+        size: Número de preguntas
+        seed: Semilla del generador
+
+    Returns:
+        Lista de (pregunta, respuesta, idioma)
+    """
+    rng = random.Random(seed)
+    faqs = []
+    seen = set()
+    while len(faqs) < size:
+        language = "es" if rng.random() < 0.7 else "en"
+        template = rng.choice(SPANISH_TEMPLATES if language == "es" else ENGLISH_TEMPLATES)
+        question = template.format(event=f"{_name(rng)} {_name(rng)}", place=_name(rng))
+        if question in seen:
+            continue
+        seen.add(question)
+        faqs.append((question, f"Respuesta {len(faqs)}", language))
+    return faqs
+
+
+def noisy_variant(question: str, rng: random.Random) -> str:
+    """
+    Produce una variante de la pregunta con una palabra omitida y un error de tipeo.
+
+    Args:
+        question: Pregunta original
+        rng: Generador aleatorio
+
+    Returns:
+        Pregunta modificada
+    """
+    words = question.strip("¿?").split()
+    if len(words) > 4:
+        del words[rng.randrange(1, len(words) - 1)]
+    index = rng.randrange(len(words))
+    word = words[index]
+    if len(word) > 3:
+        i = rng.randrange(len(word) - 1)
+        words[index] = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return " ".join(words).lower()
+
+
+def run(size: int, queries: int, use_tfidf: bool, use_mmap: bool = False, seed: int = 0) -> None:
+    faqs = synthetic_faqs(size, seed)
+    rng = random.Random(seed + 1)
+    sample = [faqs[rng.randrange(size)] for _ in range(queries)]
+    labelled = [(noisy_variant(question, rng), language, answer) for question, answer, language in sample]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = FaqIndex([])
+    for question, answer, language in faqs:
+        index.add(question, answer, language)
+    build_s = time.perf_counter() - start
+    index_mb = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+
+    print(f"\n{size} FAQs: construcción del índice {build_s:.1f} s, {index_mb:.0f} MB")
+    start = time.perf_counter()
+    for language in index.by_language:
+        index.speller(language)
+    print(f"  correctores ortográficos {time.perf_counter() - start:.1f} s")
+    scorers = [("difflib", index.best_match)]
+    if use_tfidf:
+        start = time.perf_counter()
+        tfidf = TfidfFaqScorer(index.entries)
+        print(f"  construcción TF-IDF {time.perf_counter() - start:.1f} s")
+        scorers.append(("tfidf", tfidf.best_match))
+    if use_mmap:
+        path = os.path.join(tempfile.mkdtemp(), "faqs.idx")
+        start = time.perf_counter()
+        write_index(index, path)
+        print(f"  índice binario {time.perf_counter() - start:.1f} s, {os.path.getsize(path) / 2 ** 20:.0f} MB en disco")
+        tracemalloc.start()
+        start = time.perf_counter()
+        mapped = MmapFaqIndex(path)
+        print(f"  apertura con mmap {(time.perf_counter() - start) * 1000:.1f} ms, "
+              f"{tracemalloc.get_traced_memory()[0] / 2 ** 20:.1f} MB en el heap")
+        tracemalloc.stop()
+        for language in mapped.by_language:
+            mapped.speller(language)
+        scorers.append(("mmap", mapped.best_match))
+
+    print(f"  {'Puntuador':<10} {'Aciertos':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, best_match in scorers:
+        latencies = []
+        correct = 0
+        for query, language, expected in labelled:
+            start = time.perf_counter()
+            answer, _ = best_match(query, language)
+            latencies.append(time.perf_counter() - start)
+            correct += answer == expected
+        stats = percentiles(latencies)
+        print(f"  {name:<10} {correct / len(labelled):>9.0%} {stats['p50']:>9} {stats['p95']:>9} {stats['p99']:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Escalabilidad de la búsqueda de FAQs")
+    parser.add_argument("sizes", nargs="*", type=int, default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200, help="Consultas por tamaño")
+    parser.add_argument("--tfidf", action="store_true", help="Medir también el puntuador TF-IDF")
+    parser.add_argument("--mmap", action="store_true", help="Medir también el índice binario con mmap")
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.queries, args.tfidf, args.mmap)
@@ -0,0 +1,90 @@
+"""
+Comparación A/B de los puntuadores de FAQs (precisión y latencia).
+
+Uso:
+    python -m benchmarks.faq_scorers
+"""
+import time
+from typing import List, Tuple
+
+from bot.knowledge_base import FAQ_SCORERS, FAQS, find_best_faq_match, find_best_faq_matches
+
+# Consultas etiquetadas: (consulta, idioma, pregunta de FAQ esperada o None)
+LABELLED_QUERIES: List[Tuple[str, str, str]] = [
+    ("Como puedo comprar entradas?", "es", "¿Cómo compro entradas?"),
+    ("como compro boletos", "es", "¿Cómo compro entradas?"),
+    ("quiero comprar boletas", "es", "Quiero comprar boletas"),
+    ("como adquiero boletas", "es", "¿Cómo puedo adquirir boletas?"),
+    ("Perdi mis entradas", "es", "Perdí mis entradas"),
+    ("no me llego el correo", "es", "No me llegó el correo con las entradas"),
+    ("como pido un reembolso", "es", "¿Cómo solicito un reembolso?"),
+    ("quiero devolver mi entrada", "es", "Quiero una devolución"),
+    ("cuanto cuesta publicar un evento", "es", "¿Cuáles son los costos para publicar un evento?"),
+    ("como publico mi evento", "es", "¿Cómo publicar un evento?"),
+    ("que metodos de pago tienen", "es", "¿Qué métodos de pago aceptan?"),
+    ("cual es el correo", "es", "¿Cuál es su correo electrónico?"),
+    ("quien eres", "es", "¿Quién eres tú?"),
+    ("quedan mesas", "es", "Quedan mesas disponibles"),
+    ("How can I buy tickets?", "en", "How do I buy tickets?"),
+    ("what is tix.do", "en", "What is Tix.do?"),
+    ("which payment methods do you accept", "en", "What payment methods do you accept?"),
+    ("who are you?", "en", "Who are you?"),
+    ("thank you so much", "en", "Thank you"),
+    # Sin tildes, con errores de tipeo y con otras palabras
+    ("como compro entradas", "es", "¿Cómo compro entradas?"),
+    ("como conpro entardas", "es", "¿Cómo compro entradas?"),
+    ("donde compro las entradas", "es", "¿Cómo compro entradas?"),
+    ("perdi mis entardas", "es", "Perdí mis entradas"),
+    ("no me a llegado el correo con mis entradas", "es", "No me llegó el correo con las entradas"),
+    ("como solicitar un rembolso", "es", "¿Cómo solicito un reembolso?"),
+    ("que metodos de pgo aceptan", "es", "¿Qué métodos de pago aceptan?"),
+    ("cuales son los costos de publicar mi evento", "es", "¿Cuáles son los costos para publicar un evento?"),
+    ("quedan entradas disponibles para el evento", "es", "Quedan entradas disponibles"),
+    ("ofrecen servicios adicionales", "es", "¿Ofrecen servicios adicionales para eventos?"),
+    ("que informacion recibe el cliente despues de comprar", "es", "¿Qué información recibe el cliente tras comprar?"),
+    ("como los contacto", "es", "¿Cómo contactarlos?"),
+    ("how do i buy tikets", "en", "How do I buy tickets?"),
+    ("what paymnet methods do you accept?", "en", "What payment methods do you accept?"),
+    ("buying tickets", "en", "How do I buy tickets?"),
+    ("cual es el horario del concierto de manana", "es", None),
+    ("what is the weather like", "en", None),
+    ("donde queda el estadio", "es", None),
+    ("mi perro se comio las entradas del concierto de ayer", "es", None),
+    ("can i bring my dog to the concert", "en", None),
+]
+
+
+def evaluate(scorer: str) -> Tuple[float, float, float]:
+    """
+    Evalúa un puntuador sobre las consultas etiquetadas.
+
+    Args:
+        scorer: Nombre del puntuador
+
+    Returns:
+        Tuple (precisión, latencia media por consulta en ms, latencia del lote en ms)
+    """
+    answers = dict(FAQS)
+    correct = 0
+    start = time.perf_counter()
+    for query, language, expected in LABELLED_QUERIES:
+        answer, _ = find_best_faq_match(query, language, scorer=scorer)
+        if answer == (answers[expected] if expected else None):
+            correct += 1
+    single_ms = (time.perf_counter() - start) * 1000 / len(LABELLED_QUERIES)
+
+    start = time.perf_counter()
+    for language in ("es", "en"):
+        find_best_faq_matches([q for q, lang, _ in LABELLED_QUERIES if lang == language], language, scorer=scorer)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    return correct / len(LABELLED_QUERIES), single_ms, batch_ms
+
+
+if __name__ == "__main__":
+    print(f"{'Puntuador':<10} {'Precisión':>10} {'ms/consulta':>12} {'ms/lote':>10}")
+    for scorer in FAQ_SCORERS:
+        # Primera llamada para construir los índices perezosos
+        find_best_faq_match("hola", "es", scorer=scorer)
+        accuracy, single_ms, batch_ms = evaluate(scorer)
+        print(f"{scorer:<10} {accuracy:>10.0%} {single_ms:>12.3f} {batch_ms:>10.3f}")
@@ -0,0 +1,120 @@
+"""
+Costo de registrar en el hilo que atiende la petición: print frente a logging.
+
+Varios hilos emiten a la vez el mismo mensaje que el bot registraba con print
+en cada coincidencia de FAQ, escribiendo en un archivo temporal:
+
+- print: el esquema anterior, print() con la salida redirigida al archivo.
+- síncrono: logging con JsonFormatter y un FileHandler en el logger raíz;
+  formatear y escribir ocurre en el hilo que registra, con el lock del handler.
+- cola: utils.logs.configure_logging; el hilo solo encola el registro y el
+  QueueListener formatea y escribe en segundo plano.
+- cola, DEBUG apagado: el mismo mensaje a nivel DEBUG con el nivel en WARNING
+  (el caso normal en producción), que no llega a crear el registro.
+
+El informe muestra la latencia por llamada en el hilo que registra y el
+tiempo hasta tener todo escrito.
+
+Uso:
+    python -m benchmarks.logging_overhead [--threads N] [--messages N]
+"""
+import argparse
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.replay import percentiles
+from utils.logs import JsonFormatter, configure_logging, shutdown_logging
+
+MATCH = ("Para comprar entradas en Tix.do debes acceder al link del evento que te interesa, "
+         "seleccionar la cantidad y tipo de boletos, y completar el pago.", 0.7659574468085106)
+
+logger = logging.getLogger("benchmarks.logging_overhead")
+
+
+def _run_threads(emit: Callable[[int], None], threads: int, messages: int) -> List[float]:
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+
+    def worker(index: int) -> None:
+        own = latencies[index]
+        for _ in range(messages):
+            start = time.perf_counter()
+            emit(index)
+            own.append(time.perf_counter() - start)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return [latency for own in latencies for latency in own]
+
+
+def run_print(path: str, threads: int, messages: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    with open(path, "w", encoding="utf-8") as output, contextlib.redirect_stdout(output):
+        latencies = _run_threads(lambda i: print(f"DEBUG - faq_match_confidence: {MATCH}"), threads, messages)
+    return {"latency": percentiles(latencies), "elapsed": time.perf_counter() - started}
+
+
+def run_sync(path: str, threads: int, messages: int) -> Dict[str, Any]:
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+    started = time.perf_counter()
+    try:
+        latencies = _run_threads(
+            lambda i: logger.debug("Coincidencia de FAQ: %s", MATCH,
+                                   extra={"session_id": f"sesion-{i}", "stage": "faq", "latency_ms": 1.2}),
+            threads, messages)
+    finally:
+        root.removeHandler(handler)
+        handler.close()
+    return {"latency": percentiles(latencies), "elapsed": time.perf_counter() - started}
+
+
+def run_queue(path: str, threads: int, messages: int, level: str) -> Dict[str, Any]:
+    configure_logging(level=level, module_levels="", fmt="json", debug_sample_rate=1.0, path=path,
+                      queue_size=threads * messages, force=True)
+    started = time.perf_counter()
+    try:
+        latencies = _run_threads(
+            lambda i: logger.debug("Coincidencia de FAQ: %s", MATCH,
+                                   extra={"session_id": f"sesion-{i}", "stage": "faq", "latency_ms": 1.2}),
+            threads, messages)
+    finally:
+        # Detener el listener espera a que se escriba todo lo encolado
+        shutdown_logging()
+    return {"latency": percentiles(latencies), "elapsed": time.perf_counter() - started}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Costo de print frente a logging en cola")
+    parser.add_argument("--threads", type=int, default=8, help="Hilos que registran a la vez")
+    parser.add_argument("--messages", type=int, default=5000, help="Mensajes por hilo")
+    args = parser.parse_args(argv)
+
+    print(f"{args.threads} hilos × {args.messages} mensajes")
+    reports = []
+    with tempfile.TemporaryDirectory() as directory:
+        reports.append(("print", run_print(os.path.join(directory, "print.log"), args.threads, args.messages)))
+        reports.append(("síncrono", run_sync(os.path.join(directory, "sync.log"), args.threads, args.messages)))
+        reports.append(("cola", run_queue(os.path.join(directory, "queue.log"), args.threads, args.messages,
+                                          "DEBUG")))
+        reports.append(("cola, DEBUG apagado", run_queue(os.path.join(directory, "off.log"), args.threads,
+                                                         args.messages, "WARNING")))
+
+    print(f"{'Esquema':<20} {'p50 µs':>8} {'p99 µs':>8} {'Total s':>8}")
+    for name, report in reports:
+        print(f"{name:<20} {report['latency']['p50'] * 1000:>8.1f} {report['latency']['p99'] * 1000:>8.1f} "
+              f"{report['elapsed']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Benchmark de carga y latencia que reproduce transcripciones grabadas.
+
+Cada conversación de la transcripción (agrupada por conversation_id) se
+reproduce contra TixOBot.get_response y contra la API de FastAPI dentro del
+mismo proceso, llamando directamente a su interfaz ASGI. OpenAI y SMTP se
+sustituyen por servicios locales con latencia configurable
+(benchmarks/stubs.py).
+
+El informe incluye rendimiento, percentiles p50/p95/p99 por etapa del flujo
+de respuesta (de las métricas de bot.assistant), memoria por sesión y, si se
+indica una línea base, las regresiones respecto a ella.
+
+Uso:
+    python -m benchmarks.replay [transcripcion.jsonl] [--repeat N] [--concurrency N]
+        [--llm-latency S] [--smtp-latency S] [--endpoint chat|stream]
+        [--baseline base.json] [--save-baseline base.json] [--tolerance 0.2]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import bot.assistant as assistant
+from benchmarks.stubs import Backends
+from config import BOT_NAME, BOT_PERSONA, DEFAULT_LANGUAGE
+from utils.conversation_log import read_log
+
+DEFAULT_TRANSCRIPT = "benchmarks/data/transcript_sample.jsonl"
+API_TOKEN = "tixdo_secure_token"
+
+
+def load_conversations(path: str, repeat: int = 1) -> List[Tuple[str, List[Dict[str, str]]]]:
+    """
+    Agrupa los mensajes de usuario de una transcripción por conversación.
+
+    La transcripción puede ser un registro de conversaciones del bot
+    (CONVERSATION_LOG_PATH, incluidos sus segmentos rotados y comprimidos),
+    que se recorre sin cargarlo entero.
+
+    Args:
+        path: Ruta del archivo JSONL (conversation_id, language, role, content)
+        repeat: Veces que se replica la transcripción (con identificadores distintos)
+
+    Returns:
+        Lista de (identificador, mensajes de usuario en orden)
+    """
+    conversations: "OrderedDict[str, List[Dict[str, str]]]" = OrderedDict()
+    for record in read_log(path):
+        if record.get("role", "user") == "user":
+            conversations.setdefault(record.get("conversation_id", "c"), []).append(record)
+    return [
+        (f"{conversation_id}-{copy}", messages)
+        for copy in range(repeat)
+        for conversation_id, messages in conversations.items()
+    ]
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """
+    Calcula los percentiles p50, p95 y p99 (por rango más cercano) en ms.
+
+    Args:
+        values: Duraciones en segundos
+
+    Returns:
+        Diccionario con count, p50, p95 y p99
+    """
+    if not values:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+
+    def rank(q: float) -> float:
+        return round(ordered[min(last, int(q * len(ordered)))] * 1000, 3)
+
+    return {"count": len(ordered), "p50": rank(0.50), "p95": rank(0.95), "p99": rank(0.99)}
+
+
+@contextlib.contextmanager
+def quiet_logs() -> Iterator[None]:
+    """Silencia los avisos del bot (errores simulados del modelo, SMTP sin configurar) mientras se mide."""
+    logging.disable(logging.WARNING)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+@contextlib.contextmanager
+def capture_stages() -> Iterator[Dict[str, List[float]]]:
+    """
+    Guarda cada observación del histograma de etapas de bot.assistant para
+    calcular percentiles exactos (el histograma solo conserva intervalos).
+
+    Yields:
+        Diccionario etapa -> duraciones en segundos
+    """
+    samples: Dict[str, List[float]] = {}
+    histogram = assistant.STAGE_SECONDS
+    observe = histogram.observe
+
+    def recording_observe(value: float, **labels: str) -> None:
+        samples.setdefault(labels.get("stage", ""), []).append(value)
+        observe(value, **labels)
+
+    histogram.observe = recording_observe
+    try:
+        yield samples
+    finally:
+        del histogram.observe
+
+
+def answered_by() -> Dict[str, float]:
+    """Copia del contador de respuestas por etapa."""
+    return {key[0]: value for key, value in assistant.RESPONSES_TOTAL.values().items()}
+
+
+def _delta(after: Dict[str, float], before: Dict[str, float]) -> Dict[str, int]:
+    return {stage: int(after[stage] - before.get(stage, 0)) for stage in after if after[stage] - before.get(stage, 0)}
+
+
+def replay_bot(conversations: List[Tuple[str, List[Dict[str, str]]]]) -> Dict[str, Any]:
+    """
+    Reproduce las conversaciones con TixOBot.get_response, una tras otra.
+
+    Args:
+        conversations: Conversaciones de load_conversations
+
+    Returns:
+        Rendimiento, percentiles por mensaje y por etapa, y memoria por sesión
+    """
+    latencies: List[float] = []
+    bots = []
+    before = answered_by()
+    with capture_stages() as stages:
+        started = time.perf_counter()
+        for conversation_id, messages in conversations:
+            bot = assistant.TixOBot(name=BOT_NAME, persona=BOT_PERSONA,
+                                    default_language=DEFAULT_LANGUAGE, user_id=conversation_id)
+            for record in messages:
+                start = time.perf_counter()
+                bot.get_response(record["content"], record.get("language", DEFAULT_LANGUAGE))
+                latencies.append(time.perf_counter() - start)
+            bots.append(bot)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "messages": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+        "stages_ms": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+        "answered_by": _delta(answered_by(), before),
+        "memory_per_session_bytes": sum(bot.memory_usage() for bot in bots) // max(1, len(bots)),
+    }
+
+
+async def asgi_request(app: Any, path: str, payload: Dict[str, Any]) -> Tuple[int, bytes, Optional[float]]:
+    """
+    Envía una petición POST JSON a una aplicación ASGI sin servidor HTTP.
+
+    Args:
+        app: Aplicación ASGI
+        path: Ruta de la petición
+        payload: Cuerpo JSON
+
+    Returns:
+        Tuple (código de estado, cuerpo, segundos hasta el primer fragmento del cuerpo)
+    """
+    body = json.dumps(payload).encode("utf-8")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [
+            (b"host", b"benchmark"), (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()), (b"authorization", f"Bearer {API_TOKEN}".encode()),
+        ],
+        "client": ("127.0.0.1", 0), "server": ("benchmark", 80),
+    }
+    request_sent = False
+    finished = asyncio.Event()
+    status = 0
+    chunks: List[bytes] = []
+    first_chunk: Optional[float] = None
+    started = time.perf_counter()
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # El cliente solo se "desconecta" cuando la respuesta terminó
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status, first_chunk
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            if message.get("body"):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+                chunks.append(message["body"])
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    finished.set()
+    return status, b"".join(chunks), first_chunk
+
+
+async def replay_api(conversations: List[Tuple[str, List[Dict[str, str]]]], concurrency: int = 8,
+                     endpoint: str = "chat") -> Dict[str, Any]:
+    """
+    Reproduce las conversaciones contra la API, varias a la vez.
+
+    Los mensajes de cada conversación se envían en orden con su user_id, así
+    que usan la misma sesión del servidor.
+
+    Args:
+        conversations: Conversaciones de load_conversations
+        concurrency: Conversaciones simultáneas
+        endpoint: "chat" (/api/chat) o "stream" (/api/chat/stream)
+
+    Returns:
+        Rendimiento, percentiles por petición y por etapa, errores y memoria por sesión
+    """
+    import api
+
+    path = "/api/chat/stream" if endpoint == "stream" else "/api/chat"
+    latencies: List[float] = []
+    first_chunks: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_conversation(conversation_id: str, messages: List[Dict[str, str]]) -> None:
+        nonlocal errors
+        async with semaphore:
+            for record in messages:
+                start = time.perf_counter()
+                status, _, first_chunk = await asgi_request(api.app, path, {
+                    "message": record["content"],
+                    "user_id": conversation_id,
+                    "language": record.get("language", DEFAULT_LANGUAGE),
+                })
+                latencies.append(time.perf_counter() - start)
+                if first_chunk is not None:
+                    first_chunks.append(first_chunk)
+                if status != 200:
+                    errors += 1
+
+    before = answered_by()
+    with capture_stages() as stages:
+        started = time.perf_counter()
+        await asyncio.gather(*(run_conversation(cid, messages) for cid, messages in conversations))
+        elapsed = time.perf_counter() - started
+
+    session_stats = api.sessions.stats()
+    return {
+        "endpoint": path,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+        "first_chunk_ms": percentiles(first_chunks),
+        "stages_ms": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+        "answered_by": _delta(answered_by(), before),
+        "memory_per_session_bytes": session_stats["memory_bytes"] // max(1, session_stats["size"]),
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2,
+            min_delta_ms: float = 0.5) -> List[str]:
+    """
+    Compara un informe con una línea base.
+
+    Una latencia empeora si supera la de la línea base en más de la tolerancia
+    relativa y de min_delta_ms; el rendimiento, si baja más de la tolerancia;
+    la memoria por sesión, si sube más de la tolerancia.
+
+    Args:
+        report: Informe actual
+        baseline: Informe guardado
+        tolerance: Variación relativa aceptada
+        min_delta_ms: Diferencia absoluta mínima en ms para considerar una latencia
+
+    Returns:
+        Descripción de cada regresión encontrada
+    """
+    regressions = []
+    for section in ("bot", "api"):
+        current, previous = report.get(section), baseline.get(section)
+        if not current or not previous:
+            continue
+
+        old, new = previous["throughput_rps"], current["throughput_rps"]
+        if old and new < old * (1 - tolerance):
+            regressions.append(f"{section}: rendimiento {new} req/s (antes {old})")
+
+        old, new = previous["memory_per_session_bytes"], current["memory_per_session_bytes"]
+        if old and new > old * (1 + tolerance):
+            regressions.append(f"{section}: memoria por sesión {new} B (antes {old})")
+
+        latency_groups = [("total", previous["latency_ms"], current["latency_ms"])]
+        latency_groups += [
+            (stage, previous["stages_ms"][stage], values)
+            for stage, values in current["stages_ms"].items() if stage in previous["stages_ms"]
+        ]
+        for name, old_values, new_values in latency_groups:
+            for q in ("p50", "p95", "p99"):
+                old, new = old_values[q], new_values[q]
+                if new > old * (1 + tolerance) and new - old > min_delta_ms:
+                    regressions.append(f"{section}: {name} {q} {new} ms (antes {old} ms)")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    for section, results in report.items():
+        if not isinstance(results, dict) or "latency_ms" not in results:
+            continue
+        latency = results["latency_ms"]
+        print(f"\n[{section}] {results.get('messages', results.get('requests'))} mensajes, "
+              f"{results['throughput_rps']} req/s, memoria/sesión {results['memory_per_session_bytes']} B")
+        print(f"  total: p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+        print(f"  {'Etapa':<14} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage, values in results["stages_ms"].items():
+            print(f"  {stage:<14} {values['count']:>6} {values['p50']:>9} {values['p95']:>9} {values['p99']:>9}")
+        print(f"  respondido por: {results['answered_by']}, llamadas al modelo: {results['llm_calls']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Reproduce transcripciones contra el bot y la API")
+    parser.add_argument("transcript", nargs="?", default=DEFAULT_TRANSCRIPT)
+    parser.add_argument("--repeat", type=int, default=1, help="Veces que se replica la transcripción")
+    parser.add_argument("--concurrency", type=int, default=8, help="Conversaciones simultáneas en la API")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Segundos por llamada al modelo simulado")
+    parser.add_argument("--smtp-latency", type=float, default=0.05, help="Segundos por envío SMTP simulado")
+    parser.add_argument("--endpoint", choices=("chat", "stream"), default="chat")
+    parser.add_argument("--skip-api", action="store_true", help="Solo reproducir contra TixOBot")
+    parser.add_argument("--baseline", help="Informe JSON con el que comparar")
+    parser.add_argument("--save-baseline", help="Guardar el informe JSON en esta ruta")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Variación relativa aceptada")
+    args = parser.parse_args(argv)
+
+    conversations = load_conversations(args.transcript, args.repeat)
+    report: Dict[str, Any] = {
+        "transcript": args.transcript,
+        "repeat": args.repeat,
+        "llm_latency": args.llm_latency,
+        "smtp_latency": args.smtp_latency,
+    }
+    with quiet_logs():
+        with Backends(llm_latency=args.llm_latency, smtp_latency=args.smtp_latency) as backends:
+            report["bot"] = replay_bot(conversations)
+            # Las llamadas sin stream pasan por el despachador, que usa el cliente asíncrono
+            report["bot"]["llm_calls"] = backends.openai.calls + backends.async_openai.calls
+        if not args.skip_api:
+            with Backends(llm_latency=args.llm_latency, smtp_latency=args.smtp_latency) as backends:
+                report["api"] = asyncio.run(replay_api(conversations, args.concurrency, args.endpoint))
+                report["api"]["llm_calls"] = backends.openai.calls + backends.async_openai.calls
+
+    print_report(report)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nLínea base guardada en {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegresiones:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("\nSin regresiones respecto a la línea base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Escalado del rendimiento de la API con el número de workers.
+
+Para cada número de workers lanza serve.py en modo compartido (sesiones y
+caché en SQLite dentro de un directorio temporal) y lo somete a carga desde
+varios procesos cliente con conexiones HTTP persistentes. Cada conexión
+reproduce conversaciones de la transcripción con su propio user_id, de modo
+que las peticiones de un mismo usuario llegan a workers distintos.
+
+Sin OPENAI_API_KEY las respuestas salen de FAQs, palabras clave y mensajes
+de respaldo, así que la carga mide el trabajo de CPU de cada worker. Para un
+resultado representativo, el generador de carga debe tener núcleos propios
+(o ejecutarse en otra máquina con --url).
+
+Uso:
+    python -m benchmarks.scaling [--workers 1 2 4] [--duration S] [--connections N]
+        [--client-processes N] [--url http://host:puerto]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from benchmarks.replay import API_TOKEN, DEFAULT_TRANSCRIPT, load_conversations, percentiles
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, state_dir: str) -> subprocess.Popen:
+    """
+    Lanza serve.py y espera a que responda.
+
+    Args:
+        workers: Número de workers
+        port: Puerto local
+        state_dir: Directorio de los archivos SQLite compartidos
+
+    Returns:
+        Proceso del servidor
+    """
+    env = dict(os.environ, SERVE_MODE="shared", SHARED_STATE_DIR=state_dir, OPENAI_API_KEY="")
+    # Sin rutas explícitas se usan las del modo compartido dentro de state_dir
+    env.pop("SESSION_DB_PATH", None)
+    env.pop("COMPLETION_CACHE_DB_PATH", None)
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/openapi.json")
+            if connection.getresponse().status == 200:
+                # Da tiempo a que el resto de workers termine de importar la aplicación
+                time.sleep(1.0 + 0.2 * workers)
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"El servidor con {workers} workers no arrancó")
+
+
+def _client(args: Tuple[str, int, int, float, float, List[List[str]]]) -> Tuple[int, int, List[float]]:
+    """
+    Proceso cliente: varias conexiones persistentes enviando mensajes hasta el final.
+
+    Returns:
+        Tuple (peticiones correctas, errores, latencias en segundos)
+    """
+    import threading
+
+    url, client_id, connections, start_at, duration, conversations = args
+    target = urlparse(url)
+    ok = errors = 0
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def run(connection_id: int) -> None:
+        nonlocal ok, errors
+        connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {API_TOKEN}"}
+        local: List[float] = []
+        local_ok = local_errors = 0
+        turn = 0
+        while time.time() < start_at:
+            time.sleep(0.001)
+        while time.time() < start_at + duration:
+            messages = conversations[(connection_id + turn) % len(conversations)]
+            user_id = f"scaling-{client_id}-{connection_id}-{turn}"
+            for message in messages:
+                body = json.dumps({"message": message, "user_id": user_id})
+                started = time.perf_counter()
+                try:
+                    connection.request("POST", "/api/chat", body=body, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status == 200:
+                        local_ok += 1
+                        local.append(time.perf_counter() - started)
+                    else:
+                        local_errors += 1
+                except (OSError, http.client.HTTPException):
+                    local_errors += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+            turn += 1
+        connection.close()
+        with lock:
+            ok += local_ok
+            errors += local_errors
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return ok, errors, latencies
+
+
+def run_load(url: str, conversations: List[List[str]], duration: float, connections: int,
+             client_processes: int) -> Dict[str, float]:
+    """
+    Somete el servidor a carga y mide el rendimiento.
+
+    Args:
+        url: URL base del servidor
+        conversations: Mensajes de usuario de cada conversación
+        duration: Segundos de medición
+        connections: Conexiones persistentes por proceso cliente
+        client_processes: Procesos cliente
+
+    Returns:
+        Diccionario con peticiones por segundo, errores y percentiles de latencia
+    """
+    start_at = time.time() + 0.5
+    jobs = [(url, i, connections, start_at, duration, conversations) for i in range(client_processes)]
+    with multiprocessing.Pool(client_processes) as pool:
+        results = pool.map(_client, jobs)
+    ok = sum(result[0] for result in results)
+    errors = sum(result[1] for result in results)
+    latencies = [latency for result in results for latency in result[2]]
+    report = {"requests": ok, "errors": errors, "rps": ok / duration}
+    report.update(percentiles(latencies))
+    return report
+
+
+def print_report(results: List[Tuple[int, Dict[str, float]]]) -> None:
+    base = results[0][1]["rps"] / results[0][0] if results and results[0][1]["rps"] else 0.0
+    print(f"{'Workers':>7} {'Pet/s':>9} {'Aceleración':>11} {'Eficiencia':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Errores':>8}")
+    for workers, report in results:
+        speedup = report["rps"] / (base * results[0][0]) if base else 0.0
+        efficiency = report["rps"] / (base * workers) if base else 0.0
+        print(f"{workers:>7} {report['rps']:>9.1f} {speedup:>10.2f}x {efficiency:>9.0%} "
+              f"{report['p50']:>8.1f} {report['p95']:>8.1f} {report['p99']:>8.1f} {report['errors']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, *[n for n in (2, 4, 8, 16) if n <= cores], cores})
+    parser = argparse.ArgumentParser(description="Escalado de la API con el número de workers")
+    parser.add_argument("transcript", nargs="?", default=DEFAULT_TRANSCRIPT)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de medición por configuración")
+    parser.add_argument("--connections", type=int, default=8, help="Conexiones por proceso cliente")
+    parser.add_argument("--client-processes", type=int, default=0,
+                        help="Procesos cliente (0 = tantos como workers)")
+    parser.add_argument("--url", default="", help="Servidor ya lanzado (solo mide, no arranca serve.py)")
+    args = parser.parse_args(argv)
+
+    conversations = [[m["content"] for m in messages] for _, messages in load_conversations(args.transcript)]
+    print(f"Núcleos: {cores} · {len(conversations)} conversaciones · {args.duration:.0f} s por configuración")
+
+    results: List[Tuple[int, Dict[str, float]]] = []
+    for workers in ([0] if args.url else args.workers):
+        clients = args.client_processes or max(workers, 1)
+        if args.url:
+            results.append((1, run_load(args.url, conversations, args.duration, args.connections, clients)))
+            continue
+        port = free_port()
+        with tempfile.TemporaryDirectory() as state_dir:
+            server = start_server(workers, port, state_dir)
+            try:
+                report = run_load(f"http://127.0.0.1:{port}", conversations, args.duration,
+                                  args.connections, clients)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        results.append((workers, report))
+        print(f"  {workers} workers: {report['rps']:.1f} pet/s")
+    print()
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Tasa de aciertos de la caché semántica sobre una transcripción reproducida.
+
+Cada mensaje de usuario de la transcripción se busca en la caché; en un
+fallo se simula la respuesta del modelo y se guarda, igual que en
+TixOBot.get_response.
+
+Uso:
+    python -m benchmarks.semantic_cache [transcripcion.jsonl] [umbral ...]
+"""
+import json
+import sys
+import time
+from typing import Dict, Iterator
+
+from bot.semantic_cache import SemanticCache
+
+DEFAULT_TRANSCRIPT = "benchmarks/data/transcript_sample.jsonl"
+
+
+def iter_user_messages(path: str) -> Iterator[Dict[str, str]]:
+    """
+    Itera sobre los mensajes de usuario de una transcripción JSONL.
+
+    Args:
+        path: Ruta del archivo (una línea JSON por mensaje con role, content y language)
+
+    Yields:
+        Mensajes de usuario
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("role", "user") == "user":
+                    yield record
+
+
+def replay(path: str, threshold: float) -> Dict[str, float]:
+    """
+    Reproduce una transcripción contra una caché semántica vacía.
+
+    Args:
+        path: Ruta de la transcripción
+        threshold: Umbral de similitud coseno
+
+    Returns:
+        Estadísticas de la caché y latencia media de búsqueda en microsegundos
+    """
+    cache = SemanticCache(threshold=threshold)
+    lookup_time = 0.0
+    lookups = 0
+    for record in iter_user_messages(path):
+        language = record.get("language", "es")
+        start = time.perf_counter()
+        answer = cache.lookup(record["content"], language)
+        lookup_time += time.perf_counter() - start
+        lookups += 1
+        if answer is None:
+            cache.add(record["content"], language, f"respuesta simulada para: {record['content']}")
+
+    stats = cache.stats()
+    stats["lookup_us"] = lookup_time / lookups * 1e6 if lookups else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    transcript = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TRANSCRIPT
+    thresholds = [float(value) for value in sys.argv[2:]] or [0.95, 0.9, 0.85, 0.8, 0.7]
+    print(f"{'Umbral':>7} {'Aciertos':>9} {'Tasa':>7} {'us/búsqueda':>12} {'Memoria (KB)':>13}")
+    for threshold in thresholds:
+        stats = replay(transcript, threshold)
+        print(f"{threshold:>7.2f} {stats['hits']:>9} {stats['hit_rate']:>7.1%} "
+              f"{stats['lookup_us']:>12.1f} {stats['memory_bytes'] / 1024:>13.0f}")
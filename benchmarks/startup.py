@@ -0,0 +1,70 @@
+"""
+Tiempo de arranque en frío: importa cada módulo en un proceso nuevo y mide
+cuánto tarda, además de qué dependencias pesadas quedaron cargadas.
+
+Uso:
+    python -m benchmarks.startup [módulo ...] [--runs N]
+
+    python -m benchmarks.startup api bot.assistant main
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Dependencias cuya carga al arrancar se quiere vigilar
+HEAVY_MODULES = ("streamlit", "openai", "numpy", "smtplib", "email.mime", "tenacity")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, runs: int = 5) -> Dict[str, object]:
+    """
+    Importa un módulo en procesos nuevos y mide el tiempo de importación.
+
+    Args:
+        module: Nombre del módulo
+        runs: Número de procesos
+
+    Returns:
+        Diccionario con mediana, mínimo, máximo (en segundos) y dependencias pesadas cargadas
+    """
+    timings: List[float] = []
+    loaded: List[str] = []
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, env=env, check=True,
+        )
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+        loaded = probe["loaded"]
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "loaded": loaded,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de importación en frío")
+    parser.add_argument("modules", nargs="*", default=["api", "bot.assistant"])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'Módulo':<16} {'Mediana (s)':>12} {'Mín (s)':>9} {'Máx (s)':>9}  Dependencias pesadas cargadas")
+    for module in args.modules:
+        stats = measure(module, args.runs)
+        print(f"{module:<16} {stats['median']:>12.3f} {stats['min']:>9.3f} {stats['max']:>9.3f}  "
+              f"{', '.join(stats['loaded']) or '-'}")
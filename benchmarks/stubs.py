@@ -0,0 +1,170 @@
+"""
+Servicios simulados para los benchmarks: API de OpenAI y servidor SMTP
+locales con latencia configurable.
+"""
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import bot.assistant as assistant
+from bot.completion_cache import CompletionCache
+from bot.llm_dispatcher import LLMDispatcher
+from bot.semantic_cache import SemanticCache
+from utils.notifications import HandoffNotifier
+
+
+def _reply(counter: Iterator[int], messages: List[Dict[str, str]]) -> str:
+    question = messages[-1]["content"] if messages else ""
+    # Respuestas distintas en cada llamada para que no se descarten como repetidas
+    return f"Respuesta simulada {next(counter)} para: {question}"
+
+
+def _usage(messages: List[Dict[str, str]], answer: str) -> SimpleNamespace:
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(answer) // 4)
+
+
+def _completion(answer: str, usage: SimpleNamespace) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))], usage=usage)
+
+
+def _chunks(answer: str, usage: SimpleNamespace) -> List[SimpleNamespace]:
+    words = answer.split(" ")
+    chunks = [
+        SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))], usage=None)
+        for word in words
+    ]
+    chunks.append(SimpleNamespace(choices=[], usage=usage))
+    return chunks
+
+
+class FakeOpenAI:
+    """Cliente síncrono con la forma de OpenAI().chat.completions."""
+
+    def __init__(self, latency: float = 0.5, chunk_latency: float = 0.02):
+        """
+        Args:
+            latency: Segundos hasta la respuesta completa (o el primer fragmento)
+            chunk_latency: Segundos entre fragmentos en modo stream
+        """
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.calls = 0
+        self._counter = itertools.count(1)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages: List[Dict[str, str]], stream: bool = False, **kwargs: Any):
+        self.calls += 1
+        answer = _reply(self._counter, messages)
+        time.sleep(self.latency)
+        if stream:
+            return self._stream(_chunks(answer, _usage(messages, answer)))
+        return _completion(answer, _usage(messages, answer))
+
+    def _stream(self, chunks: List[SimpleNamespace]) -> Iterator[SimpleNamespace]:
+        for chunk in chunks:
+            yield chunk
+            time.sleep(self.chunk_latency)
+
+
+class FakeAsyncOpenAI(FakeOpenAI):
+    """Cliente asíncrono con la forma de AsyncOpenAI().chat.completions."""
+
+    async def create(self, messages: List[Dict[str, str]], stream: bool = False, **kwargs: Any):
+        self.calls += 1
+        answer = _reply(self._counter, messages)
+        await asyncio.sleep(self.latency)
+        if stream:
+            return self._astream(_chunks(answer, _usage(messages, answer)))
+        return _completion(answer, _usage(messages, answer))
+
+    async def _astream(self, chunks: List[SimpleNamespace]) -> AsyncIterator[SimpleNamespace]:
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(self.chunk_latency)
+
+
+class FakeSMTP:
+    """Conexión SMTP que solo cuenta los mensajes y espera la latencia indicada."""
+
+    def __init__(self, latency: float = 0.2):
+        self.latency = latency
+        self.sent = 0
+
+    def sendmail(self, from_addr: str, to_addrs: str, msg: str) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        self.sent += 1
+        return {}
+
+    def noop(self):
+        return 250, b"OK"
+
+    def quit(self) -> None:
+        pass
+
+
+class Backends:
+    """
+    Instala los servicios simulados en bot.assistant y los retira al salir.
+
+    También instala cachés de respuestas vacías (solo en memoria, con la misma
+    configuración) para que cada ejecución empiece en frío.
+
+    Uso:
+        with Backends(llm_latency=0.3) as backends:
+            ...
+    """
+
+    def __init__(self, llm_latency: float = 0.5, chunk_latency: float = 0.02, smtp_latency: float = 0.2):
+        self.openai = FakeOpenAI(llm_latency, chunk_latency)
+        self.async_openai = FakeAsyncOpenAI(llm_latency, chunk_latency)
+        self.smtp = FakeSMTP(smtp_latency)
+        self.notifier: Optional[HandoffNotifier] = None
+        self.dispatcher: Optional[LLMDispatcher] = None
+        self._saved: Dict[str, Any] = {}
+
+    def __enter__(self) -> "Backends":
+        settings = {
+            "host": "localhost", "port": 25, "user": "bench@tix.do", "password": "bench",
+            "to": "soporte@tix.do", "use_tls": False,
+        }
+        self.notifier = HandoffNotifier(":memory:", settings=settings, connect=lambda _: self.smtp,
+                                        batch_window=0.0)
+        # Mismos límites que el despachador real, sobre el cliente simulado
+        real = assistant.dispatcher
+        self.dispatcher = LLMDispatcher(
+            client_factory=lambda: self.async_openai,
+            requests_per_minute=real.requests.per_minute, tokens_per_minute=real.tokens.per_minute,
+            max_concurrency=real.max_concurrency, max_retries=real.max_retries,
+            retry_max_wait=real.retry_max_wait
+        )
+        replacements = {
+            "client": self.openai,
+            "dispatcher": self.dispatcher,
+            "async_client": self.async_openai,
+            "OPENAI_API_KEY": "sk-benchmark-key",
+            "_handoff_notifier": self.notifier,
+            "completion_cache": CompletionCache(mode=assistant.completion_cache.mode,
+                                                ttl=assistant.completion_cache.ttl),
+        }
+        if assistant.semantic_cache is not None:
+            replacements["semantic_cache"] = SemanticCache(
+                capacity=assistant.semantic_cache.capacity,
+                threshold=assistant.semantic_cache.threshold,
+                ttl=assistant.semantic_cache.ttl
+            )
+        for name, value in replacements.items():
+            self._saved[name] = getattr(assistant, name)
+            setattr(assistant, name, value)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self.notifier is not None:
+            self.notifier.stop()
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+        for name, value in self._saved.items():
+            setattr(assistant, name, value)
+        self._saved.clear()
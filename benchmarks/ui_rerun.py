@@ -0,0 +1,123 @@
+"""
+Tiempo de cada ejecución de la interfaz de Streamlit según el largo del historial.
+
+Streamlit vuelve a ejecutar el script completo en cada interacción. Con
+streamlit.testing.v1.AppTest se ejecuta varias veces con historiales de
+distinto tamaño ya cargados en session_state:
+
+- anterior: un st.container y un st.markdown con el HTML armado en un
+  f-string por cada mensaje, como hacía main.py.
+- paginado: utils.chat_render; solo las últimas CHAT_PAGE_SIZE entradas, en un
+  único st.markdown con el HTML de cada mensaje cacheado.
+- main.py: la interfaz completa (CSS, barra lateral, preguntas frecuentes).
+
+El informe muestra la mediana por ejecución y los elementos enviados al
+navegador.
+
+Uso:
+    python -m benchmarks.ui_rerun [--lengths N ...] [--runs N]
+"""
+import argparse
+import os
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+LEGACY_SCRIPT = '''
+import streamlit as st
+
+for message in st.session_state.messages:
+    if message["role"] == "user":
+        with st.container():
+            st.markdown(f"""
+            <div class="message-container" style="justify-content: flex-end;">
+                <div class="message-content" style="background-color: #e6f7ff;">
+                    {message["content"]}
+                </div>
+                <div class="user-avatar">👤</div>
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        with st.container():
+            st.markdown(f"""
+            <div class="message-container">
+                <div class="bot-avatar">🤖</div>
+                <div class="message-content">
+                    {message["content"]}
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+'''
+
+PAGED_SCRIPT = '''
+import streamlit as st
+from config import CHAT_PAGE_SIZE
+from utils.chat_render import history_html, visible_window
+
+hidden, visible = visible_window(st.session_state.messages, CHAT_PAGE_SIZE)
+if hidden:
+    st.button(f"Mostrar mensajes anteriores ({hidden})")
+if visible:
+    st.markdown(history_html(visible), unsafe_allow_html=True)
+'''
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def make_history(length: int) -> Any:
+    from bot.history import CompactHistory
+
+    messages = []
+    for i in range(length):
+        if i % 2 == 0:
+            messages.append({"role": "user", "content": f"Pregunta {i}: ¿dónde compro boletos para el evento?"})
+        else:
+            messages.append({"role": "assistant", "content": "Para comprar entradas en Tix.do debes acceder al "
+                             "link del evento, seleccionar los boletos y completar el pago."})
+    return CompactHistory(messages)
+
+
+def time_reruns(app: Any, length: int, runs: int) -> Dict[str, Any]:
+    """
+    Ejecuta la app con un historial de `length` mensajes.
+
+    Returns:
+        Mediana en milisegundos y número de elementos de la última ejecución
+    """
+    app.session_state["messages"] = make_history(length)
+    app.session_state["welcome_shown"] = True
+    app.run()
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - started)
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    return {"ms": statistics.median(timings) * 1000, "elements": len(list(app.main))}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Tiempo por ejecución de la interfaz según el historial")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 1000, 5000],
+                        help="Mensajes en el historial")
+    parser.add_argument("--runs", type=int, default=5, help="Ejecuciones medidas por tamaño")
+    args = parser.parse_args(argv)
+
+    # main.py se detiene sin clave; la interfaz no llama al modelo durante la medición
+    os.environ.setdefault("OPENAI_API_KEY", "sk-local-fake-key")
+    from streamlit.testing.v1 import AppTest
+
+    apps = {
+        "anterior": lambda: AppTest.from_string(LEGACY_SCRIPT, default_timeout=120),
+        "paginado": lambda: AppTest.from_string(PAGED_SCRIPT, default_timeout=120),
+        "main.py": lambda: AppTest.from_file(MAIN_SCRIPT, default_timeout=120),
+    }
+    print(f"{'Mensajes':>8} " + " ".join(f"{name + ' ms':>12} {'elem.':>6}" for name in apps))
+    for length in args.lengths:
+        row = [time_reruns(factory(), length, args.runs) for factory in apps.values()]
+        print(f"{length:>8} " + " ".join(f"{report['ms']:>12.1f} {report['elements']:>6}" for report in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Recursos por sesión de la interfaz de Streamlit con el motor compartido.
+
+Abre varias sesiones de main.py con streamlit.testing.v1.AppTest (cada
+AppTest es una sesión del navegador) y en cada una envía mensajes que llegan
+al modelo, servido por el servidor simulado de OpenAI
+(benchmarks/fake_openai_server.py) a través del SDK real. Las sesiones se
+mantienen vivas, como usuarios conectados a la vez.
+
+El informe muestra la memoria que retiene cada sesión adicional, las
+conexiones TCP que recibió el servidor (con el cliente compartido se
+reutilizan entre usuarios, también después de las respuestas por partes) y
+las sesiones creadas por el motor.
+
+Uso:
+    python -m benchmarks.ui_sessions [--sessions N] [--messages N] [--latency S]
+"""
+import argparse
+import gc
+import os
+import tracemalloc
+from typing import Any, List, Optional
+
+import bot.assistant as assistant
+import config
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.scaling import free_port
+from bot.engine import ChatEngine
+
+API_KEY = "sk-local-fake-key"
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def send(app: Any, message: str) -> None:
+    """Envía un mensaje desde el formulario y espera la respuesta transmitida."""
+    app.text_input(key="user_input").input(message)
+    button = next(button for button in app.button if button.label == "Enviar")
+    button.click().run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Recursos por sesión de la interfaz de Streamlit")
+    parser.add_argument("--sessions", type=int, default=20, help="Sesiones del navegador")
+    parser.add_argument("--messages", type=int, default=3, help="Mensajes al modelo por sesión")
+    parser.add_argument("--latency", type=float, default=0.05, help="Segundos por respuesta del servidor")
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer(latency=args.latency, chunk_latency=0.0)
+    base_url = server.start(free_port())
+    # main.py comprueba la clave en config; los clientes se crean con la de bot.assistant
+    config.OPENAI_API_KEY = assistant.OPENAI_API_KEY = API_KEY
+    assistant.OPENAI_BASE_URL = base_url
+    from streamlit.testing.v1 import AppTest
+
+    apps = []
+    memory: List[int] = []
+    try:
+        tracemalloc.start()
+        for session in range(args.sessions):
+            app = AppTest.from_file(MAIN_SCRIPT, default_timeout=60)
+            app.run()
+            for turn in range(args.messages):
+                send(app, f"Sesión {session}, pregunta {turn}: ¿qué lleva la receta del sancocho?")
+            apps.append(app)
+            gc.collect()
+            memory.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+    finally:
+        server.stop()
+
+    # type() y no isinstance: isinstance cargaría los módulos diferidos del SDK de OpenAI
+    engine = next(value for value in gc.get_objects() if type(value) is ChatEngine)
+    user_ids = {app.session_state["bot"].user_id for app in apps}
+    per_session = (memory[-1] - memory[0]) / max(1, len(memory) - 1)
+    print(f"{args.sessions} sesiones × {args.messages} mensajes al modelo")
+    print(f"Memoria por sesión adicional:  {per_session / 1024:.1f} KB (incluye el estado de AppTest)")
+    print(f"Peticiones al servidor:        {sum(server.responses.values())}")
+    print(f"Conexiones TCP:                {len(server.connections)}")
+    print(f"Sesiones creadas por el motor: {engine.stats()['sessions']} ({len(user_ids)} user_id distintos)")
+
+
+if __name__ == "__main__":
+    main()
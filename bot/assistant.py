@@ -1,7 +1,20 @@
-from openai import OpenAI
-from typing import Dict, List, Optional
-from bot.knowledge_base import find_best_faq_match
-from utils.helpers import send_handoff_email, format_time
+import asyncio
+import concurrent.futures
+import logging
+import sys
+import time
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from bot.completion_cache import CompletionCache
+from bot.context import ConversationContext
+from bot.history import CompactHistory
+from bot.knowledge_base import FAQ_INDEX, find_best_faq_match, find_best_faq_matches, get_tfidf_scorer
+from bot.llm_dispatcher import LLMDispatcher, PRIORITY_HANDOFF, PRIORITY_NORMAL
+from bot.rules import RULES
+from utils.conversation_log import ConversationLog, open_log
+from utils.helpers import format_time, get_email_settings
+from utils.metrics import REGISTRY, timed
+from utils.notifications import HandoffNotifier
 from config import (
     GPT_MODEL, 
     MAX_TOKENS, 
@@ -9,11 +22,245 @@ from config import (
     WELCOME_MESSAGES,
     FALLBACK_MESSAGES,
     HUMAN_HANDOFF_MESSAGES,
-    OPENAI_API_KEY
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    COMPLETION_CACHE_MODE,
+    COMPLETION_CACHE_SIZE,
+    COMPLETION_CACHE_TTL_SECONDS,
+    COMPLETION_CACHE_DB_PATH,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_CAPACITY,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    BATCH_FAQ_SCORER,
+    FAQ_SCORER,
+    HANDOFF_QUEUE_PATH,
+    HANDOFF_DIGEST_THRESHOLD,
+    HANDOFF_SENT_RETENTION_SECONDS,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_MAX_TURNS,
+    CONTEXT_SUMMARY_TOKENS,
+    HISTORY_MAX_MESSAGES,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_MAX_WAIT,
+    RESPONSE_DEADLINE_SECONDS,
+    RESPONSE_DEADLINE_MARGIN_SECONDS,
+    DEGRADED_FAQ_MIN_CONFIDENCE,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_SAMPLES,
+    CONVERSATION_LOG_PATH,
+    CONVERSATION_LOG_FSYNC_SECONDS,
+    CONVERSATION_LOG_MAX_BYTES,
+    CONVERSATION_LOG_MAX_AGE_SECONDS
 )
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+logger = logging.getLogger(__name__)
+
+# Clientes de OpenAI, creados en el primer uso (importar openai es lento)
+client = None
+async_client = None
+
+def get_client():
+    """
+    Devuelve el cliente síncrono de OpenAI, creándolo si hace falta.
+    
+    Returns:
+        Cliente OpenAI, o None si no hay API key
+    """
+    global client
+    if client is None and OPENAI_API_KEY:
+        from bot.openai_http import create_client
+        client = create_client(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL or None)
+    return client
+
+def get_async_client():
+    """
+    Devuelve el cliente asíncrono de OpenAI, creándolo si hace falta.
+    
+    Returns:
+        Cliente AsyncOpenAI, o None si no hay API key
+    """
+    global async_client
+    if async_client is None and OPENAI_API_KEY:
+        from bot.openai_http import create_async_client
+        async_client = create_async_client(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL or None)
+    return async_client
+
+def _create_dispatcher_client():
+    """Cliente del despachador: los reintentos los hace el despachador, no el SDK."""
+    from bot.openai_http import create_async_client
+    return create_async_client(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL or None, max_retries=0)
+
+# Hilos que abren los streams síncronos con plazo (el cuerpo lo lee el hilo que llama)
+_stream_openers: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+def _create_stream(request: Dict[str, Any]) -> Any:
+    # include_usage agrega un último fragmento con el consumo de tokens
+    return get_client().chat.completions.create(**request, stream=True, stream_options={"include_usage": True})
+
+def _close_abandoned_stream(future: "concurrent.futures.Future") -> None:
+    """Cierra un stream que terminó de abrirse después de vencer el plazo."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+def open_stream(request: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+    """
+    Abre la respuesta por partes del modelo con el cliente síncrono.
+    
+    El plazo acota solo la apertura (hasta recibir la respuesta del
+    servidor), como asyncio.wait_for en la versión asíncrona: no se pasa al
+    SDK como timeout, porque allí sería el límite de cada lectura y cortaría
+    a mitad de la respuesta un stream que ya está entregando tokens.
+    
+    Args:
+        request: Argumentos de chat.completions.create
+        timeout: Segundos máximos para abrir el stream (None = sin plazo)
+        
+    Returns:
+        Stream de fragmentos de OpenAI
+        
+    Raises:
+        concurrent.futures.TimeoutError: Si el stream no se abrió a tiempo
+    """
+    global _stream_openers
+    if timeout is None:
+        return _create_stream(request)
+    if _stream_openers is None:
+        _stream_openers = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="openai-stream")
+    future = _stream_openers.submit(_create_stream, request)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        future.add_done_callback(_close_abandoned_stream)
+        raise concurrent.futures.TimeoutError("El modelo no abrió la respuesta por partes antes del plazo") from None
+
+# Todas las llamadas sin stream al modelo pasan por el despachador (límites, prioridad y agrupación)
+dispatcher = LLMDispatcher(
+    client_factory=_create_dispatcher_client,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_retries=LLM_MAX_RETRIES,
+    retry_max_wait=LLM_RETRY_MAX_WAIT
+)
+
+# Mensajes recientes en los que un handoff da prioridad a la conversación
+HANDOFF_PRIORITY_WINDOW = 6
+
+# Caché de respuestas del modelo compartida por todas las conversaciones
+completion_cache = CompletionCache(
+    mode=COMPLETION_CACHE_MODE,
+    max_items=COMPLETION_CACHE_SIZE,
+    ttl=COMPLETION_CACHE_TTL_SECONDS,
+    db_path=COMPLETION_CACHE_DB_PATH or None
+)
+
+# Caché semántica para preguntas casi duplicadas (no considera el historial)
+semantic_cache = None
+if SEMANTIC_CACHE_ENABLED:
+    # NumPy solo se importa si la caché semántica está activada
+    from bot.semantic_cache import SemanticCache
+    semantic_cache = SemanticCache(
+        capacity=SEMANTIC_CACHE_CAPACITY,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        ttl=SEMANTIC_CACHE_TTL_SECONDS or None
+    )
+
+# Registro de conversaciones solo de anexado (lo escribe un hilo en segundo plano)
+conversation_log: Optional[ConversationLog] = None
+if CONVERSATION_LOG_PATH:
+    conversation_log = open_log(
+        CONVERSATION_LOG_PATH,
+        fsync_interval=CONVERSATION_LOG_FSYNC_SECONDS,
+        max_bytes=CONVERSATION_LOG_MAX_BYTES,
+        max_age=CONVERSATION_LOG_MAX_AGE_SECONDS
+    )
+
+# Métricas del flujo de respuesta (se exponen en /metrics)
+STAGE_SECONDS = REGISTRY.histogram(
+    "tixobot_stage_seconds", "Duración de cada etapa del flujo de respuesta en segundos", ["stage"]
+)
+RESPONSE_SECONDS = REGISTRY.histogram(
+    "tixobot_response_seconds", "Duración total de una respuesta en segundos", ["method"]
+)
+RESPONSES_TOTAL = REGISTRY.counter(
+    "tixobot_responses_total", "Respuestas según la etapa que respondió", ["stage"]
+)
+FAQ_CONFIDENCE = REGISTRY.histogram(
+    "tixobot_faq_confidence", "Confianza de la mejor coincidencia de FAQ",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+OPENAI_TOKENS = REGISTRY.counter(
+    "tixobot_openai_tokens_total", "Tokens consumidos en la API de OpenAI", ["type"]
+)
+OPENAI_ERRORS = REGISTRY.counter(
+    "tixobot_openai_errors_total", "Errores de la API de OpenAI por tipo de excepción", ["error"]
+)
+
+def record_usage(usage: Any) -> None:
+    """
+    Suma a las métricas los tokens informados por la API de OpenAI.
+    
+    Args:
+        usage: Campo usage de la respuesta (puede ser None)
+    """
+    if usage is None:
+        return
+    OPENAI_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, type="prompt")
+    OPENAI_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, type="completion")
+
+def record_openai_error(error: Exception) -> None:
+    """
+    Registra un error de la API de OpenAI.
+    
+    Args:
+        error: Excepción producida
+    """
+    OPENAI_ERRORS.inc(error=type(error).__name__)
+    logger.warning("Error al generar respuesta con OpenAI: %s", error,
+                   extra={"stage": "llm", "error": type(error).__name__})
+
+# Notificador de handoff en segundo plano (se crea con la primera solicitud)
+_handoff_notifier: Optional[HandoffNotifier] = None
+
+def get_handoff_notifier() -> HandoffNotifier:
+    """
+    Devuelve el notificador de handoff compartido, creándolo si hace falta.
+    
+    Returns:
+        Notificador con cola persistente
+    """
+    global _handoff_notifier
+    if _handoff_notifier is None:
+        _handoff_notifier = HandoffNotifier(HANDOFF_QUEUE_PATH, digest_threshold=HANDOFF_DIGEST_THRESHOLD,
+                                            sent_retention=HANDOFF_SENT_RETENTION_SECONDS)
+    return _handoff_notifier
+
+def warm_up() -> None:
+    """
+    Crea por adelantado los recursos que comparten todas las conversaciones
+    del proceso: el cliente de OpenAI (con su pool de conexiones HTTP), el
+    hilo del despachador y los puntuadores TF-IDF o los correctores
+    ortográficos de las FAQs, para que no los pague el primer mensaje de un
+    usuario. Si el correo está configurado, también inicia el notificador de
+    handoff, que reanuda las alertas que quedaron pendientes al reiniciar.
+    """
+    if OPENAI_API_KEY:
+        # El SDK importa los recursos (y sus modelos) en el primer acceso
+        get_client().chat.completions
+        dispatcher.start()
+    if get_email_settings()["password"]:
+        get_handoff_notifier().start()
+    index = FAQ_INDEX.get()
+    for language in index.by_language:
+        if FAQ_SCORER == "tfidf":
+            get_tfidf_scorer(language, index)
+        else:
+            index.speller(language)
 
 class TixOBot:
     """Clase principal del asistente Tix-o-bot."""
@@ -31,10 +278,88 @@ class TixOBot:
         self.name = name
         self.persona = persona
         self.default_language = default_language
-        self.conversation_history: List[Dict[str, str]] = []
+        # Historial compacto; se lee como una lista de diccionarios {"role", "content"}
+        self.conversation_history = CompactHistory(maxlen=HISTORY_MAX_MESSAGES)
+        # Contexto con presupuesto de tokens que se envía al modelo
+        self.context = ConversationContext(CONTEXT_TOKEN_BUDGET, CONTEXT_MAX_TURNS, CONTEXT_SUMMARY_TOKENS)
         self.last_response = ""  # Almacenar la última respuesta para evitar duplicados
         self.user_id = user_id
+        # Estado del turno en curso: inicio (para el plazo), idioma y mejor FAQ por debajo del umbral
+        self._turn_started = 0.0
+        self._turn_language = default_language
+        self._faq_candidate: Optional[Tuple[str, float]] = None
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Exporta el estado de la conversación en un formato serializable.
+
+        Returns:
+            Diccionario con el estado de la sesión
+        """
+        return {
+            "user_id": self.user_id,
+            "default_language": self.default_language,
+            "conversation_history": list(self.conversation_history),
+            "context": self.context.to_state(),
+            "last_response": self.last_response,
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restaura el estado de la conversación exportado con to_state.
+
+        Args:
+            state: Diccionario con el estado de la sesión
+        """
+        self.user_id = state.get("user_id", self.user_id)
+        self.default_language = state.get("default_language", self.default_language)
+        self.conversation_history = CompactHistory(state.get("conversation_history", []), maxlen=HISTORY_MAX_MESSAGES)
+        if "context" in state:
+            self.context.load_state(state["context"])
+        else:
+            # Estados guardados antes de existir el contexto
+            self.context.clear()
+            for entry in self.conversation_history:
+                self.context.add(entry.get("role", "user"), entry.get("content", ""))
+        self.last_response = state.get("last_response", "")
+
+    def _append_history(self, role: str, content: str, shared: bool = False) -> None:
+        """
+        Registra un mensaje en el historial y en el contexto del modelo.
+        
+        El historial conserva solo los últimos HISTORY_MAX_MESSAGES mensajes.
         
+        Args:
+            role: Rol del mensaje ("user", "assistant" o "system")
+            content: Texto del mensaje
+            shared: True si es una respuesta fija del bot (FAQ, palabra clave,
+                handoff o respaldo) que se repite entre sesiones
+        """
+        if shared:
+            # Las respuestas fijas se internan para que todas las sesiones compartan
+            # un solo objeto (el índice binario de FAQs crea un str nuevo en cada
+            # lectura); los mensajes del usuario y del modelo no se repiten y se
+            # guardan tal cual
+            content = sys.intern(content)
+        self.conversation_history.add(role, content)
+        self.context.add(role, content)
+        if conversation_log is not None:
+            conversation_log.append({
+                "conversation_id": self.user_id,
+                "language": self._turn_language,
+                "role": role,
+                "content": content,
+            })
+
+    def memory_usage(self) -> int:
+        """
+        Estima la memoria ocupada por el estado de la conversación.
+        
+        Returns:
+            Tamaño aproximado en bytes
+        """
+        return self.conversation_history.memory_usage() + self.context.memory_usage() + sys.getsizeof(self.last_response)
+
     def get_welcome_message(self, language: Optional[str] = None) -> str:
         """
         Devuelve el mensaje de bienvenida del bot.
@@ -61,83 +386,150 @@ class TixOBot:
         Returns:
             True si el usuario quiere hablar con un humano
         """
-        message = message.lower()
-        
-        human_keywords = {
-            "es": ["agente humano", "persona real", "hablar con alguien", "hablar con una persona", 
-                  "representante", "servicio al cliente", "hablar con un humano", "hablar con un agente"],
-            "en": ["human agent", "real person", "talk to someone", "talk to a person",
-                  "representative", "customer service", "talk to a human", "talk to an agent"]
-        }
+        with STAGE_SECONDS.time(stage="handoff_check"):
+            return RULES.get().is_handoff_request(message, language)
+    
+    def _is_duplicate_message(self, user_message: str) -> bool:
+        """
+        Verifica si el mensaje es idéntico al último mensaje del usuario.
         
-        return any(keyword in message for keyword in human_keywords.get(language, []))
+        Args:
+            user_message: Mensaje del usuario
+            
+        Returns:
+            True si el mensaje ya fue procesado
+        """
+        return bool(self.conversation_history) and \
+            self.conversation_history[-1].get("role") == "user" and \
+            self.conversation_history[-1].get("content") == user_message
     
-    def get_response(self, user_message: str, language: Optional[str] = None) -> str:
+    def _start_turn(self, user_message: str, language: Optional[str]) -> Tuple[str, Optional[str]]:
         """
-        Genera una respuesta basada en el mensaje del usuario.
+        Prepara un turno: descarta mensajes vacíos o repetidos y registra el
+        mensaje del usuario en el historial.
         
         Args:
             user_message: Mensaje del usuario
             language: Código de idioma ("es" o "en")
             
         Returns:
-            Respuesta generada
+            Tuple con el idioma a usar y la respuesta final si el turno ya terminó
+            (None si hay que seguir procesando el mensaje)
         """
+        lang = language or self.default_language
+        self._turn_started = time.monotonic()
+        self._turn_language = lang
+        self._faq_candidate = None
+        
         # Evitar procesar mensajes vacíos
         if not user_message.strip():
-            return ""
-            
-        lang = language or self.default_language
+            RESPONSES_TOTAL.inc(stage="empty")
+            return lang, ""
         
         # Evitar duplicar el último mensaje del usuario si es idéntico
-        if self.conversation_history and \
-           self.conversation_history[-1].get("role") == "user" and \
-           self.conversation_history[-1].get("content") == user_message:
-            return self.last_response
+        with STAGE_SECONDS.time(stage="dedup"):
+            duplicate = self._is_duplicate_message(user_message)
+        if duplicate:
+            RESPONSES_TOTAL.inc(stage="duplicate")
+            return lang, self.last_response
             
-        self.conversation_history.append({"role": "user", "content": user_message})
+        self._append_history("user", user_message)
+        return lang, None
+    
+    def _handle_handoff(self, user_message: str, lang: str) -> str:
+        """
+        Notifica al soporte que el usuario quiere hablar con un humano.
         
-        if self._check_for_human_handoff_request(user_message, lang):
-            # Enviar correo de notificación al soporte PRIMERO
-            try:
-                success, message = send_handoff_email(
+        La alerta se encola y la envía un hilo en segundo plano, así que la
+        respuesta no espera al servidor de correo (tampoco en las rutas
+        asíncronas).
+        
+        Args:
+            user_message: Mensaje del usuario
+            lang: Código de idioma
+            
+        Returns:
+            Respuesta para el usuario
+        """
+        RESPONSES_TOTAL.inc(stage="handoff")
+        try:
+            with STAGE_SECONDS.time(stage="handoff"):
+                success, message = get_handoff_notifier().enqueue(
                     user_message=user_message,
                     language=lang,
                     conversation_history=self.conversation_history,
                     user_id=self.user_id
                 )
-                
-                # Decidir la respuesta basándose en si el email fue exitoso
-                if success:
-                    print(f"✅ {message}")
-                    response = HUMAN_HANDOFF_MESSAGES.get(lang, HUMAN_HANDOFF_MESSAGES["es"])
-                    # Registrar el éxito en el historial interno
-                    notification_status = f"[Sistema: Notificación de handoff enviada - {format_time()}]"
-                else:
-                    print(f"⚠️ {message}")
-                    if "EMAIL_PASS" in message:
-                        # Email not configured - provide alternative response
-                        response = "Lo siento, el sistema de transferencia a agentes humanos no está disponible en este momento. Por favor, contacta directamente a soporte en info@tix.do"
-                    else:
-                        # Other email error
-                        response = "Hubo un problema al procesar tu solicitud. Por favor, intenta nuevamente o contacta a soporte directamente en info@tix.do"
-                    
-                    # Registrar el fallo en el historial interno
-                    notification_status = f"[Sistema: Notificación de handoff fallida - {format_time()}]"
-                
-                # Ahora agregar la respuesta final al historial
-                self.conversation_history.append({"role": "assistant", "content": response})
-                self.conversation_history.append({"role": "system", "content": notification_status})
-                self.last_response = response
-                    
-            except Exception as e:
-                print(f"❌ Error inesperado al procesar la solicitud de handoff: {str(e)}")
-                response = "Hubo un error inesperado. Por favor, contacta a soporte directamente en info@tix.do"
-                self.conversation_history.append({"role": "assistant", "content": response})
-                self.last_response = response
-                
-            return response
-
+            return self._finish_handoff(success, message, lang)
+        except Exception as e:
+            return self._handoff_error(e)
+    
+    def _finish_handoff(self, success: bool, message: str, lang: str) -> str:
+        """
+        Construye la respuesta de handoff según el resultado de la notificación.
+        
+        Args:
+            success: Si la notificación al soporte fue enviada
+            message: Mensaje de estado de la notificación
+            lang: Código de idioma
+            
+        Returns:
+            Respuesta para el usuario
+        """
+        # Decidir la respuesta basándose en si la notificación fue aceptada
+        if success:
+            logger.info(message, extra={"session_id": self.user_id, "stage": "handoff"})
+            response = HUMAN_HANDOFF_MESSAGES.get(lang, HUMAN_HANDOFF_MESSAGES["es"])
+            # Registrar el éxito en el historial interno
+            notification_status = f"[Sistema: Notificación de handoff en cola - {format_time()}]"
+        else:
+            logger.warning(message, extra={"session_id": self.user_id, "stage": "handoff"})
+            if "EMAIL_PASS" in message:
+                # Email not configured - provide alternative response
+                response = "Lo siento, el sistema de transferencia a agentes humanos no está disponible en este momento. Por favor, contacta directamente a soporte en info@tix.do"
+            else:
+                # Other email error
+                response = "Hubo un problema al procesar tu solicitud. Por favor, intenta nuevamente o contacta a soporte directamente en info@tix.do"
+            
+            # Registrar el fallo en el historial interno
+            notification_status = f"[Sistema: Notificación de handoff fallida - {format_time()}]"
+        
+        # Ahora agregar la respuesta final al historial
+        self._append_history("assistant", response, shared=True)
+        self._append_history("system", notification_status)
+        self.last_response = response
+        return response
+    
+    def _handoff_error(self, error: Exception) -> str:
+        """
+        Construye la respuesta cuando el handoff falla inesperadamente.
+        
+        Args:
+            error: Excepción producida
+            
+        Returns:
+            Respuesta para el usuario
+        """
+        logger.error("Error inesperado al procesar la solicitud de handoff: %s", error,
+                     exc_info=error, extra={"session_id": self.user_id, "stage": "handoff"})
+        response = "Hubo un error inesperado. Por favor, contacta a soporte directamente en info@tix.do"
+        self._append_history("assistant", response, shared=True)
+        self.last_response = response
+        return response
+    
+    def _local_response(self, user_message: str, lang: str,
+                        faq_result: Optional[Tuple[Optional[str], float]] = None) -> Optional[str]:
+        """
+        Intenta responder sin el modelo: FAQs y respuestas por palabra clave.
+        
+        Args:
+            user_message: Mensaje del usuario
+            lang: Código de idioma
+            faq_result: Resultado de find_best_faq_match ya calculado (por ejemplo, en lote)
+            
+        Returns:
+            Respuesta encontrada, o None si hay que consultar al modelo
+        """
         # Evitar buscar coincidencias de FAQ si el mensaje es demasiado similar a la última respuesta del bot
         # para evitar la recursión infinita
         should_check_faq = True
@@ -148,80 +540,549 @@ class TixOBot:
         confidence = 0.0
         
         if should_check_faq:
-            faq_match_confidence = find_best_faq_match(user_message, lang)
-            print(f"DEBUG - faq_match_confidence: {faq_match_confidence}")
+            started = time.perf_counter()
+            if faq_result is not None:
+                faq_match_confidence = faq_result
+            else:
+                with STAGE_SECONDS.time(stage="faq"):
+                    faq_match_confidence = find_best_faq_match(user_message, lang)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Coincidencia de FAQ: %s", faq_match_confidence,
+                             extra={"session_id": self.user_id, "stage": "faq",
+                                    "latency_ms": round((time.perf_counter() - started) * 1000, 3)})
 
             if isinstance(faq_match_confidence, tuple):
                 faq_match, confidence = faq_match_confidence
                 if isinstance(confidence, tuple):
                     confidence = confidence[0] if confidence else 0.0
+                FAQ_CONFIDENCE.observe(float(confidence))
 
         if faq_match and isinstance(confidence, float) and confidence > 0.7:
             # Evitar devolver la misma respuesta que acabamos de dar
             if faq_match != self.last_response:
                 response = faq_match
-                self.conversation_history.append({"role": "assistant", "content": response})
+                self._append_history("assistant", response, shared=True)
                 self.last_response = response
+                RESPONSES_TOTAL.inc(stage="faq")
                 return response
+        elif faq_match and isinstance(confidence, float):
+            # Candidata por si el modelo no responde a tiempo
+            self._faq_candidate = (faq_match, confidence)
 
-        simple_responses = {
-            "es": {
-                "hola": "¡Hola, gracias por contactarnos! te asiste Camila. ¿En qué puedo ayudarte hoy con Tix.do?",
-                "gracias": "¡De nada! Estoy aquí para ayudarte con todo lo relacionado a Tix.do.",
-                "adios": "¡Chao! Gracias por contactarnos. ¡Que disfrutes tus eventos!",
-                "ayuda": "Puedo ayudarte con información sobre eventos, entradas, reembolsos y más. ¿Qué necesitas saber?",
-                "evento": "Tix.do tiene muchos eventos increíbles. ¿Buscas algo específico como conciertos, teatro o deportes?"
-            },
-            "en": {
-                "hello": "Hi there! How can I help you with Tix.do today?",
-                "thanks": "You're welcome! I'm here to help with all things Tix.do.",
-                "bye": "Goodbye! Thanks for contacting us. Enjoy your events!",
-                "help": "I can help you with information about events, tickets, refunds and more. What do you need to know?",
-                "event": "Tix.do has many amazing events. Are you looking for something specific like concerts, theater, or sports?"
-            }
+        with STAGE_SECONDS.time(stage="keywords"):
+            simple_matches = RULES.get().simple_matches(user_message, lang)
+        for _, response in simple_matches:
+            # No repetir la misma respuesta que acabamos de dar
+            if response != self.last_response:
+                RESPONSES_TOTAL.inc(stage="keyword")
+                self._append_history("assistant", response, shared=True)
+                self.last_response = response
+                return response
+        
+        return None
+    
+    def _llm_available(self) -> bool:
+        """Indica si la API de OpenAI está configurada y se puede llamar."""
+        if completion_cache.replay_only:
+            return False
+        return bool(OPENAI_API_KEY and len(OPENAI_API_KEY) > 10)
+    
+    def _llm_priority(self) -> int:
+        """
+        Prioridad de la conversación en la cola del despachador.
+        
+        Returns:
+            PRIORITY_HANDOFF si hubo un handoff en los mensajes recientes, si no PRIORITY_NORMAL
+        """
+        for entry in self.conversation_history[-HANDOFF_PRIORITY_WINDOW:]:
+            if entry["role"] == "system" and "handoff" in entry["content"]:
+                return PRIORITY_HANDOFF
+        return PRIORITY_NORMAL
+    
+    def _llm_deadline(self) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Calcula el plazo y el retraso de cobertura de la llamada al modelo de este turno.
+        
+        Returns:
+            Tuple (segundos que quedan hasta el plazo o None si no hay plazo,
+            segundos tras los que lanzar la petición de cobertura o None)
+        """
+        timeout = None
+        if RESPONSE_DEADLINE_SECONDS > 0:
+            elapsed = time.monotonic() - self._turn_started
+            timeout = max(0.0, RESPONSE_DEADLINE_SECONDS - RESPONSE_DEADLINE_MARGIN_SECONDS - elapsed)
+        hedge_after = None
+        if LLM_HEDGE_PERCENTILE > 0:
+            hedge_after = dispatcher.latency_percentile(LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES)
+        return timeout, hedge_after
+    
+    def _cached_completion(self, request: Dict[str, Any], lang: str, user_message: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Busca la respuesta del modelo en la caché exacta y luego en la semántica.
+        
+        Args:
+            request: Argumentos de chat.completions.create
+            lang: Código de idioma
+            user_message: Mensaje del usuario
+            
+        Returns:
+            Tuple con la clave de caché (None si la caché está apagada) y la
+            respuesta almacenada (None si no hay)
+        """
+        cache_key = None
+        cached = None
+        with STAGE_SECONDS.time(stage="cache"):
+            if completion_cache.enabled:
+                cache_key = completion_cache.make_key(request, lang, user_message)
+                cached = completion_cache.get(cache_key)
+            if cached is None and semantic_cache is not None and self._context_free(request):
+                cached = semantic_cache.lookup(user_message, lang)
+        return cache_key, cached
+    
+    @staticmethod
+    def _context_free(request: Dict[str, Any]) -> bool:
+        """
+        Indica si la petición no lleva contexto de la conversación (solo la
+        personalidad y el mensaje del usuario).
+        
+        La caché semántica se indexa solo por el mensaje, así que únicamente
+        se usa en estos casos: una respuesta que depende de turnos anteriores
+        no sirve para el primer mensaje parecido de otro usuario.
+        
+        Args:
+            request: Argumentos de chat.completions.create
+            
+        Returns:
+            True si es el primer turno de la conversación
+        """
+        return len(request["messages"]) <= 2
+    
+    def _remember_completion(self, request: Dict[str, Any], cache_key: Optional[str], lang: str,
+                             user_message: str, bot_response: str) -> None:
+        """
+        Guarda una respuesta nueva del modelo en las cachés.
+        
+        Args:
+            request: Argumentos de la llamada que produjo la respuesta
+            cache_key: Clave de la caché exacta (None si está apagada)
+            lang: Código de idioma
+            user_message: Mensaje del usuario
+            bot_response: Respuesta del modelo
+        """
+        if cache_key:
+            completion_cache.set(cache_key, bot_response)
+        if semantic_cache is not None and bot_response and self._context_free(request):
+            semantic_cache.add(user_message, lang, bot_response)
+    
+    def _completion_request(self, lang: str) -> Dict[str, Any]:
+        """
+        Construye los parámetros de la llamada a chat.completions.create.
+        
+        Args:
+            lang: Código de idioma
+            
+        Returns:
+            Argumentos de la llamada
+        """
+        # Personalidad, resumen de los turnos antiguos y turnos recientes dentro del presupuesto
+        messages = self.context.messages(self.persona.get(lang, self.persona["es"]))
+        return {
+            "model": GPT_MODEL,
+            "messages": messages,
+            "max_tokens": MAX_TOKENS,
+            "temperature": TEMPERATURE,
         }
+    
+    def _accept_completion(self, bot_response: str) -> Optional[str]:
+        """
+        Registra la respuesta del modelo si no repite la anterior.
         
-        message_lower = user_message.lower()
-        for keyword, response in simple_responses.get(lang, simple_responses["es"]).items():
-            if keyword in message_lower:
-                # No repetir la misma respuesta que acabamos de dar
-                if response != self.last_response:
-                    self.conversation_history.append({"role": "assistant", "content": response})
-                    self.last_response = response
-                    return response
-
-        # Try OpenAI API if available
-        if client and OPENAI_API_KEY and len(OPENAI_API_KEY) > 10:
-            try:
-                messages = [
-                    {"role": "system", "content": self.persona.get(lang, self.persona["es"])}
-                ]
-                messages.extend(self.conversation_history[-5:])
-
-                response = client.chat.completions.create(
-                    model=GPT_MODEL,
-                    messages=messages,
-                    max_tokens=MAX_TOKENS,
-                    temperature=TEMPERATURE,
-                )
-                bot_response = response.choices[0].message.content.strip()
-                
-                # Verificar que no estamos devolviendo la misma respuesta que antes
-                if bot_response != self.last_response:
-                    self.conversation_history.append({"role": "assistant", "content": bot_response})
-                    self.last_response = bot_response
-                    return bot_response
-
-            except Exception as e:
-                print(f"Error al generar respuesta con OpenAI: {str(e)}")
-
+        Args:
+            bot_response: Texto de la respuesta del modelo
+            
+        Returns:
+            Respuesta del modelo, o None si se debe usar el mensaje de respaldo
+        """
+        bot_response = bot_response.strip()
+        
+        # Verificar que no estamos devolviendo la misma respuesta que antes
+        if bot_response != self.last_response:
+            self._append_history("assistant", bot_response)
+            self.last_response = bot_response
+            return bot_response
+        return None
+    
+    def _accept_streamed(self, bot_response: str) -> None:
+        """
+        Registra en el historial una respuesta del modelo recibida por partes.
+        
+        Args:
+            bot_response: Texto completo recibido
+        """
+        bot_response = bot_response.strip()
+        self._append_history("assistant", bot_response)
+        self.last_response = bot_response
+    
+    def _degraded_response(self, user_message: str, lang: str) -> str:
+        """
+        Responde sin el modelo cuando falló o no llegó a tiempo.
+        
+        Usa la mejor FAQ del turno aunque no haya llegado al umbral normal,
+        siempre que alcance DEGRADED_FAQ_MIN_CONFIDENCE; si no, el mensaje de
+        respaldo.
+        
+        Args:
+            user_message: Mensaje del usuario
+            lang: Código de idioma
+            
+        Returns:
+            Respuesta degradada
+        """
+        if self._faq_candidate is not None:
+            faq_match, confidence = self._faq_candidate
+            if confidence >= DEGRADED_FAQ_MIN_CONFIDENCE and faq_match != self.last_response:
+                RESPONSES_TOTAL.inc(stage="faq_degraded")
+                self._append_history("assistant", faq_match, shared=True)
+                self.last_response = faq_match
+                return faq_match
+        return self._fallback_response(user_message, lang)
+    
+    def _fallback_response(self, user_message: str, lang: str) -> str:
+        """
+        Devuelve el mensaje de respaldo cuando ninguna etapa pudo responder.
+        
+        Args:
+            user_message: Mensaje del usuario
+            lang: Código de idioma
+            
+        Returns:
+            Respuesta de respaldo
+        """
         generic_responses = FALLBACK_MESSAGES.get(lang, FALLBACK_MESSAGES["es"])
+        # Cada idioma puede tener un solo mensaje o una lista de variantes
+        if isinstance(generic_responses, str):
+            generic_responses = [generic_responses]
         selected_response = generic_responses[len(user_message) % len(generic_responses)]
 
         # Asegurarse de no repetir la última respuesta
         if selected_response == self.last_response and len(generic_responses) > 1:
             selected_response = generic_responses[(len(user_message) + 1) % len(generic_responses)]
 
-        self.conversation_history.append({"role": "assistant", "content": selected_response})
+        RESPONSES_TOTAL.inc(stage="fallback")
+        self._append_history("assistant", selected_response, shared=True)
         self.last_response = selected_response
-        return selected_response
\ No newline at end of file
+        return selected_response
+    
+    @timed(RESPONSE_SECONDS, method="get_response")
+    def get_response(self, user_message: str, language: Optional[str] = None,
+                     faq_result: Optional[Tuple[Optional[str], float]] = None) -> str:
+        """
+        Genera una respuesta basada en el mensaje del usuario.
+        
+        Args:
+            user_message: Mensaje del usuario
+            language: Código de idioma ("es" o "en")
+            faq_result: Resultado de find_best_faq_match ya calculado (opcional)
+            
+        Returns:
+            Respuesta generada
+        """
+        lang, response = self._start_turn(user_message, language)
+        if response is not None:
+            return response
+        
+        if self._check_for_human_handoff_request(user_message, lang):
+            return self._handle_handoff(user_message, lang)
+
+        response = self._local_response(user_message, lang, faq_result)
+        if response is not None:
+            return response
+
+        request = self._completion_request(lang)
+        cache_key, cached = self._cached_completion(request, lang, user_message)
+        if cached is not None:
+            response = self._accept_completion(cached)
+            if response is not None:
+                RESPONSES_TOTAL.inc(stage="cache")
+                return response
+
+        # Try OpenAI API if available
+        elif self._llm_available():
+            timeout, hedge_after = self._llm_deadline()
+            try:
+                with STAGE_SECONDS.time(stage="openai"):
+                    completion = dispatcher.complete(request, self._llm_priority(), timeout, hedge_after)
+                record_usage(getattr(completion, "usage", None))
+                bot_response = completion.choices[0].message.content.strip()
+                self._remember_completion(request, cache_key, lang, user_message, bot_response)
+                response = self._accept_completion(bot_response)
+                if response is not None:
+                    RESPONSES_TOTAL.inc(stage="openai")
+                    return response
+            except Exception as e:
+                record_openai_error(e)
+                return self._degraded_response(user_message, lang)
+
+        return self._fallback_response(user_message, lang)
+    
+    @timed(RESPONSE_SECONDS, method="async_get_response")
+    async def async_get_response(self, user_message: str, language: Optional[str] = None,
+                                 faq_result: Optional[Tuple[Optional[str], float]] = None,
+                                 llm_semaphore: Optional[asyncio.Semaphore] = None,
+                                 priority: Optional[int] = None) -> str:
+        """
+        Versión asíncrona de get_response que no bloquea el event loop.
+        
+        La llamada a OpenAI usa AsyncOpenAI, la búsqueda de FAQs y palabras
+        clave se ejecuta en un hilo y la notificación de handoff se envía de
+        forma asíncrona.
+        
+        Args:
+            user_message: Mensaje del usuario
+            language: Código de idioma ("es" o "en")
+            faq_result: Resultado de find_best_faq_match ya calculado (opcional)
+            llm_semaphore: Semáforo que limita las llamadas simultáneas al modelo
+            priority: Prioridad en el despachador (por defecto, según la conversación)
+            
+        Returns:
+            Respuesta generada
+        """
+        lang, response = self._start_turn(user_message, language)
+        if response is not None:
+            return response
+        
+        if self._check_for_human_handoff_request(user_message, lang):
+            return self._handle_handoff(user_message, lang)
+
+        if faq_result is not None:
+            response = self._local_response(user_message, lang, faq_result)
+        else:
+            response = await asyncio.to_thread(self._local_response, user_message, lang)
+        if response is not None:
+            return response
+
+        request = self._completion_request(lang)
+        cache_key, cached = self._cached_completion(request, lang, user_message)
+        if cached is not None:
+            response = self._accept_completion(cached)
+            if response is not None:
+                RESPONSES_TOTAL.inc(stage="cache")
+                return response
+
+        elif self._llm_available():
+            try:
+                async with llm_semaphore or nullcontext():
+                    # El plazo cuenta desde el inicio del turno, incluida la espera del semáforo
+                    timeout, hedge_after = self._llm_deadline()
+                    with STAGE_SECONDS.time(stage="openai"):
+                        completion = await dispatcher.acomplete(
+                            request, self._llm_priority() if priority is None else priority,
+                            timeout, hedge_after
+                        )
+                record_usage(getattr(completion, "usage", None))
+                bot_response = completion.choices[0].message.content.strip()
+                self._remember_completion(request, cache_key, lang, user_message, bot_response)
+                response = self._accept_completion(bot_response)
+                if response is not None:
+                    RESPONSES_TOTAL.inc(stage="openai")
+                    return response
+            except Exception as e:
+                record_openai_error(e)
+                return self._degraded_response(user_message, lang)
+
+        return self._fallback_response(user_message, lang)
+    
+    def get_responses(self, messages: Sequence[str], language: Optional[str] = None) -> List[str]:
+        """
+        Responde una serie de mensajes de la misma conversación.
+        
+        La búsqueda de FAQs de todos los mensajes se hace en un solo lote con
+        find_best_faq_matches; el resto del flujo se aplica mensaje por mensaje.
+        
+        Args:
+            messages: Mensajes del usuario en orden
+            language: Código de idioma ("es" o "en")
+            
+        Returns:
+            Respuestas en el mismo orden
+        """
+        lang = language or self.default_language
+        faq_results = find_best_faq_matches(list(messages), lang, scorer=BATCH_FAQ_SCORER or None)
+        return [self.get_response(message, lang, faq_result) for message, faq_result in zip(messages, faq_results)]
+    
+    async def async_get_responses(self, messages: Sequence[str], language: Optional[str] = None,
+                                  llm_semaphore: Optional[asyncio.Semaphore] = None,
+                                  priority: Optional[int] = None) -> List[str]:
+        """
+        Versión asíncrona de get_responses.
+        
+        Args:
+            messages: Mensajes del usuario en orden
+            language: Código de idioma ("es" o "en")
+            llm_semaphore: Semáforo que limita las llamadas simultáneas al modelo
+            priority: Prioridad en el despachador (por defecto, según la conversación)
+            
+        Returns:
+            Respuestas en el mismo orden
+        """
+        lang = language or self.default_language
+        faq_results = await asyncio.to_thread(find_best_faq_matches, list(messages), lang, BATCH_FAQ_SCORER or None)
+        responses = []
+        for message, faq_result in zip(messages, faq_results):
+            responses.append(await self.async_get_response(message, lang, faq_result, llm_semaphore, priority))
+        return responses
+    
+    def stream_response(self, user_message: str, language: Optional[str] = None) -> Iterator[str]:
+        """
+        Genera la respuesta por partes a medida que está disponible.
+        
+        Las respuestas de FAQs, palabras clave, handoff y respaldo se entregan
+        de inmediato en un solo fragmento; las del modelo se reenvían token a
+        token (stream=True).
+        
+        Args:
+            user_message: Mensaje del usuario
+            language: Código de idioma ("es" o "en")
+            
+        Yields:
+            Fragmentos de la respuesta
+        """
+        lang, response = self._start_turn(user_message, language)
+        if response is not None:
+            if response:
+                yield response
+            return
+        
+        if self._check_for_human_handoff_request(user_message, lang):
+            yield self._handle_handoff(user_message, lang)
+            return
+
+        response = self._local_response(user_message, lang)
+        if response is not None:
+            yield response
+            return
+
+        request = self._completion_request(lang)
+        cache_key, cached = self._cached_completion(request, lang, user_message)
+        if cached is not None:
+            response = self._accept_completion(cached)
+            if response is not None:
+                RESPONSES_TOTAL.inc(stage="cache")
+                yield response
+                return
+
+        elif self._llm_available():
+            parts: List[str] = []
+            completed = False
+            started = time.perf_counter()
+            # Con plazo, este acota la espera del turno y la apertura del stream; una
+            # vez que llegan los tokens, el cuerpo se lee con el timeout normal del cliente
+            timeout, _ = self._llm_deadline()
+            try:
+                # El stream lo consume este hilo; el despachador solo reserva turno y presupuesto
+                dispatcher.admit(request, self._llm_priority(), timeout)
+                if timeout is not None:
+                    timeout, _ = self._llm_deadline()
+                stream = open_stream(request, timeout)
+                for chunk in stream:
+                    record_usage(getattr(chunk, "usage", None))
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta and (parts or delta.strip()):
+                        parts.append(delta)
+                        yield delta
+                completed = True
+            except Exception as e:
+                record_openai_error(e)
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="openai")
+            if parts:
+                RESPONSES_TOTAL.inc(stage="openai")
+                bot_response = "".join(parts).strip()
+                if completed:
+                    self._remember_completion(request, cache_key, lang, user_message, bot_response)
+                self._accept_streamed(bot_response)
+                return
+            yield self._degraded_response(user_message, lang)
+            return
+
+        yield self._fallback_response(user_message, lang)
+    
+    async def _open_stream(self, request: Dict[str, Any]) -> AsyncIterator[Any]:
+        """
+        Espera turno en el despachador y abre la respuesta por partes del modelo.
+        
+        Args:
+            request: Argumentos de chat.completions.create
+            
+        Returns:
+            Stream de fragmentos de AsyncOpenAI
+        """
+        await dispatcher.aadmit(request, self._llm_priority())
+        # include_usage agrega un último fragmento con el consumo de tokens
+        return await get_async_client().chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True}
+        )
+    
+    async def astream_response(self, user_message: str, language: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Versión asíncrona de stream_response basada en AsyncOpenAI.
+        
+        Args:
+            user_message: Mensaje del usuario
+            language: Código de idioma ("es" o "en")
+            
+        Yields:
+            Fragmentos de la respuesta
+        """
+        lang, response = self._start_turn(user_message, language)
+        if response is not None:
+            if response:
+                yield response
+            return
+        
+        if self._check_for_human_handoff_request(user_message, lang):
+            yield self._handle_handoff(user_message, lang)
+            return
+
+        response = await asyncio.to_thread(self._local_response, user_message, lang)
+        if response is not None:
+            yield response
+            return
+
+        request = self._completion_request(lang)
+        cache_key, cached = self._cached_completion(request, lang, user_message)
+        if cached is not None:
+            response = self._accept_completion(cached)
+            if response is not None:
+                RESPONSES_TOTAL.inc(stage="cache")
+                yield response
+                return
+
+        elif self._llm_available() and get_async_client():
+            parts: List[str] = []
+            completed = False
+            started = time.perf_counter()
+            timeout, _ = self._llm_deadline()
+            try:
+                # Con plazo, este acota la espera del turno y la apertura del stream
+                stream = await asyncio.wait_for(self._open_stream(request), timeout)
+                async for chunk in stream:
+                    record_usage(getattr(chunk, "usage", None))
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta and (parts or delta.strip()):
+                        parts.append(delta)
+                        yield delta
+                completed = True
+            except Exception as e:
+                record_openai_error(e)
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="openai")
+            if parts:
+                RESPONSES_TOTAL.inc(stage="openai")
+                bot_response = "".join(parts).strip()
+                if completed:
+                    self._remember_completion(request, cache_key, lang, user_message, bot_response)
+                self._accept_streamed(bot_response)
+                return
+            yield self._degraded_response(user_message, lang)
+            return
+
+        yield self._fallback_response(user_message, lang)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from bot.knowledge_base import clean_text
+from utils.storage import LRUTTLCache, SQLiteStore
+
+# Modos de la caché de respuestas del modelo
+CACHE_MODES = ("off", "on", "record", "replay")
+
+
+class CompletionCache:
+    """
+    Caché de respuestas de chat.completions.create.
+
+    La clave combina el modelo, el idioma, la personalidad, el mensaje del
+    usuario normalizado con clean_text y un hash de la ventana de historial
+    enviada como contexto. Las entradas viven en una caché LRU con TTL y,
+    opcionalmente, en SQLite para conservarse entre reinicios.
+
+    Modos:
+        off: la caché no se usa
+        on: lectura y escritura con expiración
+        record: lectura y escritura sin expiración (para grabar respuestas)
+        replay: solo lectura sin expiración; los fallos no llaman al modelo,
+            lo que hace las pruebas deterministas
+    """
+
+    def __init__(self, mode: str = "on", max_items: int = 5000, ttl: Optional[float] = 3600.0,
+                 db_path: Optional[str] = None):
+        """
+        Inicializa la caché.
+
+        Args:
+            mode: Modo de funcionamiento ("off", "on", "record" o "replay")
+            max_items: Máximo de respuestas en memoria
+            ttl: Segundos de vida de cada respuesta en modo "on"
+            db_path: Ruta de la base SQLite para persistir respuestas (None = solo memoria)
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Modo de caché no válido: {mode}")
+        self.mode = mode
+        self.ttl = ttl if mode == "on" else None
+        self._memory = LRUTTLCache(max_items=max_items, ttl=self.ttl)
+        self.store = SQLiteStore(db_path, table="completions") if db_path and mode != "off" else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def replay_only(self) -> bool:
+        """True si los fallos de caché no deben llamar al modelo."""
+        return self.mode == "replay"
+
+    @staticmethod
+    def make_key(request: Dict[str, Any], language: str, user_message: str) -> str:
+        """
+        Calcula la clave de caché de una petición al modelo.
+
+        Args:
+            request: Argumentos de chat.completions.create (el primer mensaje es
+                la personalidad y el último el mensaje del usuario)
+            language: Código de idioma
+            user_message: Mensaje del usuario
+
+        Returns:
+            Clave hexadecimal
+        """
+        messages: List[Dict[str, str]] = request["messages"]
+        persona = messages[0]["content"] if messages else ""
+        history = [(m.get("role"), m.get("content")) for m in messages[1:-1]]
+        history_hash = hashlib.sha256(
+            json.dumps(history, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        payload = json.dumps([
+            request.get("model"),
+            request.get("max_tokens"),
+            request.get("temperature"),
+            language,
+            hashlib.sha256(persona.encode("utf-8")).hexdigest(),
+            clean_text(user_message),
+            history_hash,
+        ], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Busca una respuesta en memoria y, si no está, en disco.
+
+        Args:
+            key: Clave de la petición
+
+        Returns:
+            Respuesta almacenada o None
+        """
+        if not self.enabled:
+            return None
+
+        response = self._memory.get(key)
+        if response is None and self.store:
+            response = self.store.get(key, max_age=self.ttl)
+            if response is not None:
+                self.disk_hits += 1
+                self._memory.set(key, response)
+
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        """
+        Guarda una respuesta del modelo.
+
+        Args:
+            key: Clave de la petición
+            response: Texto de la respuesta
+        """
+        if not self.enabled or self.replay_only:
+            return
+        self._memory.set(key, response)
+        if self.store:
+            self.store.set(key, response)
+        self.writes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve los contadores de la caché.
+
+        Returns:
+            Diccionario con aciertos, fallos, tasa de aciertos y desalojos
+        """
+        lookups = self.hits + self.misses
+        memory = self._memory.stats()
+        return {
+            "mode": self.mode,
+            "size": memory["size"],
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": memory["evictions"],
+            "expirations": memory["expirations"],
+            "persistent": self.store is not None,
+        }
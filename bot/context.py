@@ -0,0 +1,175 @@
+import sys
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# Prefijo de las entradas internas del historial que no se envían al modelo
+SYSTEM_NOTE_PREFIX = "[Sistema"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima los tokens de un texto sin cargar un tokenizador.
+
+    Usa la aproximación habitual de unos 4 caracteres por token, más uno por
+    el separador de cada mensaje.
+
+    Args:
+        text: Texto a medir
+
+    Returns:
+        Número aproximado de tokens
+    """
+    return len(text) // 4 + 1
+
+
+def _summary_line(role: str, content: str, max_chars: int) -> str:
+    speaker = "Usuario" if role == "user" else "Asistente"
+    content = " ".join(content.split())
+    if len(content) > max_chars:
+        content = content[:max_chars - 3].rstrip() + "..."
+    return f"{speaker}: {content}"
+
+
+class ConversationContext:
+    """
+    Contexto de la conversación que se envía al modelo, con presupuesto de tokens.
+
+    Los turnos recientes se guardan en un buffer circular junto con su costo
+    en tokens y un total acumulado. Cuando el total supera el presupuesto, los
+    turnos más antiguos salen del buffer y se condensan en un resumen de una
+    línea por turno, que a su vez tiene un tope de tokens. Cada operación es
+    incremental (no se recorre la conversación completa), así que el costo de
+    cada prompt y la memoria de la sesión no crecen con la duración del chat.
+    """
+
+    def __init__(self, token_budget: int = 1000, max_turns: int = 10, summary_tokens: int = 200,
+                 summary_line_chars: int = 120, count_tokens: Callable[[str], int] = estimate_tokens):
+        """
+        Inicializa el contexto vacío.
+
+        Args:
+            token_budget: Tokens máximos de los turnos recientes (sin contar la personalidad)
+            max_turns: Turnos máximos en el buffer
+            summary_tokens: Tokens máximos del resumen de turnos antiguos
+            summary_line_chars: Caracteres máximos de cada turno resumido
+            count_tokens: Función que cuenta los tokens de un texto
+        """
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summary_tokens = summary_tokens
+        self.summary_line_chars = summary_line_chars
+        self.count_tokens = count_tokens
+        self._turns: Deque[Tuple[str, str, int]] = deque()
+        self._summary: Deque[Tuple[str, int]] = deque()
+        self._turn_tokens = 0
+        self._summary_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def tokens(self) -> int:
+        """Tokens actuales de los turnos y el resumen."""
+        return self._turn_tokens + self._summary_tokens
+
+    @property
+    def summary(self) -> str:
+        """Resumen de los turnos que ya salieron del buffer."""
+        return "\n".join(line for line, _ in self._summary)
+
+    def add(self, role: str, content: str) -> None:
+        """
+        Agrega un turno y recorta los antiguos si se supera el presupuesto.
+
+        Las notas internas ("[Sistema: ...]" o rol "system") no se agregan.
+
+        Args:
+            role: Rol del mensaje ("user" o "assistant")
+            content: Texto del mensaje
+        """
+        if role == "system" or content.startswith(SYSTEM_NOTE_PREFIX):
+            return
+        tokens = self.count_tokens(content)
+        self._turns.append((role, content, tokens))
+        self._turn_tokens += tokens
+        # Siempre se conserva el último turno aunque exceda el presupuesto por sí solo
+        while len(self._turns) > 1 and (len(self._turns) > self.max_turns or self._turn_tokens > self.token_budget):
+            self._evict()
+
+    def _evict(self) -> None:
+        role, content, tokens = self._turns.popleft()
+        self._turn_tokens -= tokens
+        if self.summary_tokens <= 0:
+            return
+        line = _summary_line(role, content, self.summary_line_chars)
+        line_tokens = self.count_tokens(line)
+        self._summary.append((line, line_tokens))
+        self._summary_tokens += line_tokens
+        while self._summary and self._summary_tokens > self.summary_tokens:
+            _, dropped = self._summary.popleft()
+            self._summary_tokens -= dropped
+
+    def messages(self, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Construye la lista de mensajes para chat.completions.create.
+
+        Args:
+            system_prompt: Personalidad del asistente (primer mensaje)
+
+        Returns:
+            Personalidad, resumen de turnos antiguos (si hay) y turnos recientes
+        """
+        messages = []
+        if system_prompt is not None:
+            messages.append({"role": "system", "content": system_prompt})
+        if self._summary:
+            messages.append({"role": "system", "content": f"Resumen de la conversación anterior:\n{self.summary}"})
+        messages.extend({"role": role, "content": content} for role, content, _ in self._turns)
+        return messages
+
+    def clear(self) -> None:
+        """Vacía el contexto."""
+        self._turns.clear()
+        self._summary.clear()
+        self._turn_tokens = 0
+        self._summary_tokens = 0
+
+    def memory_usage(self) -> int:
+        """
+        Estima la memoria del contexto sin contar los textos de los turnos
+        (son los mismos objetos que guarda el historial).
+
+        Returns:
+            Tamaño aproximado en bytes
+        """
+        return (
+            sys.getsizeof(self._turns) + sum(sys.getsizeof(turn) for turn in self._turns)
+            + sys.getsizeof(self._summary) + sum(sys.getsizeof(item) + sys.getsizeof(item[0]) for item in self._summary)
+        )
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Exporta el contexto en un formato serializable.
+
+        Returns:
+            Diccionario con los turnos y las líneas del resumen
+        """
+        return {
+            "turns": [[role, content] for role, content, _ in self._turns],
+            "summary": [line for line, _ in self._summary],
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restaura el contexto exportado con to_state.
+
+        Args:
+            state: Diccionario con los turnos y las líneas del resumen
+        """
+        self.clear()
+        for line in state.get("summary", []):
+            line_tokens = self.count_tokens(line)
+            self._summary.append((line, line_tokens))
+            self._summary_tokens += line_tokens
+        for role, content in state.get("turns", []):
+            self.add(role, content)
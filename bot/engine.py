@@ -0,0 +1,67 @@
+import itertools
+import uuid
+from typing import Any, Dict
+
+import bot.assistant as assistant
+from bot.assistant import TixOBot
+from bot.knowledge_base import FAQ_INDEX
+
+
+class ChatEngine:
+    """
+    Parte compartida de Tix-o-bot para las interfaces de Streamlit.
+
+    Se crea una sola vez por proceso (con st.cache_resource) y la comparten
+    todas las sesiones del navegador: al crearla se preparan el cliente de
+    OpenAI con su pool de conexiones, el despachador y los puntuadores de
+    FAQs. Cada sesión guarda en session_state solo su TixOBot, que contiene el
+    historial y el contexto de su conversación.
+    """
+
+    def __init__(self, name: str, persona: Dict[str, str], default_language: str = "es"):
+        """
+        Prepara los recursos compartidos.
+
+        Args:
+            name: Nombre del asistente
+            persona: Descripción de la personalidad en diferentes idiomas
+            default_language: Idioma predeterminado ("es" o "en")
+        """
+        self.name = name
+        self.persona = persona
+        self.default_language = default_language
+        self._sessions = itertools.count(1)
+        self.sessions = 0
+        assistant.warm_up()
+
+    def new_session(self) -> TixOBot:
+        """
+        Crea el estado de una sesión nueva del navegador.
+
+        Cada sesión recibe un user_id propio, así que el registro de
+        conversaciones y las alertas de handoff no mezclan a los usuarios.
+
+        Returns:
+            Bot de la sesión
+        """
+        self.sessions = next(self._sessions)
+        return TixOBot(
+            name=self.name,
+            persona=self.persona,
+            default_language=self.default_language,
+            user_id=f"web-{uuid.uuid4().hex[:12]}"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve el uso de los recursos compartidos.
+
+        Returns:
+            Diccionario con sesiones creadas, FAQs cargadas y contadores del despachador
+        """
+        return {
+            "sessions": self.sessions,
+            "faqs": len(FAQ_INDEX.get().entries),
+            "openai_client": assistant.client is not None,
+            "dispatcher": assistant.dispatcher.stats(),
+        }
@@ -0,0 +1,316 @@
+"""
+Índice binario de FAQs para abrir con mmap.
+
+`python -m bot.faq_index [faqs.json] [faqs.idx]` compila el archivo de FAQs
+en un índice binario con el texto normalizado de cada pregunta, las listas
+de términos (palabras y n-gramas) y las particiones por idioma. Los workers
+lo abren con mmap sin copiarlo, de modo que todos los procesos comparten
+las mismas páginas en memoria aunque la base sea grande.
+
+Formato (orden de bytes nativo):
+    magia (8 bytes) | longitud de la cabecera (uint32) | cabecera JSON | secciones
+
+Cada sección está alineada a 8 bytes y la cabecera guarda su posición y
+tamaño. Las secciones de entradas son un bloque de texto UTF-8 con las
+posiciones de pregunta, respuesta y texto normalizado de cada entrada
+(uint64) y el idioma de cada una (uint8). Cada idioma tiene su lista de
+entradas (uint32) y su tabla de términos ordenados (bloque UTF-8 con
+posiciones uint64) con las listas de entradas de cada término (uint32).
+"""
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from bot.knowledge_base import FaqEntry, FaqIndex, load_faq_entries
+
+MAGIC = b"TIXFAQ\x00\x01"
+FORMAT_VERSION = 2
+_HEADER_LENGTH = struct.Struct("=I")
+_ALIGNMENT = 8
+
+
+def _offsets(lengths: Iterable[int]) -> List[int]:
+    """Posiciones de inicio de cada fragmento más la posición final."""
+    offsets = [0]
+    for length in lengths:
+        offsets.append(offsets[-1] + length)
+    return offsets
+
+
+class _SectionWriter:
+    """Acumula secciones alineadas y recuerda su posición relativa."""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.size = 0
+
+    def add(self, data: bytes) -> List[int]:
+        padding = -self.size % _ALIGNMENT
+        if padding:
+            self.parts.append(b"\x00" * padding)
+            self.size += padding
+        position = [self.size, len(data)]
+        self.parts.append(data)
+        self.size += len(data)
+        return position
+
+    def add_array(self, typecode: str, values: Iterable[int]) -> List[int]:
+        return self.add(array(typecode, values).tobytes())
+
+
+def write_index(index: FaqIndex, path: str) -> None:
+    """
+    Serializa un índice de FAQs y lo instala de forma atómica.
+
+    El archivo se escribe primero con otro nombre en el mismo directorio y
+    luego reemplaza al anterior con os.replace, así que un lector nunca ve un
+    índice a medio escribir.
+
+    Args:
+        index: Índice construido en memoria
+        path: Ruta del archivo de salida
+    """
+    languages = sorted(index.by_language)
+    language_ids = {language: i for i, language in enumerate(languages)}
+    sections = _SectionWriter()
+
+    texts = [part.encode("utf-8") for entry in index.entries
+             for part in (entry.question, entry.answer, entry.normalized)]
+    header: Dict[str, Any] = {
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "ngram_size": index.ngram_size,
+        "max_candidates": index.max_candidates,
+        "max_df_ratio": index.max_df_ratio,
+        "count": len(index.entries),
+        "languages": languages,
+        "text": sections.add(b"".join(texts)),
+        "text_offsets": sections.add_array("Q", _offsets(map(len, texts))),
+        "entry_languages": sections.add_array("B", [language_ids[entry.language] for entry in index.entries]),
+        "partitions": {},
+    }
+
+    for language in languages:
+        postings = index.postings.get(language, {})
+        # Las preguntas exactas se guardan como términos con prefijo "q:" (normalize_text
+        # elimina los dos puntos, así que no chocan con palabras ni n-gramas)
+        terms = dict(postings)
+        for (entry_language, question), entry_id in index.exact.items():
+            if entry_language == language:
+                terms[f"q:{question}"] = [entry_id]
+        encoded = sorted((term.encode("utf-8"), ids) for term, ids in terms.items())
+        term_bytes = [term for term, _ in encoded]
+        id_lists = [ids for _, ids in encoded]
+        header["partitions"][language] = {
+            "entries": sections.add_array("I", index.by_language[language]),
+            "terms": sections.add(b"".join(term_bytes)),
+            "term_offsets": sections.add_array("Q", _offsets(map(len, term_bytes))),
+            "postings": sections.add_array("I", [entry_id for ids in id_lists for entry_id in ids]),
+            "posting_offsets": sections.add_array("Q", _offsets(map(len, id_lists))),
+        }
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    prefix = len(MAGIC) + _HEADER_LENGTH.size + len(header_bytes)
+    padding = -prefix % _ALIGNMENT
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LENGTH.pack(len(header_bytes) + padding))
+            f.write(header_bytes + b" " * padding)
+            for part in sections.parts:
+                f.write(part)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_index(faqs_path: str, index_path: str) -> FaqIndex:
+    """
+    Compila el archivo de FAQs en un índice binario.
+
+    Args:
+        faqs_path: Ruta del archivo JSON de FAQs
+        index_path: Ruta del índice binario
+
+    Returns:
+        Índice construido en memoria
+    """
+    index = FaqIndex([(entry["question"], entry["answer"], entry.get("language"))
+                      for entry in load_faq_entries(faqs_path)])
+    write_index(index, index_path)
+    return index
+
+
+class _TermTable:
+    """Tabla de términos ordenados de una partición, con búsqueda binaria."""
+
+    def __init__(self, terms: memoryview, term_offsets: memoryview, postings: memoryview,
+                 posting_offsets: memoryview):
+        self._terms = terms
+        self._term_offsets = term_offsets
+        self._postings = postings
+        self._posting_offsets = posting_offsets
+        self._size = len(term_offsets) - 1
+
+    def _term(self, position: int) -> bytes:
+        return self._terms[self._term_offsets[position]:self._term_offsets[position + 1]].tobytes()
+
+    def _find(self, term: str) -> int:
+        key = term.encode("utf-8")
+        position = bisect.bisect_left(_LazyTerms(self), key)
+        if position < self._size and self._term(position) == key:
+            return position
+        return -1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, term: str) -> bool:
+        return self._find(term) >= 0
+
+    def __getitem__(self, term: str) -> memoryview:
+        position = self._find(term)
+        if position < 0:
+            raise KeyError(term)
+        return self._postings[self._posting_offsets[position]:self._posting_offsets[position + 1]]
+
+    def get(self, term: str, default: Optional[memoryview] = None) -> Optional[memoryview]:
+        position = self._find(term)
+        if position < 0:
+            return default
+        return self._postings[self._posting_offsets[position]:self._posting_offsets[position + 1]]
+
+
+class _LazyTerms:
+    """Vista de los términos como secuencia para bisect (decodifica solo los que compara)."""
+
+    def __init__(self, table: _TermTable):
+        self._table = table
+
+    def __len__(self) -> int:
+        return self._table._size
+
+    def __getitem__(self, position: int) -> bytes:
+        return self._table._term(position)
+
+
+class _EntryTable(Sequence):
+    """Entradas del índice leídas del mmap al acceder a ellas."""
+
+    def __init__(self, text: memoryview, offsets: memoryview, languages: memoryview, names: List[str]):
+        self._text = text
+        self._offsets = offsets
+        self._languages = languages
+        self._names = names
+
+    def _field(self, position: int) -> str:
+        return str(self._text[self._offsets[position]:self._offsets[position + 1]], "utf-8")
+
+    def __len__(self) -> int:
+        return len(self._languages)
+
+    def __getitem__(self, entry_id: int) -> FaqEntry:
+        if entry_id < 0:
+            entry_id += len(self)
+        if not 0 <= entry_id < len(self):
+            raise IndexError("entrada fuera del índice")
+        base = 3 * entry_id
+        return FaqEntry(
+            self._field(base), self._field(base + 1), self._names[self._languages[entry_id]],
+            normalized=self._field(base + 2),
+        )
+
+    def __iter__(self) -> Iterator[FaqEntry]:
+        for entry_id in range(len(self)):
+            yield self[entry_id]
+
+
+class MmapFaqIndex(FaqIndex):
+    """
+    Índice de FAQs de solo lectura sobre un archivo binario abierto con mmap.
+
+    Expone la misma interfaz de consulta que FaqIndex (entries, by_language,
+    postings, candidates, best_match, exact_match), pero los textos y las
+    listas de términos se leen directamente de las páginas del archivo, que
+    el sistema operativo comparte entre todos los procesos que lo abren.
+    """
+
+    def __init__(self, path: str):
+        """
+        Abre el índice.
+
+        Args:
+            path: Ruta del archivo compilado con build_index
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} no es un índice de FAQs")
+        (header_length,) = _HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(self._mmap[start:start + header_length].decode("utf-8"))
+        if header.get("version") != FORMAT_VERSION or header.get("byteorder") != sys.byteorder:
+            raise ValueError(f"{path} tiene un formato de índice incompatible")
+        self._base = start + header_length
+        self._view = memoryview(self._mmap)
+
+        self.ngram_size = header["ngram_size"]
+        self.max_candidates = header["max_candidates"]
+        self.max_df_ratio = header["max_df_ratio"]
+        self.languages: List[str] = header["languages"]
+        self.entries = _EntryTable(
+            self._section(header["text"]), self._section(header["text_offsets"], "Q"),
+            self._section(header["entry_languages"], "B"), self.languages,
+        )
+        self.by_language: Dict[str, memoryview] = {}
+        self.postings: Dict[str, _TermTable] = {}
+        for language, partition in header["partitions"].items():
+            self.by_language[language] = self._section(partition["entries"], "I")
+            self.postings[language] = _TermTable(
+                self._section(partition["terms"]), self._section(partition["term_offsets"], "Q"),
+                self._section(partition["postings"], "I"), self._section(partition["posting_offsets"], "Q"),
+            )
+        self.exact = {}
+        self._spellers = {}
+
+    def _section(self, position: Tuple[int, int], typecode: Optional[str] = None) -> memoryview:
+        offset, length = position
+        view = self._view[self._base + offset:self._base + offset + length]
+        return view.cast(typecode) if typecode else view
+
+    def add(self, question: str, answer: str, language: Optional[str] = None) -> None:
+        raise TypeError("El índice binario es de solo lectura; recompílalo con build_index")
+
+    def exact_match(self, question: str, language: str) -> Optional[int]:
+        table = self.postings.get(language)
+        ids = table.get(f"q:{question}") if table is not None else None
+        return ids[0] if ids else None
+
+
+if __name__ == "__main__":
+    from config import FAQS_PATH
+
+    parser = argparse.ArgumentParser(description="Compila las FAQs en un índice binario")
+    parser.add_argument("faqs", nargs="?", default=FAQS_PATH)
+    parser.add_argument("output", nargs="?", default=os.path.splitext(FAQS_PATH)[0] + ".idx")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_index(args.faqs, args.output)
+    print(f"{len(index.entries)} FAQs ({', '.join(f'{lang}: {len(ids)}' for lang, ids in sorted(index.by_language.items()))}) "
+          f"→ {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB) en {time.perf_counter() - start:.2f} s")
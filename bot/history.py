@@ -0,0 +1,133 @@
+import sys
+import time
+from array import array
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Union
+
+# Códigos de rol almacenados en un arreglo de bytes
+ROLES = ("user", "assistant", "system")
+_ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+
+class CompactHistory:
+    """
+    Historial de conversación compacto con interfaz compatible con una lista
+    de diccionarios {"role", "content"}.
+
+    Los roles se guardan como enteros pequeños en un array('b') y las marcas de
+    tiempo en un array('d'); los textos se guardan tal como llegan, así que una
+    respuesta fija que el bot ya interna (FAQs, palabras clave, mensajes de
+    respaldo) se comparte entre todas las sesiones en lugar de copiarse. Leer
+    una posición o una porción devuelve diccionarios nuevos, por lo que el
+    código que espera `history[-1]["role"]` o `history[-5:]` sigue
+    funcionando.
+    """
+
+    __slots__ = ("maxlen", "_roles", "_timestamps", "_texts")
+
+    def __init__(self, entries: Iterable[Mapping[str, str]] = (), maxlen: int = 0):
+        """
+        Inicializa el historial.
+
+        Args:
+            entries: Mensajes iniciales con "role" y "content"
+            maxlen: Máximo de mensajes conservados (0 = sin límite)
+        """
+        self.maxlen = maxlen
+        self._roles = array("b")
+        self._timestamps = array("d")
+        self._texts: List[str] = []
+        self.extend(entries)
+
+    def add(self, role: str, content: str, timestamp: Optional[float] = None) -> None:
+        """
+        Agrega un mensaje y descarta el más antiguo si se supera maxlen.
+
+        Args:
+            role: Rol del mensaje ("user", "assistant" o "system")
+            content: Texto del mensaje
+            timestamp: Marca de tiempo (por defecto, ahora)
+        """
+        self._roles.append(_ROLE_CODES.get(role, 0))
+        self._timestamps.append(time.time() if timestamp is None else timestamp)
+        self._texts.append(content)
+        if self.maxlen and len(self._texts) > self.maxlen:
+            excess = len(self._texts) - self.maxlen
+            del self._roles[:excess]
+            del self._timestamps[:excess]
+            del self._texts[:excess]
+
+    def append(self, entry: Mapping[str, str]) -> None:
+        """
+        Agrega un mensaje con la interfaz de list.append.
+
+        Args:
+            entry: Diccionario con "role" y "content" (y opcionalmente "timestamp")
+        """
+        self.add(entry.get("role", "user"), entry.get("content", ""), entry.get("timestamp"))
+
+    def extend(self, entries: Iterable[Mapping[str, str]]) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def clear(self) -> None:
+        del self._roles[:]
+        del self._timestamps[:]
+        self._texts.clear()
+
+    def _entry(self, index: int) -> Dict[str, str]:
+        return {"role": ROLES[self._roles[index]], "content": self._texts[index]}
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __bool__(self) -> bool:
+        return bool(self._texts)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for index in range(len(self._texts)):
+            yield self._entry(index)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict[str, str], List[Dict[str, str]]]:
+        if isinstance(index, slice):
+            return [self._entry(i) for i in range(*index.indices(len(self._texts)))]
+        if index < 0:
+            index += len(self._texts)
+        if not 0 <= index < len(self._texts):
+            raise IndexError("índice fuera del historial")
+        return self._entry(index)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (CompactHistory, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompactHistory({list(self)!r}, maxlen={self.maxlen})"
+
+    def timestamp(self, index: int) -> float:
+        """
+        Devuelve la marca de tiempo de un mensaje.
+
+        Args:
+            index: Posición del mensaje
+
+        Returns:
+            Segundos desde la época
+        """
+        return self._timestamps[index]
+
+    def memory_usage(self) -> int:
+        """
+        Estima la memoria ocupada por el historial.
+
+        Cuenta los arreglos y la lista de referencias; los textos se cuentan
+        una vez cada uno aunque estén compartidos con otras sesiones.
+
+        Returns:
+            Tamaño aproximado en bytes
+        """
+        unique_texts = {id(text): text for text in self._texts}
+        return (
+            sys.getsizeof(self) + sys.getsizeof(self._roles) + sys.getsizeof(self._timestamps)
+            + sys.getsizeof(self._texts) + sum(sys.getsizeof(text) for text in unique_texts.values())
+        )
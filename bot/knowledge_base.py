@@ -1,154 +1,42 @@
-from typing import Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Sequence
+import json
+import logging
+import os
 import re
+import threading
+import time
+import weakref
+from collections import Counter
 from difflib import SequenceMatcher
+from config import (DEFAULT_LANGUAGE, FAQ_SCORER, FAQS_PATH, FAQ_INDEX_PATH, FAQ_INDEX_RELOAD_INTERVAL,
+                    FAQ_SPELL_MAX_DISTANCE)
+from bot.normalize import SymSpell, build_speller, normalize_text
+from utils.helpers import detect_language
 
-# Base de conocimiento: Preguntas frecuentes (FAQs)
+logger = logging.getLogger(__name__)
+
+def load_faq_entries(path: str) -> List[Dict[str, str]]:
+    """
+    Carga las preguntas frecuentes desde un archivo JSON.
+
+    El archivo tiene la forma {"faqs": [{"question", "answer", "language"?, "category"?}]};
+    las entradas sin "language" se etiquetan con detect_language al construir el índice.
+
+    Args:
+        path: Ruta del archivo
+
+    Returns:
+        Lista de entradas en el orden del archivo
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [entry for entry in data.get("faqs", []) if entry.get("question") and entry.get("answer")]
+
+
+# Base de conocimiento: Preguntas frecuentes (FAQs) de bot/data/faqs.json
 # Formato: (pregunta, respuesta)
-FAQS = [
-    # Saludos y conversación básica
-    (
-        "Hola",
-        "¡Hola!\n\n¡Gracias por contactarnos!\n\n¿En qué puedo asistirte hoy?"
-    ),
-    (
-        "Buenas",
-        "¡Hola!\n\n¡Gracias por contactarnos!\n\n¿En qué puedo asistirte hoy?"
-    ),
-    (
-        "Hello",
-        "Hi!\n\nThank you for contacting us!\n\nHow can I help you today?"
-    ),
-    (
-        "Gracias",
-        "¡De nada! Siempre es un placer ayudarte. Si tienes más preguntas, estoy aquí para ti. Feliz día"
-    ),
-    (
-        "Thank you",
-        "You're welcome! It's always a pleasure to help. If you have more questions, I'm here for you. Have a nice day"
-    ),
-    
-    # Compra de boletos/entradas
-    (
-        "¿Cómo compro entradas?",
-        "Para comprar entradas en Tix.do debes acceder al link del evento que te interesa, seleccionar la cantidad y tipo de boletos, y completar el pago. Recibirás tus boletos por correo electrónico con un código QR."
-    ),
-    (
-        "Quiero comprar boletas",
-        "¡Hola!\n\nGracias por comunicarte con nosotros. Puedo compartirte el link del evento para que puedas visualizar los precios y realizar la compra de tus tickets.\n\nPor favor, indícame el nombre del evento que te interesa.\n\nFeliz día"
-    ),
-    (
-        "Me interesan unas entradas",
-        "¡Hola!\n\nGracias por comunicarte con nosotros. Por favor, indícame el nombre del evento para el que deseas adquirir entradas y te compartiré el link de compra.\n\nFeliz día"
-    ),
-    (
-        "¿Cómo puedo adquirir boletas?",
-        "¡Hola!\n\nGracias por comunicarte con nosotros. Te puedo proporcionar el link del evento para que puedas visualizar los precios y realizar la compra de tus tickets. Solo necesito que me indiques el evento que te interesa.\n\nFeliz día"
-    ),
-    (
-        "How do I buy tickets?",
-        "Hi!\n\nThank you for contacting us. I can share the link to the event so you can see the prices and purchase your tickets. Please let me know which event you're interested in.\n\nHave a nice day"
-    ),
-    
-    # Información sobre eventos específicos
-    (
-        "Quedan entradas disponibles",
-        "Para verificar la disponibilidad de entradas de este evento, por favor comunícate directamente con la producción. Puedes hacerlo a través del link del evento que te puedo proporcionar si me indicas cuál es el evento de tu interés."
-    ),
-    (
-        "Quedan mesas disponibles",
-        "Para información sobre disponibilidad de mesas, debes comunicarte directamente con la producción del evento. Puedes hacerlo a través del link del evento que te puedo proporcionar."
-    ),
-    
-    # Publicación de eventos (para organizadores)
-    (
-        "¿Cómo publicar un evento?",
-        "Para subir tu evento con nosotros solo debes crear tu perfil y llenar tus datos en nuestra página https://vendors.tix.do/register\n\nLuego de haber creado tu perfil podrás visualizar en tu cuenta la opción de crear evento, donde debes colocar todos los campos requeridos con la información.\n\nLa imagen debe ser 1,080 x 1,080 px exactos y no pesar más de 1.5 Mb. Tu evento tendrá un periodo de revisión de 15 a 30 min en la plataforma."
-    ),
-    (
-        "¿Cuáles son los costos para publicar un evento?",
-        "La publicación del evento es totalmente gratuita. El organizador solo paga el fee del procesamiento de transacción de un 4.9% + RD$25 por boleta vendida.\n\nEl participante del evento (Comprador) paga un cargo por servicio de un 8.5% + RD$15 de cada boleta adquirida."
-    ),
-    (
-        "¿Qué información solicitan al comprador?",
-        "En nuestra base de datos recopilamos el correo electrónico del comprador. Esta es la información de contacto principal que se utiliza para enviar los códigos QR de las entradas adquiridas."
-    ),
-    (
-        "¿Qué información recibe el cliente tras comprar?",
-        "El participante recibe un correo electrónico con su código QR, que servirá como entrada digital para el evento."
-    ),
-    (
-        "¿Ofrecen servicios adicionales para eventos?",
-        "Sí, ofrecemos servicio de staff para el escaneo de códigos QR generados en la compra, creando una logística de entrada eficiente. También contamos con servicio de alquiler de verifones para venta de puerta y bares. Puedo ponerte en contacto con nuestro equipo especializado para más detalles."
-    ),
-    
-    # Reembolsos y cancelaciones
-    (
-        "¿Cómo solicito un reembolso?",
-        "Para solicitar un reembolso, por favor envía todos los datos relacionados a tu orden (nombre, correo, número de orden) al correo electrónico info@tix.do."
-    ),
-    (
-        "Compré un seguro, ¿cómo pido reembolso?",
-        "Para el reembolso de una orden asegurada debes enviarnos una constancia de la razón vía correo electrónico a info@tix.do.\n\nLa misma debe estar contemplada dentro de nuestros términos y condiciones: https://tix.do/asegura-tu-compra\n\nEl proceso de reembolso tarda de 10-15 días hábiles (sujeto a tiempos bancarios) y solo se realizará al método de pago original de la compra.\n\nLos cargos por servicios no son reembolsables en ningún caso."
-    ),
-    (
-        "Quiero una devolución",
-        "Para solicitar una devolución, por favor envía al correo electrónico info@tix.do todos los datos relacionados a tu orden, como el nombre, el correo y el número de orden. Nuestro equipo revisará tu solicitud según nuestras políticas de devolución."
-    ),
-    (
-        "No puedo asistir al evento",
-        "Lamentamos que no puedas asistir. Si adquiriste el seguro de compra, puedes solicitar un reembolso enviando una constancia de la razón a info@tix.do. Si no adquiriste seguro, lamentablemente los boletos no son reembolsables según nuestros términos y condiciones."
-    ),
-    
-    # Datos de contacto 
-    (
-        "¿Cómo contactarlos?",
-        "Puedes contactarnos a través de nuestro correo electrónico info@tix.do o por este mismo canal de WhatsApp. Estamos disponibles para asistirte en lo que necesites."
-    ),
-    (
-        "¿Cuál es su correo electrónico?",
-        "Nuestro correo electrónico de contacto es info@tix.do"
-    ),
-    
-    # Preguntas sobre Tix.do
-    (
-        "¿Qué es Tix.do?",
-        "Tix.do es la plataforma líder de venta de entradas y gestión de eventos en República Dominicana. Facilitamos la compra de boletos para conciertos, obras de teatro, eventos deportivos y más."
-    ),
-    (
-        "What is Tix.do?",
-        "Tix.do is the leading ticket sales and event management platform in the Dominican Republic. We facilitate the purchase of tickets for concerts, plays, sporting events, and more."
-    ),
-    
-    # Métodos de pago
-    (
-        "¿Qué métodos de pago aceptan?",
-        "En Tix.do aceptamos múltiples formas de pago: tarjetas de crédito/débito (Visa y Mastercard) y transferencias bancarias."
-    ),
-    (
-        "What payment methods do you accept?",
-        "At Tix.do we accept multiple payment methods: credit/debit cards (Visa and Mastercard) and bank transfers."
-    ),
-    
-    # Boletos perdidos
-    (
-        "Perdí mis entradas",
-        "¡No te preocupes! Por favor confirma tu correo electrónico y el nombre del evento para poder reenviar tus entradas lo antes posible."
-    ),
-    (
-        "No me llegó el correo con las entradas",
-        "Lamento que no hayas recibido tus entradas. Por favor, comparte conmigo tu nombre completo, correo electrónico y el número de orden para poder verificar el estado de tu compra y reenviar las entradas si es necesario."
-    ),
-    
-    # Preguntas sobre el bot
-    (
-        "¿Quién eres tú?",
-        "¡Hola! Soy Camile, la asistente virtual de Tix.do. Estoy aquí para ayudarte con preguntas sobre eventos, entradas y más. Si necesitas hablar con un agente humano, solo dímelo y te conectaré con nuestro equipo de servicio al cliente."
-    ),
-    (
-        "Who are you?",
-        "Hello! I'm Camile, the virtual assistant for Tix.do. I'm here to help you with questions about events, tickets, and more. If you need to talk to a human agent, just let me know and I'll connect you with our customer service team."
-    )
-]
+FAQ_ENTRIES = load_faq_entries(FAQS_PATH)
+FAQS = [(entry["question"], entry["answer"]) for entry in FAQ_ENTRIES]
 
 def clean_text(text: str) -> str:
     """
@@ -184,65 +72,594 @@ def calculate_similarity(text1: str, text2: str) -> float:
     """
     return SequenceMatcher(None, clean_text(text1), clean_text(text2)).ratio()
 
-def find_best_faq_match(user_query: str, language: str = "es") -> Tuple[Optional[str], float]:
+class FaqEntry:
+    """
+    Pregunta frecuente preprocesada para el índice.
+
+    La pregunta se normaliza una sola vez (sin tildes ni palabras vacías y
+    con cada palabra reducida a su raíz, ver bot.normalize) con el mismo
+    proceso que se aplica a las consultas.
+    """
+
+    __slots__ = ("question", "answer", "normalized", "tokens", "language")
+
+    def __init__(self, question: str, answer: str, language: str, normalized: Optional[str] = None):
+        self.question = question
+        self.answer = answer
+        self.normalized = normalize_text(question, language) if normalized is None else normalized
+        self.tokens = tuple(self.normalized.split())
+        self.language = language
+
+
+def _query_grams(normalized: str, ngram_size: int) -> set:
+    """
+    Obtiene los términos indexables de un texto normalizado: palabras completas
+    y n-gramas de caracteres (con espacios de relleno para textos cortos).
+
+    Args:
+        normalized: Texto ya normalizado con normalize_text
+        ngram_size: Tamaño de los n-gramas de caracteres
+
+    Returns:
+        Conjunto de términos
+    """
+    grams = {f"w:{token}" for token in normalized.split()}
+    padded = f" {normalized} "
+    grams.update(padded[i:i + ngram_size] for i in range(len(padded) - ngram_size + 1))
+    return grams
+
+
+class FaqIndex:
+    """
+    Índice invertido de FAQs construido una sola vez.
+
+    Las preguntas se normalizan, tokenizan y etiquetan por idioma al construir
+    el índice, y las listas de términos se guardan por separado para cada
+    idioma, así que una consulta solo recorre su partición. En cada consulta
+    solo se calcula la similitud exacta (SequenceMatcher) sobre una lista
+    corta de candidatos que comparten palabras o n-gramas de caracteres con
+    la consulta.
+
+    Las consultas se normalizan igual que las preguntas y además se corrigen
+    sus errores de tipeo con un diccionario del vocabulario de las FAQs de
+    cada idioma (construido en el primer uso).
+    """
+
+    def __init__(self, faqs: Sequence[Tuple[str, str]], ngram_size: int = 3,
+                 max_candidates: int = 64, max_df_ratio: float = 0.2):
+        """
+        Construye el índice.
+
+        Args:
+            faqs: Lista de tuplas (pregunta, respuesta) o (pregunta, respuesta, idioma)
+            ngram_size: Tamaño de los n-gramas de caracteres indexados
+            max_candidates: Máximo de candidatos que reciben puntuación exacta
+            max_df_ratio: Fracción de entradas a partir de la cual un término se
+                considera demasiado común para seleccionar candidatos
+        """
+        self.ngram_size = ngram_size
+        self.max_candidates = max_candidates
+        self.max_df_ratio = max_df_ratio
+        self.entries: List[FaqEntry] = []
+        # Idioma -> término -> entradas que lo contienen
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        self.by_language: Dict[str, List[int]] = {}
+        self.exact: Dict[Tuple[str, str], int] = {}
+        self._spellers: Dict[str, Optional[SymSpell]] = {}
+
+        for question, answer, *language in faqs:
+            self.add(question, answer, language[0] if language else None)
+
+    def add(self, question: str, answer: str, language: Optional[str] = None) -> None:
+        """
+        Agrega una pregunta frecuente al índice.
+
+        Args:
+            question: Pregunta
+            answer: Respuesta
+            language: Idioma de la pregunta (se detecta si es None)
+        """
+        entry_id = len(self.entries)
+        entry = FaqEntry(question, answer, language or detect_language(question, default=DEFAULT_LANGUAGE))
+        self.entries.append(entry)
+        self.by_language.setdefault(entry.language, []).append(entry_id)
+        self.exact.setdefault((entry.language, question), entry_id)
+        # El vocabulario cambió: el corrector se reconstruye en el próximo uso
+        self._spellers.pop(entry.language, None)
+        postings = self.postings.setdefault(entry.language, {})
+        for gram in _query_grams(entry.normalized, self.ngram_size):
+            postings.setdefault(gram, []).append(entry_id)
+
+    def exact_match(self, question: str, language: str) -> Optional[int]:
+        """
+        Busca una pregunta idéntica (por ejemplo, un botón de FAQ presionado).
+
+        Args:
+            question: Texto exacto de la pregunta
+            language: Idioma de la pregunta
+
+        Returns:
+            Identificador de la entrada, o None si no existe
+        """
+        return self.exact.get((language, question))
+
+    def speller(self, language: str) -> Optional[SymSpell]:
+        """
+        Devuelve el corrector ortográfico de un idioma, construyéndolo en el primer uso.
+
+        Args:
+            language: Código de idioma
+
+        Returns:
+            Corrector con el vocabulario de las preguntas del idioma, o None
+            si FAQ_SPELL_MAX_DISTANCE es 0
+        """
+        if language not in self._spellers:
+            questions = [self.entries[entry_id].question for entry_id in self.by_language.get(language, [])]
+            self._spellers[language] = build_speller(questions, FAQ_SPELL_MAX_DISTANCE)
+        return self._spellers[language]
+
+    def normalize_query(self, user_query: str, language: str) -> str:
+        """
+        Normaliza una consulta como las preguntas del índice, corrigiendo antes sus errores de tipeo.
+
+        Args:
+            user_query: Consulta del usuario
+            language: Idioma de la consulta
+
+        Returns:
+            Consulta normalizada
+        """
+        return normalize_text(user_query, language, self.speller(language))
+
+    def candidates(self, clean_query: str, language: str) -> List[int]:
+        """
+        Selecciona las entradas candidatas para una consulta.
+
+        Args:
+            clean_query: Consulta ya normalizada con normalize_query
+            language: Idioma de las entradas a considerar
+
+        Returns:
+            Identificadores de entradas ordenados por posición en la base
+        """
+        partition = self.by_language.get(language, [])
+        if len(partition) <= self.max_candidates:
+            return partition
+
+        postings = self.postings[language]
+        max_df = max(1, int(len(partition) * self.max_df_ratio))
+        # Una sola búsqueda por término (en el índice binario cada búsqueda es binaria)
+        found = [ids for ids in map(postings.get, _query_grams(clean_query, self.ngram_size)) if ids is not None]
+        selective = [ids for ids in found if len(ids) <= max_df] or found
+
+        counts: Counter = Counter()
+        for ids in selective:
+            counts.update(ids)
+
+        return sorted(entry_id for entry_id, _ in counts.most_common(self.max_candidates))
+
+    def best_match(self, user_query: str, language: str) -> Tuple[Optional[str], float]:
+        """
+        Busca la mejor respuesta para la consulta en el idioma indicado.
+
+        Args:
+            user_query: Consulta del usuario
+            language: Idioma de las preguntas a considerar
+
+        Returns:
+            Tuple con la mejor respuesta (o None) y su similitud
+        """
+        # Si es una coincidencia exacta (por ejemplo, botón FAQ presionado)
+        exact_id = self.exact_match(user_query, language)
+        if exact_id is not None:
+            return self.entries[exact_id].answer, 1.0
+
+        clean_query = self.normalize_query(user_query, language)
+        query_len = len(clean_query)
+        matcher = SequenceMatcher(None, clean_query)
+
+        best_match = None
+        best_score = 0.0
+        for entry_id in self.candidates(clean_query, language):
+            entry = self.entries[entry_id]
+            total = query_len + len(entry.normalized)
+            # Cota superior de ratio(): si no puede superar al mejor, se descarta
+            if not total or 2.0 * min(query_len, len(entry.normalized)) / total <= best_score:
+                continue
+            matcher.set_seq2(entry.normalized)
+            if matcher.quick_ratio() <= best_score:
+                continue
+            similarity = matcher.ratio()
+            if similarity > best_score:
+                best_score = similarity
+                best_match = entry.answer
+
+        return best_match, best_score
+
+
+class TfidfFaqScorer:
+    """
+    Puntuador alternativo basado en TF-IDF de n-gramas de caracteres.
+
+    El corpus se guarda como una matriz dispersa (documentos x términos) en
+    formato CSC con arreglos de NumPy: para cada término, los documentos que lo
+    contienen y su peso. Los vectores de documentos están normalizados (L2),
+    así que el producto con una consulta normalizada es la similitud coseno.
+    Un lote de consultas se puntúa con un solo producto disperso. Las
+    consultas se normalizan como en FaqIndex, con un corrector ortográfico
+    por idioma construido con el vocabulario de las entradas.
+    """
+
+    def __init__(self, entries: Sequence[FaqEntry], ngram_range: Tuple[int, int] = (2, 4),
+                 max_cells: int = 4_000_000):
+        """
+        Construye la matriz TF-IDF.
+
+        Args:
+            entries: Entradas preprocesadas del índice de FAQs
+            ngram_range: Tamaños mínimo y máximo de los n-gramas de caracteres
+            max_cells: Máximo de celdas (consultas x documentos) por bloque al
+                puntuar lotes
+        """
+        import numpy as np
+
+        self._np = np
+        self.ngram_range = ngram_range
+        self.max_cells = max_cells
+        self.entries = list(entries)
+        self.languages = np.array([entry.language for entry in self.entries])
+        self.vocabulary: Dict[str, int] = {}
+        questions: Dict[str, List[str]] = {}
+        for entry in self.entries:
+            questions.setdefault(entry.language, []).append(entry.question)
+        self.spellers = {language: build_speller(texts, FAQ_SPELL_MAX_DISTANCE)
+                         for language, texts in questions.items()}
+
+        rows: List[int] = []
+        cols: List[int] = []
+        counts: List[int] = []
+        for doc_id, entry in enumerate(self.entries):
+            for gram, count in self._ngram_counts(entry.normalized).items():
+                rows.append(doc_id)
+                cols.append(self.vocabulary.setdefault(gram, len(self.vocabulary)))
+                counts.append(count)
+
+        n_docs = len(self.entries)
+        n_terms = len(self.vocabulary)
+        rows_arr = np.array(rows, dtype=np.int32)
+        cols_arr = np.array(cols, dtype=np.int32)
+        tf = 1.0 + np.log(np.array(counts, dtype=np.float32))
+
+        # IDF suavizado
+        df = np.bincount(cols_arr, minlength=n_terms)
+        self.idf = (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+
+        weights = tf * self.idf[cols_arr]
+        norms = np.sqrt(np.bincount(rows_arr, weights=weights * weights, minlength=n_docs))
+        weights = (weights / np.maximum(norms[rows_arr], 1e-12)).astype(np.float32)
+
+        # Formato CSC: los documentos de cada término son contiguos
+        order = np.argsort(cols_arr, kind="stable")
+        self.indices = rows_arr[order]
+        self.data = weights[order]
+        self.indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(df, out=self.indptr[1:])
+
+    def _ngram_counts(self, normalized: str) -> Counter:
+        """
+        Cuenta los n-gramas de caracteres de un texto normalizado.
+
+        Args:
+            normalized: Texto ya normalizado con normalize_text
+
+        Returns:
+            Contador de n-gramas
+        """
+        padded = f" {normalized} "
+        grams: Counter = Counter()
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return grams
+
+    def _query_matrix(self, queries: Sequence[str], languages: Sequence[str]):
+        """
+        Convierte un lote de consultas en una matriz dispersa COO normalizada.
+
+        Args:
+            queries: Consultas del usuario
+            languages: Idioma de cada consulta
+
+        Returns:
+            Tuple (filas, términos, pesos) con los elementos no nulos
+        """
+        np = self._np
+        rows: List[int] = []
+        cols: List[int] = []
+        counts: List[int] = []
+        for query_id, (query, language) in enumerate(zip(queries, languages)):
+            normalized = normalize_text(query, language, self.spellers.get(language))
+            for gram, count in self._ngram_counts(normalized).items():
+                term = self.vocabulary.get(gram)
+                if term is not None:
+                    rows.append(query_id)
+                    cols.append(term)
+                    counts.append(count)
+
+        rows_arr = np.array(rows, dtype=np.int64)
+        cols_arr = np.array(cols, dtype=np.int64)
+        weights = (1.0 + np.log(np.array(counts, dtype=np.float32))) * self.idf[cols_arr]
+        norms = np.sqrt(np.bincount(rows_arr, weights=weights * weights, minlength=len(queries)))
+        weights = weights / np.maximum(norms[rows_arr], 1e-12)
+        return rows_arr, cols_arr, weights
+
+    def score_batch(self, queries: Sequence[str], languages: Optional[Sequence[str]] = None):
+        """
+        Calcula la similitud coseno de cada consulta contra todas las FAQs.
+
+        Args:
+            queries: Consultas del usuario
+            languages: Idioma de cada consulta (por defecto, DEFAULT_LANGUAGE)
+
+        Returns:
+            Matriz densa (consultas x FAQs) con las similitudes
+        """
+        np = self._np
+        n_queries = len(queries)
+        n_docs = len(self.entries)
+        if not n_queries or not n_docs:
+            return np.zeros((n_queries, n_docs), dtype=np.float32)
+
+        rows, cols, weights = self._query_matrix(queries, languages or [DEFAULT_LANGUAGE] * n_queries)
+
+        # Producto disperso Q x D^T: para cada elemento no nulo de la consulta
+        # se expanden los documentos que contienen el término
+        starts = self.indptr[cols]
+        lengths = self.indptr[cols + 1] - starts
+        total = int(lengths.sum())
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        doc_ids = self.indices[offsets]
+        products = np.repeat(weights, lengths) * self.data[offsets]
+        cells = np.repeat(rows, lengths) * n_docs + doc_ids
+
+        scores = np.bincount(cells, weights=products, minlength=n_queries * n_docs)
+        return scores.reshape(n_queries, n_docs).astype(np.float32)
+
+    def best_matches(self, queries: Sequence[str], languages: Sequence[str]) -> List[Tuple[Optional[str], float]]:
+        """
+        Busca la mejor FAQ para cada consulta de un lote.
+
+        Args:
+            queries: Consultas del usuario
+            languages: Idioma de las preguntas a considerar para cada consulta
+
+        Returns:
+            Lista de tuplas (respuesta o None, similitud)
+        """
+        np = self._np
+        results: List[Tuple[Optional[str], float]] = []
+        chunk = max(1, self.max_cells // max(1, len(self.entries)))
+        for start in range(0, len(queries), chunk):
+            batch = queries[start:start + chunk]
+            scores = self.score_batch(batch, languages[start:start + chunk])
+            # Descartar las FAQs de otro idioma
+            mask = self.languages[None, :] != np.array(languages[start:start + chunk])[:, None]
+            scores[mask] = -1.0
+            best = scores.argmax(axis=1) if scores.shape[1] else np.zeros(len(batch), dtype=np.int64)
+            for row, doc_id in enumerate(best):
+                score = float(scores[row, doc_id]) if scores.shape[1] else 0.0
+                if score > 0.0:
+                    results.append((self.entries[doc_id].answer, score))
+                else:
+                    results.append((None, 0.0))
+        return results
+
+    def best_match(self, user_query: str, language: str) -> Tuple[Optional[str], float]:
+        """
+        Busca la mejor FAQ para una consulta.
+
+        Args:
+            user_query: Consulta del usuario
+            language: Idioma de las preguntas a considerar
+
+        Returns:
+            Tuple con la mejor respuesta (o None) y su similitud
+        """
+        return self.best_matches([user_query], [language])[0]
+
+
+class ReloadingFaqIndex:
+    """
+    Mantiene el índice de FAQs vigente y lo sustituye cuando cambia su archivo.
+
+    Si existe el índice binario (compilado con `python -m bot.faq_index`), se
+    abre con mmap y todos los procesos que lo usan comparten las mismas
+    páginas en memoria; si no, se construye en memoria desde el archivo de
+    FAQs. Al cambiar el archivo se carga la versión nueva y se reemplaza la
+    referencia de una vez, sin reiniciar: las consultas en curso terminan con
+    el índice anterior.
+    """
+
+    def __init__(self, faqs_path: str, index_path: str = "", check_interval: float = 5.0):
+        """
+        Carga el índice.
+
+        Args:
+            faqs_path: Ruta del archivo JSON de FAQs
+            index_path: Ruta del índice binario ("" = construir en memoria)
+            check_interval: Segundos mínimos entre comprobaciones del archivo
+        """
+        self.faqs_path = faqs_path
+        self.index_path = index_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = self._stat()
+        self._index = self._load()
+        self._checked_at = time.monotonic()
+
+    @property
+    def source(self) -> str:
+        """Archivo del que se carga el índice."""
+        if self.index_path and os.path.exists(self.index_path):
+            return self.index_path
+        return self.faqs_path
+
+    def _stat(self) -> Optional[Tuple[str, int, int, int]]:
+        source = self.source
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        # os.replace instala un inode nuevo, así que el cambio se detecta aunque coincida el mtime
+        return source, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> FaqIndex:
+        if self.source == self.index_path:
+            from bot.faq_index import MmapFaqIndex
+            return MmapFaqIndex(self.index_path)
+        return FaqIndex([(entry["question"], entry["answer"], entry.get("language"))
+                         for entry in load_faq_entries(self.faqs_path)])
+
+    def reload_if_changed(self) -> bool:
+        """
+        Recarga el índice si su archivo cambió.
+
+        Returns:
+            True si se recargó
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            signature = self._stat()
+            if signature == self._signature:
+                return False
+            try:
+                index = self._load()
+            except (OSError, ValueError, KeyError) as e:
+                # Conservar el índice actual si el archivo no es válido
+                logger.warning("No se pudo recargar el índice de FAQs de %s: %s", self.source, e)
+                return False
+            self._index = index
+            self._signature = signature
+            return True
+
+    def get(self) -> FaqIndex:
+        """
+        Devuelve el índice vigente, comprobando antes si el archivo cambió.
+
+        Returns:
+            Índice de FAQs (en memoria o sobre mmap)
+        """
+        if self.check_interval >= 0 and time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload_if_changed()
+        return self._index
+
+
+# Índice cargado al importar el módulo y recargado cuando cambia su archivo
+FAQ_INDEX = ReloadingFaqIndex(FAQS_PATH, FAQ_INDEX_PATH, FAQ_INDEX_RELOAD_INTERVAL)
+
+# Puntuadores disponibles para find_best_faq_match
+FAQ_SCORERS = ("difflib", "tfidf")
+
+# Un puntuador TF-IDF por índice e idioma, construido en el primer uso; se
+# descarta junto con el índice cuando este se recarga
+_tfidf_scorers: "weakref.WeakKeyDictionary[FaqIndex, Dict[str, TfidfFaqScorer]]" = weakref.WeakKeyDictionary()
+
+
+def get_tfidf_scorer(language: str, index: Optional[FaqIndex] = None) -> TfidfFaqScorer:
+    """
+    Devuelve el puntuador TF-IDF de un idioma, construyéndolo en el primer uso.
+
+    Args:
+        language: Código de idioma
+        index: Índice de FAQs (por defecto, el vigente)
+
+    Returns:
+        Puntuador TF-IDF sobre las entradas del índice en ese idioma
+    """
+    if index is None:
+        index = FAQ_INDEX.get()
+    scorers = _tfidf_scorers.setdefault(index, {})
+    scorer = scorers.get(language)
+    if scorer is None:
+        entries = [index.entries[entry_id] for entry_id in index.by_language.get(language, [])]
+        scorer = scorers[language] = TfidfFaqScorer(entries)
+    return scorer
+
+def find_best_faq_match(user_query: str, language: str = "es", scorer: Optional[str] = None) -> Tuple[Optional[str], float]:
     """
     Busca la mejor coincidencia para la consulta del usuario en las FAQs.
     
     Args:
         user_query: Consulta del usuario
         language: Idioma preferido ("es" o "en")
+        scorer: Puntuador a usar ("difflib" o "tfidf"; por defecto FAQ_SCORER)
         
     Returns:
         Tuple con la respuesta y el nivel de confianza
     """
-    best_match = None
-    best_score = 0.0
-    
-    # Preprocesar la consulta del usuario
-    clean_query = clean_text(user_query)
-    
-    # Detectar idioma basado en características
-    detected_lang = language
-    
-    # Palabras en español que ayudan a identificar el idioma
-    spanish_indicators = ["que", "como", "donde", "cuando", "por", "para", "quien", "cual", 
-                         "porque", "qué", "cómo", "dónde", "cuándo", "quién", "cuál", 
-                         "gracias", "hola", "adios", "ayuda", "necesito"]
-                         
-    # Detectar idioma basado en palabras clave
-    for word in spanish_indicators:
-        if f" {word} " in f" {clean_query} " or clean_query.startswith(f"{word} ") or clean_query.endswith(f" {word}"):
-            detected_lang = "es"
-            break
+    index = FAQ_INDEX.get()
+    if (scorer or FAQ_SCORER) == "tfidf":
+        # Una coincidencia exacta (botón FAQ presionado) no depende del puntuador
+        exact_id = index.exact_match(user_query, language)
+        if exact_id is not None:
+            return index.entries[exact_id].answer, 1.0
+        best_match, best_score = get_tfidf_scorer(language, index).best_match(user_query, language)
     else:
-        # Si no encontró palabras en español, probablemente es inglés
-        if len(clean_query.split()) > 1:  # Si tiene más de una palabra
-            detected_lang = "en"
-    
-    # Si el idioma explícitamente seleccionado difiere del detectado, priorizar el seleccionado
-    actual_lang = language if language != detected_lang else detected_lang
-    
-    for question, answer in FAQS:
-        # Determinar si la pregunta está en español
-        is_spanish_question = "¿" in question or any(word in question.lower() for word in ["hola", "gracias", "como", "qué", "cómo", "buenas"])
-        
-        # Filtrar preguntas por idioma
-        if (actual_lang == "es" and not is_spanish_question) or (actual_lang == "en" and is_spanish_question):
-            continue
-        
-        # Calcular similitud
-        similarity = calculate_similarity(user_query, question)
-        
-        # Si es una coincidencia exacta (por ejemplo, botón FAQ presionado)
-        if user_query == question:
-            return answer, 1.0
-        
-        # Actualizar mejor coincidencia si corresponde
-        if similarity > best_score:
-            best_score = similarity
-            best_match = answer
+        best_match, best_score = index.best_match(user_query, language)
     
+    return _apply_threshold(best_match, best_score)
+
+
+def _apply_threshold(best_match: Optional[str], best_score: float) -> Tuple[Optional[str], float]:
+    """
+    Descarta las coincidencias por debajo del umbral de confianza.
+
+    Args:
+        best_match: Mejor respuesta encontrada
+        best_score: Similitud de la mejor respuesta
+
+    Returns:
+        Tuple con la respuesta y el nivel de confianza, o (None, 0.0)
+    """
     # Ajustar el umbral de confianza para ser más permisivo
     confidence_threshold = 0.5  # Umbral para considerar una respuesta válida
     
-    return best_match, best_score if best_score >= confidence_threshold else (None, 0.0)
\ No newline at end of file
+    if best_score >= confidence_threshold:
+        return best_match, best_score
+    return None, 0.0
+
+
+def find_best_faq_matches(user_queries: Sequence[str], language: str = "es", scorer: Optional[str] = None) -> List[Tuple[Optional[str], float]]:
+    """
+    Busca la mejor coincidencia para un lote de consultas (por ejemplo, para
+    volver a puntuar transcripciones completas sin conexión).
+
+    Con el puntuador "tfidf" todo el lote se puntúa con un solo producto de
+    matrices dispersas.
+
+    Args:
+        user_queries: Consultas del usuario
+        language: Idioma preferido ("es" o "en")
+        scorer: Puntuador a usar ("difflib" o "tfidf"; por defecto FAQ_SCORER)
+
+    Returns:
+        Lista de tuplas con la respuesta y el nivel de confianza
+    """
+    if (scorer or FAQ_SCORER) != "tfidf":
+        return [find_best_faq_match(query, language, scorer="difflib") for query in user_queries]
+
+    index = FAQ_INDEX.get()
+    results: List[Tuple[Optional[str], float]] = [(None, 0.0)] * len(user_queries)
+    pending: List[int] = []
+    for i, query in enumerate(user_queries):
+        exact_id = index.exact_match(query, language)
+        if exact_id is not None:
+            results[i] = (index.entries[exact_id].answer, 1.0)
+        else:
+            pending.append(i)
+
+    matches = get_tfidf_scorer(language, index).best_matches([user_queries[i] for i in pending], [language] * len(pending))
+    for i, (best_match, best_score) in zip(pending, matches):
+        results[i] = _apply_threshold(best_match, best_score)
+    return results
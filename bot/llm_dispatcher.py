@@ -0,0 +1,649 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from bot.context import estimate_tokens
+from utils.metrics import REGISTRY
+
+# Prioridades de la cola (menor = antes)
+PRIORITY_HANDOFF = 0  # Conversaciones que pidieron o acaban de recibir un agente humano
+PRIORITY_NORMAL = 1
+PRIORITY_BATCH = 2  # Lotes de /api/chat/batch
+
+# Códigos HTTP que vale la pena reintentar
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+# Errores de conexión del SDK de OpenAI (no tienen código HTTP)
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+LLM_REQUESTS = REGISTRY.counter(
+    "tixobot_llm_requests_total", "Peticiones al modelo por resultado en el despachador", ["result"]
+)
+LLM_RETRIES = REGISTRY.counter(
+    "tixobot_llm_retries_total", "Reintentos de llamadas al modelo por tipo de error", ["error"]
+)
+LLM_QUEUE_SECONDS = REGISTRY.histogram(
+    "tixobot_llm_queue_seconds", "Espera en la cola del despachador en segundos", ["priority"]
+)
+LLM_HEDGES = REGISTRY.counter(
+    "tixobot_llm_hedges_total", "Peticiones de cobertura al modelo por resultado", ["result"]
+)
+LLM_CANCELLED = REGISTRY.counter(
+    "tixobot_llm_cancelled_total", "Llamadas al modelo canceladas por vencer el plazo"
+)
+
+# Latencias recientes usadas para calcular el retraso de las peticiones de cobertura
+LATENCY_WINDOW = 256
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Indica si un error de la API de OpenAI es transitorio.
+
+    Args:
+        error: Excepción producida
+
+    Returns:
+        True para límites de tasa (429), errores 5xx y fallos de conexión
+    """
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error: BaseException) -> float:
+    """
+    Lee la cabecera Retry-After de una respuesta de error, si existe.
+
+    Args:
+        error: Excepción producida
+
+    Returns:
+        Segundos indicados por el servidor (0 si no hay cabecera)
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after", 0)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """
+    Calcula la clave de una petición para agrupar las idénticas.
+
+    Args:
+        request: Argumentos de chat.completions.create
+
+    Returns:
+        Hash hexadecimal de los argumentos
+    """
+    payload = json.dumps(request, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def request_tokens(request: Dict[str, Any]) -> int:
+    """
+    Estima los tokens que consumirá una petición (mensajes más respuesta máxima).
+
+    Args:
+        request: Argumentos de chat.completions.create
+
+    Returns:
+        Número aproximado de tokens
+    """
+    prompt = sum(estimate_tokens(message.get("content", "")) for message in request.get("messages", []))
+    return prompt + int(request.get("max_tokens") or 0)
+
+
+class TokenBucket:
+    """
+    Cubeta de fichas para un límite por minuto.
+
+    Se llena de forma continua a rate/60 fichas por segundo hasta su
+    capacidad (un minuto de presupuesto). Consumir más de lo disponible deja
+    saldo negativo, que se paga antes de admitir la siguiente petición.
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        Args:
+            per_minute: Fichas por minuto (0 = sin límite)
+        """
+        self.per_minute = per_minute
+        self.capacity = float(per_minute)
+        self._tokens = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """
+        Calcula cuánto falta para tener fichas suficientes.
+
+        Args:
+            amount: Fichas necesarias
+
+        Returns:
+            Segundos de espera (0 si ya alcanzan)
+        """
+        if self.per_minute <= 0:
+            return 0.0
+        self._refill()
+        # Una petición mayor que la capacidad se admite con la cubeta llena
+        missing = min(amount, self.capacity) - self._tokens
+        return max(0.0, missing * 60.0 / self.per_minute)
+
+    def consume(self, amount: float) -> None:
+        """
+        Descuenta fichas (el saldo puede quedar negativo).
+
+        Args:
+            amount: Fichas consumidas (negativo para devolverlas)
+        """
+        if self.per_minute <= 0:
+            return
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - amount)
+
+
+def _resolve(future: concurrent.futures.Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    """Completa un futuro salvo que ya se haya cancelado."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class _Job:
+    """Petición pendiente en la cola del despachador."""
+
+    __slots__ = ("key", "request", "priority", "tokens", "future", "enqueued_at", "started", "upstream",
+                 "waiters", "task")
+
+    def __init__(self, key: Optional[str], request: Dict[str, Any], priority: int, tokens: int, upstream: bool):
+        self.key = key
+        self.request = request
+        self.priority = priority
+        self.tokens = tokens
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+        self.enqueued_at = time.monotonic()
+        self.started = False
+        self.upstream = upstream
+        self.waiters = 1
+        self.task: Optional[asyncio.Task] = None
+
+
+class LLMDispatcher:
+    """
+    Despachador central de llamadas a chat.completions.create.
+
+    Todas las llamadas pasan por una cola de prioridad atendida por un event
+    loop propio en un hilo en segundo plano, así que sirve por igual a las
+    rutas síncronas (get_response) y a las asíncronas (la API). El
+    despachador:
+
+    - respeta presupuestos de peticiones y tokens por minuto (cubetas de fichas),
+      y se detiene el tiempo que indique un 429 con Retry-After;
+    - limita las llamadas simultáneas;
+    - atiende primero las conversaciones cercanas a un handoff;
+    - agrupa las peticiones idénticas en curso en una sola llamada;
+    - reintenta los errores transitorios con espera exponencial con jitter (tenacity);
+    - con un plazo, cancela la llamada si nadie más la espera y, opcionalmente,
+      lanza una segunda petición de cobertura si la primera tarda más que un
+      percentil de las latencias recientes.
+
+    Las respuestas por partes (stream=True) no se agrupan: admit() solo
+    reserva el presupuesto en orden de prioridad y la llamada la hace quien
+    consume el stream.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], requests_per_minute: float = 0,
+                 tokens_per_minute: float = 0, max_concurrency: int = 16, max_retries: int = 4,
+                 retry_max_wait: float = 20.0, count_tokens: Callable[[Dict[str, Any]], int] = request_tokens):
+        """
+        Inicializa el despachador (el hilo se inicia con la primera petición).
+
+        Args:
+            client_factory: Función que crea el cliente AsyncOpenAI del despachador
+            requests_per_minute: Máximo de peticiones por minuto (0 = sin límite)
+            tokens_per_minute: Máximo de tokens por minuto (0 = sin límite)
+            max_concurrency: Máximo de llamadas simultáneas al modelo
+            max_retries: Reintentos de cada llamada ante errores transitorios
+            retry_max_wait: Segundos máximos de espera entre reintentos
+            count_tokens: Función que estima los tokens de una petición
+        """
+        self.client_factory = client_factory
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.retry_max_wait = retry_max_wait
+        self.count_tokens = count_tokens
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Job] = {}
+        self._jobs: Dict[concurrent.futures.Future, _Job] = {}
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._heap: List[Tuple[int, int, _Job]] = []
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._main: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._client: Any = None
+        self._paused_until = 0.0
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.retries = 0
+
+    # Hilo y event loop propios
+
+    def start(self) -> None:
+        """Inicia el hilo del despachador si no está corriendo."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(self._ready,),
+                                                name="llm-dispatcher", daemon=True)
+                self._thread.start()
+            ready = self._ready
+        ready.wait()
+
+    def _run(self, ready: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._main = loop.create_task(self._schedule())
+        ready.set()
+        try:
+            loop.run_until_complete(self._main)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Cancelar las llamadas en curso antes de cerrar el loop
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Detiene el hilo; las peticiones en cola se cancelan.
+
+        Args:
+            timeout: Segundos máximos de espera
+        """
+        loop, thread = self._loop, self._thread
+        if loop is None or thread is None or not thread.is_alive():
+            return
+        loop.call_soon_threadsafe(self._main.cancel)
+        thread.join(timeout)
+        with self._lock:
+            for _, _, job in self._heap:
+                job.future.cancel()
+            self._heap.clear()
+            self._inflight.clear()
+            self._jobs.clear()
+        self._thread = None
+        self._client = None
+
+    # Envío de peticiones
+
+    def submit(self, request: Dict[str, Any], priority: int = PRIORITY_NORMAL,
+               coalesce: bool = True) -> concurrent.futures.Future:
+        """
+        Encola una llamada al modelo, o se une a una idéntica que ya esté en curso.
+
+        Args:
+            request: Argumentos de chat.completions.create (sin stream)
+            priority: Prioridad de la conversación (menor = antes)
+            coalesce: Si se puede unir a una petición idéntica en curso
+
+        Returns:
+            Futuro con la respuesta del modelo
+        """
+        return self._enqueue(request, priority, upstream=True, coalesce=coalesce)
+
+    def cancel(self, future: concurrent.futures.Future) -> None:
+        """
+        Abandona la espera de una petición enviada con submit.
+
+        Si nadie más espera la misma llamada, se retira de la cola o se cancela
+        la llamada en curso (y con ella la conexión HTTP).
+
+        Args:
+            future: Futuro devuelto por submit
+        """
+        with self._lock:
+            job = self._jobs.get(future)
+            if job is None or future.done():
+                return
+            job.waiters -= 1
+            if job.waiters > 0:
+                return
+            del self._jobs[future]
+            if job.key and self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            LLM_CANCELLED.inc()
+            if job.task is None:
+                # Todavía en cola: _next_job y _schedule descartan los futuros cancelados
+                future.cancel()
+                return
+            task = job.task
+        self._loop.call_soon_threadsafe(task.cancel)
+
+    def latency_percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """
+        Percentil de la latencia de las llamadas recientes (cola incluida).
+
+        Args:
+            q: Percentil entre 0 y 1
+            min_samples: Muestras mínimas para dar un valor
+
+        Returns:
+            Segundos, o None si todavía no hay muestras suficientes
+        """
+        samples = sorted(self._latencies)
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    @staticmethod
+    def _wait_time(started: float, timeout: Optional[float], hedge_after: Optional[float],
+                   hedged: bool) -> Optional[float]:
+        """Segundos hasta el próximo evento de complete: el plazo o la petición de cobertura."""
+        elapsed = time.monotonic() - started
+        waits = []
+        if timeout is not None:
+            waits.append(timeout - elapsed)
+        if hedge_after is not None and not hedged:
+            waits.append(hedge_after - elapsed)
+        return max(0.0, min(waits)) if waits else None
+
+    @staticmethod
+    def _settle(futures: List[concurrent.futures.Future]) -> Optional[concurrent.futures.Future]:
+        """
+        Devuelve el primer futuro con respuesta y quita de la lista los que fallaron.
+
+        Si fallaron todos, relanza el error del último.
+        """
+        failed = None
+        for future in [f for f in futures if f.done()]:
+            if not future.cancelled() and future.exception() is None:
+                return future
+            futures.remove(future)
+            failed = future
+        if not futures and failed is not None:
+            failed.result()
+        return None
+
+    def _hedge(self, request: Dict[str, Any], priority: int,
+               futures: List[concurrent.futures.Future]) -> None:
+        LLM_HEDGES.inc(result="fired")
+        # La cobertura no se agrupa con la original (la igualaría)
+        futures.append(self.submit(request, priority, coalesce=False))
+
+    def _winner(self, future: concurrent.futures.Future, futures: List[concurrent.futures.Future]) -> Any:
+        if len(futures) > 1 and future is not futures[0]:
+            LLM_HEDGES.inc(result="won")
+        return future.result()
+
+    def complete(self, request: Dict[str, Any], priority: int = PRIORITY_NORMAL,
+                 timeout: Optional[float] = None, hedge_after: Optional[float] = None) -> Any:
+        """
+        Llama al modelo y espera la respuesta (para código síncrono).
+
+        Args:
+            request: Argumentos de chat.completions.create (sin stream)
+            priority: Prioridad de la conversación
+            timeout: Segundos máximos de espera (None = sin límite); al vencer se cancela la llamada
+            hedge_after: Segundos tras los que se lanza una petición de cobertura (None = nunca)
+
+        Returns:
+            Respuesta de chat.completions.create
+
+        Raises:
+            TimeoutError: Si vence el plazo sin respuesta
+        """
+        started = time.monotonic()
+        futures = [self.submit(request, priority)]
+        try:
+            while True:
+                wait = self._wait_time(started, timeout, hedge_after, len(futures) > 1)
+                concurrent.futures.wait(futures, wait, return_when=concurrent.futures.FIRST_COMPLETED)
+                winner = self._settle(futures)
+                if winner is not None:
+                    return self._winner(winner, futures)
+                if timeout is not None and time.monotonic() - started >= timeout:
+                    raise TimeoutError(f"El modelo no respondió en {timeout:.2f} s")
+                if hedge_after is not None and len(futures) == 1 and time.monotonic() - started >= hedge_after:
+                    self._hedge(request, priority, futures)
+        finally:
+            for future in futures:
+                self.cancel(future)
+
+    async def acomplete(self, request: Dict[str, Any], priority: int = PRIORITY_NORMAL,
+                        timeout: Optional[float] = None, hedge_after: Optional[float] = None) -> Any:
+        """
+        Versión asíncrona de complete, para cualquier event loop.
+
+        Args:
+            request: Argumentos de chat.completions.create (sin stream)
+            priority: Prioridad de la conversación
+            timeout: Segundos máximos de espera (None = sin límite); al vencer se cancela la llamada
+            hedge_after: Segundos tras los que se lanza una petición de cobertura (None = nunca)
+
+        Returns:
+            Respuesta de chat.completions.create
+
+        Raises:
+            TimeoutError: Si vence el plazo sin respuesta
+        """
+        started = time.monotonic()
+        futures = [self.submit(request, priority)]
+        # asyncio.wait no cancela lo que espera: la llamada compartida solo se
+        # cancela con cancel() cuando ya no la espera nadie
+        waiters: Dict[concurrent.futures.Future, asyncio.Future] = {}
+        try:
+            while True:
+                for future in futures:
+                    if future not in waiters:
+                        waiters[future] = asyncio.wrap_future(future)
+                wait = self._wait_time(started, timeout, hedge_after, len(futures) > 1)
+                await asyncio.wait([waiters[f] for f in futures], timeout=wait,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                winner = self._settle(futures)
+                if winner is not None:
+                    return self._winner(winner, futures)
+                if timeout is not None and time.monotonic() - started >= timeout:
+                    raise TimeoutError(f"El modelo no respondió en {timeout:.2f} s")
+                if hedge_after is not None and len(futures) == 1 and time.monotonic() - started >= hedge_after:
+                    self._hedge(request, priority, futures)
+        finally:
+            for future in futures:
+                self.cancel(future)
+
+    def admit(self, request: Dict[str, Any], priority: int = PRIORITY_NORMAL,
+              timeout: Optional[float] = None) -> None:
+        """
+        Espera turno y presupuesto para una llamada que hará el propio llamador
+        (por ejemplo, una respuesta por partes).
+
+        Args:
+            request: Argumentos de la llamada
+            priority: Prioridad de la conversación
+            timeout: Segundos máximos de espera (None = sin límite)
+
+        Raises:
+            TimeoutError: Si vence el plazo antes del turno
+        """
+        future = self._enqueue(request, priority, upstream=False)
+        try:
+            future.result(timeout)
+        finally:
+            future.cancel()
+
+    async def aadmit(self, request: Dict[str, Any], priority: int = PRIORITY_NORMAL) -> None:
+        """
+        Versión asíncrona de admit (cancelar a quien espera retira la reserva de la cola).
+
+        Args:
+            request: Argumentos de la llamada
+            priority: Prioridad de la conversación
+        """
+        await asyncio.wrap_future(self._enqueue(request, priority, upstream=False))
+
+    def _enqueue(self, request: Dict[str, Any], priority: int, upstream: bool,
+                 coalesce: bool = True) -> concurrent.futures.Future:
+        self.start()
+        key = request_key(request) if upstream and coalesce else None
+        with self._lock:
+            job = self._inflight.get(key) if key else None
+            if job is not None:
+                self.coalesced += 1
+                job.waiters += 1
+                LLM_REQUESTS.inc(result="coalesced")
+                if priority < job.priority and not job.started:
+                    # Quien espera con más prioridad adelanta la petición compartida
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._sequence), job))
+                return job.future
+            job = _Job(key, request, priority, self.count_tokens(request), upstream)
+            if key:
+                self._inflight[key] = job
+            if upstream:
+                self._jobs[job.future] = job
+            heapq.heappush(self._heap, (priority, next(self._sequence), job))
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job.future
+
+    def _next_job(self) -> Optional[_Job]:
+        with self._lock:
+            while self._heap:
+                priority, _, job = heapq.heappop(self._heap)
+                # Las entradas repetidas (por un cambio de prioridad) se descartan
+                if job.started or priority != job.priority or job.future.cancelled():
+                    continue
+                job.started = True
+                return job
+        return None
+
+    # Planificación
+
+    async def _wait_for_budget(self, tokens: int) -> None:
+        while True:
+            delay = max(self._paused_until - time.monotonic(), self.requests.delay(1), self.tokens.delay(tokens))
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+
+    async def _schedule(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._slots.acquire()
+            if job.future.cancelled():
+                self._slots.release()
+                continue
+            await self._wait_for_budget(job.tokens)
+            LLM_QUEUE_SECONDS.observe(time.monotonic() - job.enqueued_at, priority=str(job.priority))
+            with self._lock:
+                # cancel() decide bajo el mismo lock si cancela el futuro o la tarea
+                if job.future.cancelled():
+                    self._slots.release()
+                elif job.upstream:
+                    job.task = asyncio.get_running_loop().create_task(self._execute(job))
+                else:
+                    self._slots.release()
+                    _resolve(job.future, None)
+
+    async def _execute(self, job: _Job) -> None:
+        from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+        def before_sleep(state) -> None:
+            error = state.outcome.exception()
+            self.retries += 1
+            LLM_RETRIES.inc(error=type(error).__name__)
+            pause = retry_after(error)
+            if pause:
+                # Retry-After aplica a todas las peticiones, no solo a esta
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+        try:
+            if self._client is None:
+                self._client = self.client_factory()
+            attempt_number = 0
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.max_retries + 1),
+                wait=wait_random_exponential(multiplier=0.5, max=self.retry_max_wait),
+                retry=retry_if_exception(is_retryable),
+                before_sleep=before_sleep,
+                reraise=True,
+            ):
+                with attempt:
+                    attempt_number += 1
+                    if attempt_number > 1:
+                        # Cada reintento vuelve a pasar por el presupuesto
+                        await self._wait_for_budget(job.tokens)
+                    self.upstream_calls += 1
+                    completion = await self._client.chat.completions.create(**job.request)
+            usage = getattr(completion, "usage", None)
+            if usage is not None:
+                # Ajustar el presupuesto de tokens con el consumo real
+                actual = (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+                self.tokens.consume(actual - job.tokens)
+            LLM_REQUESTS.inc(result="upstream")
+            self._latencies.append(time.monotonic() - job.enqueued_at)
+            _resolve(job.future, completion)
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as e:
+            LLM_REQUESTS.inc(result="error")
+            _resolve(job.future, error=e)
+        finally:
+            with self._lock:
+                if job.key and self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+                self._jobs.pop(job.future, None)
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve los contadores del despachador.
+
+        Returns:
+            Diccionario con llamadas al modelo, peticiones agrupadas, reintentos y cola
+        """
+        with self._lock:
+            queued = len({id(job) for _, _, job in self._heap if not job.started})
+        return {
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "queued": queued,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,234 @@
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+# Palabras vacías de cada idioma, ya sin tildes. No incluyen negaciones
+# ("no", "not") ni palabras con contenido como "hola" o "gracias".
+STOPWORDS: Dict[str, frozenset] = {
+    "es": frozenset("""
+        a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuales cuando
+        cuanto cuanta cuantos cuantas de del desde donde durante e el ella ellas ellos en entre era eres
+        es esa esas ese eso esos esta estan estar estas este esto estos estoy fue ha hay hasta la las le
+        les lo los me mi mis mucho muchos muy nos nosotros o os para pero poco por porque pueda puedo
+        puede pueden que quien quienes se ser si sin sobre soy su sus tambien te ti tu tus un una unas
+        uno unos usted ustedes vosotros y ya yo
+    """.split()),
+    "en": frozenset("""
+        a about am an and any are as at be been by can could did do does for from has have how i if in
+        is it its me my of on or our please should so some that the their them there these they this
+        those to us was we were what when where which who whom why will with would you your
+    """.split()),
+}
+
+# Sufijos que elimina el lematizador ligero de cada idioma (texto sin
+# tildes), con su reemplazo: plurales, infinitivos y participios. No se
+# quitan las vocales finales de género: con textos tan cortos, las raíces
+# de dos o tres letras se parecen demasiado entre sí. Se aplica el primero
+# que deje una raíz de al menos MIN_STEM caracteres.
+SUFFIXES: Dict[str, tuple] = {
+    "es": (
+        ("ados", ""), ("adas", ""), ("idos", ""), ("idas", ""), ("ado", ""), ("ada", ""), ("ido", ""),
+        ("ida", ""), ("ar", ""), ("er", ""), ("ir", ""), ("es", ""), ("s", ""),
+    ),
+    "en": (
+        ("ing", ""), ("ies", "y"), ("ied", "y"), ("ed", ""), ("es", ""), ("s", ""),
+    ),
+}
+MIN_STEM = 3
+
+
+def fold_accents(text: str) -> str:
+    """
+    Elimina tildes y diéresis ("Cómo" -> "Como", "ñ" -> "n").
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Texto sin marcas diacríticas
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Separa el texto en palabras en minúsculas, sin puntuación ni tildes.
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Lista de palabras
+    """
+    return re.sub(r'[^\w\s]', '', fold_accents(text.lower())).split()
+
+
+@lru_cache(maxsize=65536)
+def stem(token: str, language: str) -> str:
+    """
+    Reduce una palabra a una raíz aproximada quitando plurales y
+    terminaciones verbales frecuentes ("entradas", "entrar" -> "entr").
+
+    Args:
+        token: Palabra sin tildes
+        language: Código de idioma
+
+    Returns:
+        Raíz de la palabra
+    """
+    if language == "en" and token.endswith("ss"):
+        return token
+    for suffix, replacement in SUFFIXES.get(language, ()):
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[:-len(suffix)] + replacement
+    return token
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Distancia de Damerau-Levenshtein (con transposiciones adyacentes) entre dos palabras.
+
+    Args:
+        a: Primera palabra
+        b: Segunda palabra
+        limit: Distancia máxima de interés
+
+    Returns:
+        Distancia, o limit + 1 si la supera
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SymSpell:
+    """
+    Corrector ortográfico por borrado simétrico (al estilo de SymSpell).
+
+    Al construirlo se indexan todas las variantes de cada palabra del
+    vocabulario con hasta max_distance letras borradas. Para corregir una
+    palabra solo se generan sus propias variantes por borrado y se buscan en
+    ese índice, así que la consulta no recorre el vocabulario; los candidatos
+    se confirman con la distancia de Damerau-Levenshtein.
+    """
+
+    def __init__(self, words: Iterable[str], max_distance: int = 2, min_length: int = 5):
+        """
+        Construye el diccionario.
+
+        Args:
+            words: Palabras del vocabulario (con repeticiones, que cuentan como frecuencia)
+            max_distance: Máxima distancia de edición corregida
+            min_length: Largo mínimo de las palabras que se corrigen
+        """
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.words = Counter(words)
+        self.deletes: Dict[str, List[str]] = {}
+        for word in self.words:
+            for variant in self._deletes(word, max_distance):
+                self.deletes.setdefault(variant, []).append(word)
+
+    @staticmethod
+    def _deletes(word: str, distance: int) -> Set[str]:
+        variants = {word}
+        frontier = {word}
+        for _ in range(distance):
+            frontier = {item[:i] + item[i + 1:] for item in frontier if len(item) > 1 for i in range(len(item))}
+            variants |= frontier
+        return variants
+
+    def distance_for(self, token: str) -> int:
+        """Distancia permitida para una palabra: 1 hasta 7 letras y max_distance desde 8."""
+        return min(self.max_distance, 1 if len(token) < 8 else 2)
+
+    def correct(self, token: str) -> str:
+        """
+        Corrige una palabra con la más cercana del vocabulario.
+
+        Las palabras conocidas, cortas o sin candidatos cercanos se devuelven
+        sin cambios; entre candidatos a la misma distancia gana el más
+        frecuente.
+
+        Args:
+            token: Palabra sin tildes
+
+        Returns:
+            Palabra corregida
+        """
+        if token in self.words or len(token) < self.min_length:
+            return token
+        limit = self.distance_for(token)
+        best: Optional[tuple] = None
+        seen: Set[str] = set()
+        for variant in self._deletes(token, limit):
+            for word in self.deletes.get(variant, ()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                distance = edit_distance(token, word, limit)
+                if distance <= limit:
+                    key = (distance, -self.words[word], word)
+                    if best is None or key < best:
+                        best = key
+        return best[2] if best else token
+
+
+def build_speller(questions: Iterable[str], max_distance: int = 2) -> Optional[SymSpell]:
+    """
+    Construye el corrector con el vocabulario de las preguntas frecuentes.
+
+    Args:
+        questions: Preguntas de un idioma
+        max_distance: Máxima distancia de edición (0 = sin corrección)
+
+    Returns:
+        Corrector, o None si la corrección está desactivada
+    """
+    if max_distance <= 0:
+        return None
+    return SymSpell((token for question in questions for token in tokenize(question)), max_distance)
+
+
+def normalize_text(text: str, language: str, speller: Optional[SymSpell] = None) -> str:
+    """
+    Normaliza un texto para compararlo con las preguntas frecuentes.
+
+    Quita puntuación y tildes, corrige errores de tipeo con el vocabulario de
+    las FAQs (si hay corrector), elimina las palabras vacías y reduce cada
+    palabra a su raíz. Si quedan menos de dos palabras con contenido ("¿Quién
+    eres tú?", "hello there") se conservan todas, para no reducir una
+    pregunta corta a una sola palabra.
+
+    Args:
+        text: Texto original
+        language: Código de idioma
+        speller: Corrector ortográfico del idioma
+
+    Returns:
+        Raíces separadas por espacios
+    """
+    stopwords = STOPWORDS.get(language, frozenset())
+    tokens = tokenize(text)
+    if speller is not None:
+        tokens = [token if token in stopwords else speller.correct(token) for token in tokens]
+    content = [token for token in tokens if token not in stopwords]
+    if len(content) < 2:
+        # En preguntas cortas las palabras vacías son la pregunta ("who are u")
+        content = tokens
+    return " ".join(stem(token, language) for token in content)
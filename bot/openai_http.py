@@ -0,0 +1,182 @@
+import logging
+from typing import Any, AsyncIterator, Iterator, Optional
+
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Último evento de una respuesta por partes (SSE) de OpenAI
+SSE_DONE = b"data: [DONE]\n\n"
+# Plazos y límites del pool por defecto del SDK de OpenAI
+DEFAULT_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+
+
+def _ends_stream(tail: bytes, part: bytes) -> bytes:
+    return (tail + part)[-len(SSE_DONE):]
+
+
+class _DrainingStream(httpx.SyncByteStream):
+    """
+    Cuerpo de respuesta que, si el stream SSE ya envió [DONE], lee lo que
+    falta (el cierre del cuerpo chunked) antes de cerrarse.
+
+    El SDK deja de leer al recibir [DONE] y cierra la respuesta; con el cuerpo
+    a medio leer la biblioteca HTTP descarta la conexión en lugar de
+    devolverla al pool, así que cada respuesta por partes abría una conexión
+    TCP (y TLS) nueva. Si el stream se abandona antes de [DONE] la conexión
+    se cierra como siempre.
+    """
+
+    def __init__(self, stream: Any):
+        self._stream = stream
+        self._parts: Optional[Iterator[bytes]] = None
+        self._tail = b""
+
+    def __iter__(self) -> Iterator[bytes]:
+        self._parts = iter(self._stream)
+        for part in self._parts:
+            self._tail = _ends_stream(self._tail, part)
+            yield part
+
+    def close(self) -> None:
+        try:
+            if self._parts is not None and self._tail == SSE_DONE:
+                for _ in self._parts:
+                    pass
+        except Exception:
+            # Si no se puede leer el resto, la conexión simplemente se cierra
+            pass
+        finally:
+            self._stream.close()
+
+
+class _AsyncDrainingStream(httpx.AsyncByteStream):
+    """Versión asíncrona de _DrainingStream."""
+
+    def __init__(self, stream: Any):
+        self._stream = stream
+        self._parts: Optional[AsyncIterator[bytes]] = None
+        self._tail = b""
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        self._parts = self._stream.__aiter__()
+        async for part in self._parts:
+            self._tail = _ends_stream(self._tail, part)
+            yield part
+
+    async def aclose(self) -> None:
+        try:
+            if self._parts is not None and self._tail == SSE_DONE:
+                async for _ in self._parts:
+                    pass
+        except Exception:
+            pass
+        finally:
+            await self._stream.aclose()
+
+
+class KeepAliveTransport(httpx.BaseTransport):
+    """Envuelve un transporte HTTP para devolver al pool las conexiones de los streams terminados."""
+
+    def __init__(self, transport: Any):
+        self._transport = transport
+
+    def handle_request(self, request: Any) -> Any:
+        response = self._transport.handle_request(request)
+        return httpx.Response(status_code=response.status_code, headers=response.headers,
+                             stream=_DrainingStream(response.stream), extensions=response.extensions)
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncKeepAliveTransport(httpx.AsyncBaseTransport):
+    """Versión asíncrona de KeepAliveTransport."""
+
+    def __init__(self, transport: Any):
+        self._transport = transport
+
+    async def handle_async_request(self, request: Any) -> Any:
+        response = await self._transport.handle_async_request(request)
+        return httpx.Response(status_code=response.status_code, headers=response.headers,
+                             stream=_AsyncDrainingStream(response.stream), extensions=response.extensions)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class KeepAliveHttpClient(httpx.Client):
+    """
+    Cliente httpx con la configuración por defecto del SDK y sus transportes
+    envueltos en KeepAliveTransport.
+
+    No se le pasa transport=: así el cliente sigue creando sus propios
+    transportes, incluidos los de los proxies del entorno (HTTP_PROXY,
+    HTTPS_PROXY, ALL_PROXY y NO_PROXY), y aquí solo se envuelven. Para eso
+    redefine _init_transport y _init_proxy_transport, que no son públicos:
+    requirements.txt fija las versiones de httpx con las que se probó, y si
+    una versión nueva deja de llamarlos se avisa en el log.
+    """
+
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        kwargs.setdefault("limits", DEFAULT_LIMITS)
+        kwargs.setdefault("follow_redirects", True)
+        super().__init__(**kwargs)
+        if not isinstance(self._transport, KeepAliveTransport):
+            logger.warning("httpx %s no usó _init_transport: las respuestas por partes no reutilizarán conexiones",
+                           httpx.__version__)
+
+    def _init_transport(self, *args: Any, **kwargs: Any) -> Any:
+        return KeepAliveTransport(super()._init_transport(*args, **kwargs))
+
+    def _init_proxy_transport(self, *args: Any, **kwargs: Any) -> Any:
+        return KeepAliveTransport(super()._init_proxy_transport(*args, **kwargs))
+
+
+class AsyncKeepAliveHttpClient(httpx.AsyncClient):
+    """Versión asíncrona de KeepAliveHttpClient."""
+
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        kwargs.setdefault("limits", DEFAULT_LIMITS)
+        kwargs.setdefault("follow_redirects", True)
+        super().__init__(**kwargs)
+        if not isinstance(self._transport, AsyncKeepAliveTransport):
+            logger.warning("httpx %s no usó _init_transport: las respuestas por partes no reutilizarán conexiones",
+                           httpx.__version__)
+
+    def _init_transport(self, *args: Any, **kwargs: Any) -> Any:
+        return AsyncKeepAliveTransport(super()._init_transport(*args, **kwargs))
+
+    def _init_proxy_transport(self, *args: Any, **kwargs: Any) -> Any:
+        return AsyncKeepAliveTransport(super()._init_proxy_transport(*args, **kwargs))
+
+
+def create_client(**kwargs: Any) -> "openai.OpenAI":
+    """
+    Crea un cliente síncrono de OpenAI cuyo pool reutiliza las conexiones
+    también después de las respuestas por partes.
+
+    Args:
+        **kwargs: Argumentos de openai.OpenAI (api_key, base_url, max_retries...)
+
+    Returns:
+        Cliente OpenAI
+    """
+    return openai.OpenAI(http_client=KeepAliveHttpClient(), **kwargs)
+
+
+def create_async_client(**kwargs: Any) -> "openai.AsyncOpenAI":
+    """
+    Versión asíncrona de create_client.
+
+    Args:
+        **kwargs: Argumentos de openai.AsyncOpenAI
+
+    Returns:
+        Cliente AsyncOpenAI
+    """
+    return openai.AsyncOpenAI(http_client=AsyncKeepAliveHttpClient(), **kwargs)
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import RULES_PATH, RULES_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """
+    Buscador de varias palabras clave en una sola pasada.
+
+    Todas las palabras clave se compilan en una única expresión regular con
+    alternancia (las más largas primero) dentro de un lookahead, de modo que
+    se prueban en cada posición del texto sin consumirlo. Las palabras clave
+    contenidas dentro de otra que coincide también se reportan, así que el
+    resultado equivale a comprobar `keyword in text` para cada una.
+    """
+
+    def __init__(self, keywords: Sequence[str]):
+        """
+        Compila el buscador.
+
+        Args:
+            keywords: Palabras clave (en minúsculas)
+        """
+        self.keywords = [keyword for keyword in dict.fromkeys(keywords) if keyword]
+        # Palabras clave contenidas en cada una (incluida ella misma)
+        self._contained: Dict[str, Tuple[str, ...]] = {
+            keyword: tuple(other for other in self.keywords if other in keyword)
+            for keyword in self.keywords
+        }
+        if self.keywords:
+            alternation = "|".join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True))
+            self._pattern: Optional[re.Pattern] = re.compile(f"(?=({alternation}))")
+        else:
+            self._pattern = None
+
+    def find_all(self, text: str) -> List[str]:
+        """
+        Devuelve todas las palabras clave presentes en el texto.
+
+        Args:
+            text: Texto en minúsculas
+
+        Returns:
+            Palabras clave encontradas, en el orden en que fueron definidas
+        """
+        if self._pattern is None:
+            return []
+        found = set()
+        for match in self._pattern.finditer(text):
+            found.update(self._contained[match.group(1)])
+        return [keyword for keyword in self.keywords if keyword in found]
+
+    def search(self, text: str) -> bool:
+        """
+        Indica si alguna palabra clave aparece en el texto.
+
+        Args:
+            text: Texto en minúsculas
+
+        Returns:
+            True si hay al menos una coincidencia
+        """
+        return self._pattern is not None and self._pattern.search(text) is not None
+
+
+class RuleSet:
+    """
+    Tablas de reglas compiladas por idioma: palabras clave de handoff y
+    respuestas simples por palabra clave.
+    """
+
+    def __init__(self, handoff: Dict[str, List[str]], simple_responses: Dict[str, Dict[str, str]]):
+        """
+        Compila las tablas de reglas.
+
+        Args:
+            handoff: Palabras clave de solicitud de agente humano por idioma
+            simple_responses: Respuestas por palabra clave por idioma
+        """
+        self.simple_responses = simple_responses
+        self.handoff_matchers = {lang: KeywordMatcher(keywords) for lang, keywords in handoff.items()}
+        self.simple_matchers = {lang: KeywordMatcher(list(responses)) for lang, responses in simple_responses.items()}
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleSet":
+        """
+        Carga las reglas desde un archivo JSON.
+
+        Args:
+            path: Ruta del archivo
+
+        Returns:
+            Reglas compiladas
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("handoff", {}), data.get("simple_responses", {}))
+
+    def is_handoff_request(self, message: str, language: str) -> bool:
+        """
+        Verifica si el mensaje pide hablar con un humano.
+
+        Args:
+            message: Mensaje del usuario
+            language: Código de idioma
+
+        Returns:
+            True si contiene alguna palabra clave de handoff del idioma
+        """
+        matcher = self.handoff_matchers.get(language)
+        return matcher is not None and matcher.search(message.lower())
+
+    def simple_matches(self, message: str, language: str) -> List[Tuple[str, str]]:
+        """
+        Busca las respuestas simples que aplican al mensaje.
+
+        Args:
+            message: Mensaje del usuario
+            language: Código de idioma (se usa español si no hay reglas para él)
+
+        Returns:
+            Lista de (palabra clave, respuesta) en orden de prioridad
+        """
+        if language not in self.simple_matchers:
+            language = "es"
+        matcher = self.simple_matchers.get(language)
+        if matcher is None:
+            return []
+        responses = self.simple_responses[language]
+        return [(keyword, responses[keyword]) for keyword in matcher.find_all(message.lower())]
+
+
+class ReloadingRules:
+    """
+    Mantiene las reglas cargadas desde un archivo y las recarga cuando el
+    archivo cambia, sin reiniciar el proceso.
+    """
+
+    def __init__(self, path: str, check_interval: float = 5.0):
+        """
+        Carga las reglas.
+
+        Args:
+            path: Ruta del archivo JSON de reglas
+            check_interval: Segundos mínimos entre comprobaciones del archivo
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = os.path.getmtime(path)
+        self._rules = RuleSet.from_file(path)
+        self._checked_at = time.monotonic()
+
+    def reload_if_changed(self) -> bool:
+        """
+        Recarga las reglas si el archivo cambió.
+
+        Returns:
+            True si se recargaron
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime == self._mtime:
+                    return False
+                rules = RuleSet.from_file(self.path)
+            except (OSError, ValueError) as e:
+                # Conservar las reglas actuales si el archivo no es válido
+                logger.warning("No se pudieron recargar las reglas de %s: %s", self.path, e)
+                return False
+            self._rules = rules
+            self._mtime = mtime
+            return True
+
+    def get(self) -> RuleSet:
+        """
+        Devuelve las reglas vigentes, comprobando antes si el archivo cambió.
+
+        Returns:
+            Reglas compiladas
+        """
+        if self.check_interval >= 0 and time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload_if_changed()
+        return self._rules
+
+
+# Reglas compiladas una sola vez al importar el módulo
+RULES = ReloadingRules(RULES_PATH, RULES_RELOAD_INTERVAL)
@@ -0,0 +1,186 @@
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bot.knowledge_base import clean_text
+
+
+def embed_text(text: str, dim: int = 512, ngram_range: tuple = (3, 4)) -> np.ndarray:
+    """
+    Convierte un texto en un vector de tamaño fijo sin modelos externos.
+
+    Usa el truco del hashing: cada palabra y cada n-grama de caracteres se
+    proyecta a una posición (crc32 módulo dim) con un signo pseudoaleatorio.
+    El vector resultante se normaliza (L2) para comparar por coseno.
+
+    Args:
+        text: Texto a convertir
+        dim: Dimensión del vector
+        ngram_range: Tamaños mínimo y máximo de los n-gramas de caracteres
+
+    Returns:
+        Vector float32 normalizado
+    """
+    normalized = clean_text(text)
+    features: List[str] = normalized.split()
+    padded = f" {normalized} "
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+
+    hashes = np.array([zlib.crc32(feature.encode("utf-8")) for feature in features], dtype=np.uint64)
+    signs = np.where(hashes & np.uint64(1 << 31), -1.0, 1.0)
+    vector += np.bincount((hashes % np.uint64(dim)).astype(np.int64), weights=signs, minlength=dim).astype(np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    Caché semántica de respuestas del modelo para preguntas casi duplicadas.
+
+    Los mensajes se guardan como vectores en una matriz de NumPy de capacidad
+    fija; una búsqueda es un producto matriz-vector y devuelve la respuesta
+    más parecida del mismo idioma si supera el umbral de coseno. Cuando la
+    matriz se llena se desaloja la entrada usada hace más tiempo.
+
+    La clave es solo el mensaje: quien la usa debe limitarla a preguntas sin
+    contexto previo (el primer turno), porque una respuesta que depende de
+    la conversación no sirve para la de otro usuario.
+    """
+
+    def __init__(self, capacity: int = 2000, dim: int = 512, threshold: float = 0.9,
+                 ttl: Optional[float] = None):
+        """
+        Inicializa la caché.
+
+        Args:
+            capacity: Máximo de entradas (la memoria es capacity x dim x 4 bytes)
+            dim: Dimensión de los vectores
+            threshold: Similitud coseno mínima para devolver una respuesta
+            ttl: Segundos de vida de cada entrada (None = sin expiración)
+        """
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._created = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        # Idioma de cada entrada como código entero (-1 = vacía) para filtrar sin bucles de Python
+        self._lang_codes = np.full(capacity, -1, dtype=np.int8)
+        self._language_ids: Dict[str, int] = {}
+        self._answers: List[Optional[str]] = [None] * capacity
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def lookup(self, message: str, language: str) -> Optional[str]:
+        """
+        Busca la respuesta de una pregunta parecida.
+
+        Args:
+            message: Mensaje del usuario
+            language: Código de idioma
+
+        Returns:
+            Respuesta almacenada o None
+        """
+        vector = embed_text(message, self.dim)
+        with self._lock:
+            if not self._size or not vector.any():
+                self.misses += 1
+                return None
+
+            code = self._language_ids.get(language)
+            if code is None:
+                self.misses += 1
+                return None
+
+            scores = self._vectors[:self._size] @ vector
+            valid = self._lang_codes[:self._size] == code
+            if self.ttl is not None:
+                valid &= (time.time() - self._created[:self._size]) <= self.ttl
+            scores[~valid] = -1.0
+
+            best = int(scores.argmax())
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._last_used[best] = time.time()
+            self.hits += 1
+            return self._answers[best]
+
+    def add(self, message: str, language: str, answer: str) -> None:
+        """
+        Guarda la respuesta del modelo para un mensaje.
+
+        Args:
+            message: Mensaje del usuario
+            language: Código de idioma
+            answer: Respuesta del modelo
+        """
+        vector = embed_text(message, self.dim)
+        if not vector.any():
+            return
+        now = time.time()
+        with self._lock:
+            code = self._language_ids.get(language)
+            if code is None:
+                if len(self._language_ids) > np.iinfo(np.int8).max:
+                    # El idioma lo envía el cliente: no se admiten códigos sin límite
+                    return
+                code = self._language_ids[language] = len(self._language_ids)
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                # Desalojar la entrada usada hace más tiempo
+                slot = int(self._last_used.argmin())
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._lang_codes[slot] = code
+            self._answers[slot] = answer
+
+    def memory_usage(self) -> int:
+        """
+        Memoria reservada por los arreglos de la caché.
+
+        Returns:
+            Tamaño aproximado en bytes
+        """
+        return self._vectors.nbytes + self._created.nbytes + self._last_used.nbytes + self._lang_codes.nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve los contadores de la caché.
+
+        Returns:
+            Diccionario con tamaño, aciertos, fallos, tasa de aciertos y memoria
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_bytes": self.memory_usage(),
+        }
@@ -0,0 +1,292 @@
+import asyncio
+import sys
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from bot.assistant import TixOBot
+from utils.storage import LRUTTLCache, SQLiteStore
+
+
+def estimate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """
+    Estima la memoria ocupada por un objeto y sus contenedores anidados.
+
+    Args:
+        obj: Objeto a medir
+
+    Returns:
+        Tamaño aproximado en bytes
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in obj)
+    return size
+
+
+class SessionConflict(RuntimeError):
+    """La sesión está ocupada por otro worker o este la guardó sobre una versión vieja."""
+
+
+class SessionManager:
+    """
+    Mantiene una instancia de TixOBot por usuario entre peticiones.
+
+    Las sesiones activas viven en una caché LRU con expiración por
+    inactividad. Opcionalmente se guardan en SQLite para sobrevivir a
+    reinicios del proceso.
+
+    Con shared=True varios procesos (workers de uvicorn) comparten el mismo
+    archivo SQLite: la copia en memoria se conserva, pero antes de usarla se
+    compara su hora de guardado con la del almacén y se recarga si otro
+    worker atendió al usuario después. Cada turno reclama la sesión en el
+    almacén (claim), así que dos workers no atienden a la vez al mismo
+    usuario, y save() solo escribe si la versión no cambió desde que se leyó.
+    """
+
+    def __init__(self, factory: Callable[[str], TixOBot], max_sessions: int = 1000,
+                 ttl: float = 1800.0, db_path: Optional[str] = None, shared: bool = False,
+                 lease_ttl: float = 120.0):
+        """
+        Inicializa el gestor de sesiones.
+
+        Args:
+            factory: Función que crea un bot nuevo para un user_id
+            max_sessions: Máximo de sesiones en memoria
+            ttl: Segundos de inactividad tras los que expira una sesión
+            db_path: Ruta de la base SQLite para persistir sesiones (None = solo memoria)
+            shared: True si otros procesos escriben en el mismo almacén
+            lease_ttl: Segundos que dura el reclamo de una sesión en modo
+                compartido (si el worker que la tiene cae, vence solo)
+        """
+        if shared and not db_path:
+            raise ValueError("Las sesiones compartidas requieren db_path")
+        self.factory = factory
+        self.ttl = ttl
+        self.shared = shared
+        self.lease_ttl = lease_ttl
+        self.store = SQLiteStore(db_path, table="sessions") if db_path else None
+        self._sessions = LRUTTLCache(max_items=max_sessions, ttl=ttl, on_evict=self._on_evict)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Hora de guardado de la copia en memoria de cada sesión (modo compartido)
+        self._versions: Dict[str, float] = {}
+        self.created = 0
+        self.restored = 0
+        self.refreshed = 0
+
+    def _on_evict(self, user_id: str, bot: TixOBot) -> None:
+        """
+        Suelta la sesión desalojada por capacidad.
+
+        No se escribe en el almacén: save() ya la guardó tras cada turno, y en
+        modo compartido la copia en memoria puede ser más antigua que la que
+        guardó otro worker. Puede ejecutarse fuera del event loop (get() corre
+        en un hilo), así que el candado se descarta después con
+        release_idle_locks().
+        """
+        self._versions.pop(user_id, None)
+
+    def _release_lock(self, user_id: str) -> None:
+        """Descarta el candado de un usuario salvo que alguna petición lo tenga tomado (solo desde el event loop)."""
+        lock = self._locks.get(user_id)
+        if lock is not None and not lock.locked():
+            del self._locks[user_id]
+
+    def _is_stale(self, user_id: str) -> bool:
+        """True si otro proceso guardó la sesión después que este."""
+        updated_at = self.store.updated_at(user_id)
+        return updated_at is not None and updated_at > self._versions.get(user_id, 0.0)
+
+    def get(self, user_id: str) -> TixOBot:
+        """
+        Obtiene el bot del usuario, restaurándolo o creándolo si hace falta.
+
+        Args:
+            user_id: Identificador del usuario
+
+        Returns:
+            Instancia de TixOBot con el estado de la sesión
+        """
+        bot = self._sessions.get(user_id)
+        if bot is not None:
+            if self.shared and self._is_stale(user_id):
+                self._versions[user_id] = self.store.updated_at(user_id) or 0.0
+                bot.load_state(self.store.get(user_id) or {})
+                self.refreshed += 1
+            return bot
+
+        state = None
+        if self.store:
+            self._versions[user_id] = self.store.updated_at(user_id) or 0.0
+            state = self.store.get(user_id, max_age=self.ttl)
+        bot = self.factory(user_id)
+        if state:
+            bot.load_state(state)
+            self.restored += 1
+        else:
+            self.created += 1
+        self._sessions.set(user_id, bot)
+        return bot
+
+    def save(self, user_id: str, bot: TixOBot) -> None:
+        """
+        Persiste el estado de la sesión (si hay almacén configurado).
+
+        Args:
+            user_id: Identificador del usuario
+            bot: Bot de la sesión
+
+        Raises:
+            SessionConflict: En modo compartido, si otro worker guardó la
+                sesión después de que este la leyera
+        """
+        if not self.store:
+            return
+        if not self.shared:
+            self._versions[user_id] = self.store.set(user_id, bot.to_state())
+            return
+        updated_at = self.store.compare_and_set(user_id, bot.to_state(), self._versions.get(user_id) or None)
+        if updated_at is None:
+            # Otro worker guardó la sesión durante el turno: la copia en memoria ya no sirve
+            self._sessions.pop(user_id)
+            self._versions.pop(user_id, None)
+            raise SessionConflict(f"La sesión de {user_id} cambió en otro worker durante el turno")
+        self._versions[user_id] = updated_at
+
+    def lock(self, user_id: str) -> asyncio.Lock:
+        """
+        Devuelve el candado que serializa las peticiones de un mismo usuario.
+
+        Args:
+            user_id: Identificador del usuario
+
+        Returns:
+            Candado asíncrono de la sesión
+        """
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    async def claim(self, user_id: str) -> Optional[str]:
+        """
+        Reclama la sesión en el almacén compartido para el turno en curso.
+
+        Espera a que el worker que la tiene la libere o a que venza su
+        reclamo. Sin modo compartido no hace nada.
+
+        Args:
+            user_id: Identificador del usuario
+
+        Returns:
+            Identificador del reclamo para release(), o None sin modo compartido
+
+        Raises:
+            SessionConflict: Si la sesión sigue reclamada tras lease_ttl segundos
+        """
+        if not self.shared:
+            return None
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lease_ttl + 1.0
+        while not await asyncio.to_thread(self.store.claim, user_id, owner, self.lease_ttl):
+            if time.monotonic() > deadline:
+                raise SessionConflict(f"La sesión de {user_id} está ocupada por otro worker")
+            await asyncio.sleep(0.05)
+        return owner
+
+    def release(self, user_id: str, owner: Optional[str]) -> None:
+        """
+        Libera el reclamo obtenido con claim().
+
+        Args:
+            user_id: Identificador del usuario
+            owner: Valor devuelto por claim()
+        """
+        if owner is not None:
+            self.store.release(user_id, owner)
+
+    def drop(self, user_id: str) -> None:
+        """
+        Elimina la sesión de memoria y del almacén.
+
+        Args:
+            user_id: Identificador del usuario
+        """
+        self._sessions.pop(user_id)
+        self._release_lock(user_id)
+        self._versions.pop(user_id, None)
+        if self.store:
+            self.store.delete(user_id)
+
+    def purge_expired(self) -> int:
+        """
+        Elimina las sesiones expiradas de memoria y del almacén.
+
+        La caché solo descarta los elementos expirados al acceder a ellos, así
+        que esto debe llamarse periódicamente (api.py lo hace cada
+        SESSION_PURGE_INTERVAL_SECONDS).
+
+        Returns:
+            Número de sesiones eliminadas de memoria
+        """
+        removed = self._sessions.purge_expired()
+        # list() copia las claves de una vez: otros hilos pueden estar guardando sesiones
+        for user_id in list(self._versions):
+            if user_id not in self._sessions:
+                self._versions.pop(user_id, None)
+        if self.store:
+            self.store.purge_older_than(self.ttl)
+        return removed
+
+    def release_idle_locks(self) -> int:
+        """
+        Descarta los candados de usuarios que ya no tienen sesión en memoria.
+
+        Debe llamarse desde el event loop que usa los candados: así ninguna
+        petición puede estar entre lock() y la espera del candado mientras se
+        descarta.
+
+        Returns:
+            Número de candados descartados
+        """
+        before = len(self._locks)
+        for user_id in [user_id for user_id in self._locks if user_id not in self._sessions]:
+            self._release_lock(user_id)
+        return before - len(self._locks)
+
+    def memory_usage(self) -> int:
+        """
+        Estima la memoria ocupada por las sesiones activas.
+
+        Returns:
+            Tamaño aproximado en bytes
+        """
+        return sum(
+            bot.memory_usage() if hasattr(bot, "memory_usage") else estimate_size(bot.to_state())
+            for _, bot in self._sessions.items()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve los contadores del gestor de sesiones.
+
+        Returns:
+            Diccionario con sesiones activas, aciertos, desalojos, memoria, etc.
+        """
+        stats = self._sessions.stats()
+        stats.update({
+            "created": self.created,
+            "restored": self.restored,
+            "refreshed": self.refreshed,
+            "persistent": self.store is not None,
+            "shared": self.shared,
+            "memory_bytes": self.memory_usage(),
+        })
+        return stats
@@ -7,11 +7,36 @@ load_dotenv()
 # Configuracion de la API de OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
-# Verificar si la clave de API esta configurada
-if not OPENAI_API_KEY or OPENAI_API_KEY == "":
-    print("⚠️  ADVERTENCIA: No se ha configurado OPENAI_API_KEY. El bot funcionara en modo limitado.")
-    print("Por favor, crea un archivo .env con tu clave de API de OpenAI.")
-    print("Ejemplo: OPENAI_API_KEY=sk-tu-clave-aqui")
+def warn_if_unconfigured() -> bool:
+    """
+    Avisa si la clave de API no esta configurada.
+    
+    Se llama desde los puntos de entrada (no al importar config), para que
+    importar los modulos no tenga efectos secundarios.
+    
+    Returns:
+        True si la configuracion esta completa
+    """
+    # Verificar si la clave de API esta configurada
+    if not OPENAI_API_KEY or OPENAI_API_KEY == "":
+        print("⚠️  ADVERTENCIA: No se ha configurado OPENAI_API_KEY. El bot funcionara en modo limitado.")
+        print("Por favor, crea un archivo .env con tu clave de API de OpenAI.")
+        print("Ejemplo: OPENAI_API_KEY=sk-tu-clave-aqui")
+        return False
+    return True
+
+# Logging estructurado (utils/logs.py): nivel global, niveles por modulo
+# ("bot.assistant=DEBUG,utils.notifications=INFO"), formato "json" o "text",
+# fraccion de registros DEBUG que se conservan y archivo de salida (vacio = stderr)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+LOG_PATH = os.getenv("LOG_PATH", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # Registros en cola antes de descartar
+
+# Interfaz de Streamlit: mensajes por página del historial (0 = mostrar todos)
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "50"))
 
 # Configuracion del bot
 BOT_NAME = "Camile"
@@ -48,7 +73,101 @@ HUMAN_HANDOFF_MESSAGES = {
     "en": "I understand you need additional help. I'll connect you with a human agent. Please wait a moment."
 }
 
+# Puntuador de FAQs: "difflib" (similitud de secuencias) o "tfidf" (n-gramas de caracteres)
+FAQ_SCORER = os.getenv("FAQ_SCORER", "difflib")
+
+# Preguntas frecuentes e indice binario compilado con `python -m bot.faq_index`
+# (sin indice, se construye en memoria desde FAQS_PATH); se recargan al cambiar el archivo
+FAQS_PATH = os.getenv("FAQS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot", "data", "faqs.json"))
+FAQ_INDEX_PATH = os.getenv("FAQ_INDEX_PATH", "")
+FAQ_INDEX_RELOAD_INTERVAL = float(os.getenv("FAQ_INDEX_RELOAD_INTERVAL", "5"))  # Negativo = sin recarga
+
+# Errores de tipeo que se corrigen en las consultas a las FAQs (letras de
+# distancia, con el vocabulario de las preguntas); 0 = sin corrección
+FAQ_SPELL_MAX_DISTANCE = int(os.getenv("FAQ_SPELL_MAX_DISTANCE", "2"))
+
 # Configuracion del modelo de OpenAI
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")  # Vacio = API oficial (otra URL para un servidor local de pruebas)
 GPT_MODEL = "gpt-3.5-turbo"
 MAX_TOKENS = 150
 TEMPERATURE = 0.7
+
+# Despachador de llamadas al modelo: limites por minuto del plan de OpenAI (0 = sin limite),
+# llamadas simultaneas y reintentos con espera exponencial ante 429/5xx
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "3500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "90000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_MAX_WAIT = float(os.getenv("LLM_RETRY_MAX_WAIT", "20"))
+
+# Modo SLO de latencia: plazo total de cada respuesta en segundos (0 = sin plazo). Si el modelo
+# no responde a tiempo se cancela la llamada y se responde con la mejor FAQ por debajo del umbral
+# (si llega a DEGRADED_FAQ_MIN_CONFIDENCE) o con el mensaje de respaldo
+RESPONSE_DEADLINE_SECONDS = float(os.getenv("RESPONSE_DEADLINE_SECONDS", "0"))
+RESPONSE_DEADLINE_MARGIN_SECONDS = float(os.getenv("RESPONSE_DEADLINE_MARGIN_SECONDS", "0.05"))  # Reserva para responder
+DEGRADED_FAQ_MIN_CONFIDENCE = float(os.getenv("DEGRADED_FAQ_MIN_CONFIDENCE", "0.35"))
+# Petición de cobertura: si el modelo tarda más que este percentil de sus latencias recientes se
+# lanza una segunda petición igual y se usa la primera respuesta (0 = desactivada)
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Modo de servicio de la API: "single" (un proceso) o "shared" (varios workers
+# que comparten sesiones y caches en SQLite dentro de SHARED_STATE_DIR)
+SERVE_MODE = os.getenv("SERVE_MODE", "single")
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "0"))  # 0 = uno por nucleo
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+_SHARED = SERVE_MODE == "shared"
+
+# Sesiones de la API REST
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_PURGE_INTERVAL_SECONDS = float(os.getenv("SESSION_PURGE_INTERVAL_SECONDS", "60"))  # 0 = sin purga periódica
+SESSION_LEASE_SECONDS = float(os.getenv("SESSION_LEASE_SECONDS", "120"))  # Reclamo de una sesión por turno (modo compartido)
+SESSION_DB_PATH = os.getenv(  # Vacío = solo en memoria
+    "SESSION_DB_PATH", os.path.join(SHARED_STATE_DIR, "sessions.db") if _SHARED else ""
+)
+
+# Cache de respuestas del modelo: "off", "on", "record" o "replay"
+# ("replay" solo responde desde la cache, para pruebas deterministas)
+COMPLETION_CACHE_MODE = os.getenv("COMPLETION_CACHE_MODE", "on")
+COMPLETION_CACHE_SIZE = int(os.getenv("COMPLETION_CACHE_SIZE", "5000"))
+COMPLETION_CACHE_TTL_SECONDS = float(os.getenv("COMPLETION_CACHE_TTL_SECONDS", "3600"))
+COMPLETION_CACHE_DB_PATH = os.getenv(  # Vacío = solo en memoria
+    "COMPLETION_CACHE_DB_PATH", os.path.join(SHARED_STATE_DIR, "completions.db") if _SHARED else ""
+)
+
+# Cache semantica para preguntas parecidas (vectores locales de n-gramas)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "2000"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "0"))  # 0 = sin expiracion
+
+# Reglas de palabras clave (handoff y respuestas simples), recargadas al cambiar el archivo
+RULES_PATH = os.getenv("RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot", "data", "rules.json"))
+RULES_RELOAD_INTERVAL = float(os.getenv("RULES_RELOAD_INTERVAL", "5"))  # Negativo = sin recarga
+
+# Procesamiento en lote (/api/chat/batch)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))  # Llamadas simultaneas al modelo
+BATCH_FAQ_SCORER = os.getenv("BATCH_FAQ_SCORER", "")  # Vacio = FAQ_SCORER; "tfidf" puntua todo el lote de una vez
+
+# Registro de conversaciones en JSONL solo de anexado (vacio = desactivado). Con varios workers
+# conviene incluir "{pid}" en la ruta para que cada proceso escriba su propio archivo
+CONVERSATION_LOG_PATH = os.getenv("CONVERSATION_LOG_PATH", "")
+CONVERSATION_LOG_FSYNC_SECONDS = float(os.getenv("CONVERSATION_LOG_FSYNC_SECONDS", "5"))
+CONVERSATION_LOG_MAX_BYTES = int(os.getenv("CONVERSATION_LOG_MAX_BYTES", str(64 * 1024 * 1024)))  # 0 = sin rotar por tamano
+CONVERSATION_LOG_MAX_AGE_SECONDS = float(os.getenv("CONVERSATION_LOG_MAX_AGE_SECONDS", "86400"))  # 0 = sin rotar por tiempo
+
+# Cola persistente de notificaciones de handoff (enviadas en segundo plano); en modo
+# compartido todos los workers usan la misma base y cada alerta la envía uno solo
+HANDOFF_QUEUE_PATH = os.getenv(
+    "HANDOFF_QUEUE_PATH", os.path.join(SHARED_STATE_DIR, "handoff_queue.db") if _SHARED else "handoff_queue.db"
+)
+HANDOFF_DIGEST_THRESHOLD = int(os.getenv("HANDOFF_DIGEST_THRESHOLD", "5"))  # Alertas pendientes para enviar un resumen
+HANDOFF_SENT_RETENTION_SECONDS = float(os.getenv("HANDOFF_SENT_RETENTION_SECONDS", str(7 * 86400)))  # Alertas enviadas conservadas
+
+# Contexto enviado al modelo: presupuesto de tokens del historial reciente (sin la personalidad)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1000"))
+CONTEXT_MAX_TURNS = int(os.getenv("CONTEXT_MAX_TURNS", "10"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "200"))  # 0 = descartar turnos antiguos sin resumir
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "50"))  # Mensajes conservados por conversación
@@ -0,0 +1,87 @@
+import streamlit as st
+from datetime import datetime
+from bot.engine import ChatEngine
+from config import OPENAI_API_KEY, BOT_NAME, BOT_PERSONA, DEFAULT_LANGUAGE, CHAT_PAGE_SIZE
+from utils.chat_render import history_html, visible_window
+from utils.logs import configure_logging
+
+# Idempotente: Streamlit vuelve a ejecutar el script en cada interacción
+configure_logging()
+
+# Interfaz compacta de Streamlit (antes incluida en api.py): streamlit run embed_ui.py
+if not OPENAI_API_KEY:
+    st.error("⚠️ No se ha configurado la API key de OpenAI. Por favor, configura la variable OPENAI_API_KEY en el archivo .env")
+    st.stop()
+
+st.set_page_config(
+    page_title=f"{BOT_NAME} | Asistente Virtual de Tix.do",
+    page_icon="🎫",
+    layout="centered"
+)
+
+# Recursos compartidos por todas las sesiones del proceso (cliente de OpenAI,
+# despachador, FAQs); en session_state solo queda el estado de cada conversación
+@st.cache_resource
+def get_engine() -> ChatEngine:
+    return ChatEngine(name=BOT_NAME, persona=BOT_PERSONA, default_language=DEFAULT_LANGUAGE)
+
+if "messages" not in st.session_state:
+    st.session_state.messages = []
+    st.session_state.welcome_shown = False
+
+if "bot" not in st.session_state:
+    st.session_state.bot = get_engine().new_session()
+
+st.title(f"🎫 {BOT_NAME}")
+st.caption("Asistente virtual de Tix.do - Tu acompañante para eventos")
+
+if not st.session_state.messages and not st.session_state.welcome_shown:
+    welcome_message = st.session_state.bot.get_welcome_message()
+    st.session_state.messages.append({"role": "assistant", "content": welcome_message})
+    st.session_state.welcome_shown = True
+
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1
+
+def show_earlier_messages():
+    st.session_state.history_pages += 1
+
+# Solo las últimas páginas del historial, en un único bloque con el HTML de cada mensaje cacheado
+hidden, visible = visible_window(st.session_state.messages, CHAT_PAGE_SIZE, st.session_state.history_pages)
+if hidden:
+    st.button(f"Mostrar mensajes anteriores ({hidden})", on_click=show_earlier_messages)
+if visible:
+    st.markdown(history_html(visible, style="embed"), unsafe_allow_html=True)
+
+def submit_message():
+    user_message = st.session_state.user_input
+    if user_message.strip():
+        st.session_state.messages.append({"role": "user", "content": user_message})
+        selected_lang = "es" if st.session_state.language == "Español" else "en"
+        bot_response = st.session_state.bot.get_response(user_message, language=selected_lang)
+        st.session_state.messages.append({"role": "assistant", "content": bot_response})
+
+with st.form(key="message_form", clear_on_submit=True):
+    st.text_input("Escribe tu pregunta aquí:", key="user_input")
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        st.form_submit_button(label="Enviar", on_click=submit_message)
+    with col2:
+        if st.form_submit_button(label="Limpiar"):
+            st.session_state.messages = []
+            st.session_state.welcome_shown = False
+            st.session_state.history_pages = 1
+
+with st.sidebar:
+    selected_language = st.selectbox("Idioma / Language", ["Español", "English"], index=0 if DEFAULT_LANGUAGE == "es" else 1)
+    st.session_state.language = selected_language
+    st.subheader("Sobre Tix-o-bot")
+    st.write("Asistente virtual para Tix.do, la plataforma líder de eventos en República Dominicana.")
+    st.divider()
+    st.caption(f"© {datetime.now().year} Tix.do")
+    st.caption("Desarrollado por Ean Jimenez")
+    st.divider()
+    if st.button("Reiniciar conversación"):
+        st.session_state.messages = []
+        st.session_state.welcome_shown = False
+        st.session_state.history_pages = 1
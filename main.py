@@ -1,12 +1,14 @@
 import streamlit as st
-from openai import OpenAI
 from datetime import datetime
-from bot.assistant import TixOBot
+from bot.engine import ChatEngine
+from bot.history import CompactHistory
 from bot.knowledge_base import FAQS
-from config import OPENAI_API_KEY, BOT_NAME, BOT_PERSONA, DEFAULT_LANGUAGE
+from config import OPENAI_API_KEY, BOT_NAME, BOT_PERSONA, DEFAULT_LANGUAGE, CHAT_PAGE_SIZE
+from utils.chat_render import history_html, visible_window
+from utils.logs import configure_logging
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# Idempotente: Streamlit vuelve a ejecutar el script en cada interacción
+configure_logging()
 
 if not OPENAI_API_KEY:
     st.error("⚠️ No se ha configurado la API key de OpenAI. Por favor, configura la variable OPENAI_API_KEY en el archivo .env")
@@ -19,18 +21,21 @@ st.set_page_config(
     layout="centered"
 )
 
+# Recursos compartidos por todas las sesiones del proceso (cliente de OpenAI,
+# despachador, FAQs); en session_state solo queda el estado de cada conversación
+@st.cache_resource
+def get_engine() -> ChatEngine:
+    return ChatEngine(name=BOT_NAME, persona=BOT_PERSONA, default_language=DEFAULT_LANGUAGE)
+
 # Inicialización del estado de la sesión
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    # Historial compacto de la interfaz (se lee como una lista de diccionarios)
+    st.session_state.messages = CompactHistory()
     # Flag para controlar la visualización del mensaje de bienvenida
     st.session_state.welcome_shown = False
     
 if "bot" not in st.session_state:
-    st.session_state.bot = TixOBot(
-        name=BOT_NAME,
-        persona=BOT_PERSONA,
-        default_language=DEFAULT_LANGUAGE
-    )
+    st.session_state.bot = get_engine().new_session()
 
 # Estilo personalizado con buen contraste y visibilidad
 st.markdown("""
@@ -154,75 +159,80 @@ if not st.session_state.messages and not st.session_state.welcome_shown:
     st.session_state.messages.append({"role": "assistant", "content": welcome_message})
     st.session_state.welcome_shown = True
 
-# Mostrar historial de mensajes
-for message in st.session_state.messages:
-    if message["role"] == "user":
-        with st.container():
-            st.markdown(f"""
-            <div class="message-container" style="justify-content: flex-end;">
-                <div class="message-content" style="background-color: #e6f7ff;">
-                    {message["content"]}
-                </div>
-                <div class="user-avatar">👤</div>
-            </div>
-            """, unsafe_allow_html=True)
-    else:
-        with st.container():
-            st.markdown(f"""
-            <div class="message-container">
-                <div class="bot-avatar">🤖</div>
-                <div class="message-content">
-                    {message["content"]}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+def queue_message(user_message: str):
+    # Agregar mensaje del usuario al historial; la respuesta se transmite en la próxima ejecución
+    st.session_state.messages.append({"role": "user", "content": user_message})
+    selected_lang = "es" if st.session_state.language == "Español" else "en"
+    st.session_state.pending_message = (user_message, selected_lang)
 
 # Definir callback para el envío del formulario
 def submit_message():
     user_message = st.session_state.user_input
     if user_message.strip():  # Asegurarse de que el mensaje no esté vacío
-        # Agregar mensaje del usuario al historial
-        st.session_state.messages.append({"role": "user", "content": user_message})
-        
-        # Obtener respuesta del bot
-        selected_lang = "es" if st.session_state.language == "Español" else "en"
-        bot_response = st.session_state.bot.get_response(
-            user_message,
-            language=selected_lang
-        )
-        
-        # Agregar respuesta del bot al historial
-        st.session_state.messages.append({"role": "assistant", "content": bot_response})
+        queue_message(user_message)
         
         # No intentamos limpiar el input aquí, ya que causa un error
         # Streamlit maneja esto automáticamente con clear_on_submit=True
 
+def show_earlier_messages():
+    st.session_state.history_pages += 1
+
 # Guardar el idioma seleccionado en el estado de la sesión
 if "language" not in st.session_state:
     st.session_state.language = "Español" if DEFAULT_LANGUAGE == "es" else "English"
 
-# Configuración del formulario para capturar la entrada del usuario
-with st.form(key="message_form", clear_on_submit=True):
-    # Usar st.session_state para mantener el valor del input
-    st.text_input(
-        "Escribe tu pregunta aquí:",
-        key="user_input"
-    )
-    
-    # Botones del formulario
-    col1, col2 = st.columns([4, 1])
-    with col1:
-        submit_button = st.form_submit_button(label="Enviar", on_click=submit_message)
-    with col2:
-        clear_button = st.form_submit_button(label="Limpiar")
-    
-    # Ya no necesitamos esta lógica, la manejamos con on_click y clear_on_submit
-    # if submit_button:
-    #     submit_message()
-    
-    if clear_button:
-        # No intentamos modificar directamente el valor
-        st.session_state.messages = st.session_state.messages  # Truco para forzar un rerender
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1
+
+# El chat es un fragmento: enviar un mensaje vuelve a ejecutar solo esta parte,
+# no el CSS, la barra lateral ni las preguntas frecuentes
+@st.fragment
+def chat():
+    # Mostrar historial de mensajes: solo las últimas páginas, en un único bloque
+    # con el HTML de cada mensaje cacheado
+    hidden, visible = visible_window(st.session_state.messages, CHAT_PAGE_SIZE, st.session_state.history_pages)
+    if hidden:
+        st.button(f"Mostrar mensajes anteriores ({hidden})", key="earlier_messages",
+                  on_click=show_earlier_messages)
+    if visible:
+        st.markdown(history_html(visible), unsafe_allow_html=True)
+
+    # Respuesta pendiente: se muestra a medida que llegan los fragmentos del bot
+    if st.session_state.get("pending_message"):
+        pending_message, pending_lang = st.session_state.pending_message
+        st.session_state.pending_message = None
+        with st.container():
+            bot_response = st.write_stream(
+                st.session_state.bot.stream_response(pending_message, language=pending_lang)
+            )
+        
+        # Agregar respuesta del bot al historial
+        st.session_state.messages.append({"role": "assistant", "content": bot_response or ""})
+
+    # Configuración del formulario para capturar la entrada del usuario
+    with st.form(key="message_form", clear_on_submit=True):
+        # Usar st.session_state para mantener el valor del input
+        st.text_input(
+            "Escribe tu pregunta aquí:",
+            key="user_input"
+        )
+        
+        # Botones del formulario
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            submit_button = st.form_submit_button(label="Enviar", on_click=submit_message)
+        with col2:
+            clear_button = st.form_submit_button(label="Limpiar")
+        
+        # Ya no necesitamos esta lógica, la manejamos con on_click y clear_on_submit
+        # if submit_button:
+        #     submit_message()
+        
+        if clear_button:
+            # No intentamos modificar directamente el valor
+            st.session_state.messages = st.session_state.messages  # Truco para forzar un rerender
+
+chat()
 
 # Botón para cambiar idioma en la barra lateral
 with st.sidebar:
@@ -243,19 +253,8 @@ with st.expander("Preguntas frecuentes"):
     for i, (question, _) in enumerate(FAQS):
         col_idx = i % 2
         with faq_cols[col_idx]:
-            if st.button(question, key=f"faq_{i}"):
-                # Agregar la pregunta al historial
-                st.session_state.messages.append({"role": "user", "content": question})
-                
-                # Obtener la respuesta del bot
-                selected_lang = "es" if st.session_state.language == "Español" else "en"
-                bot_response = st.session_state.bot.get_response(
-                    question,
-                    language=selected_lang
-                )
-                
-                # Agregar la respuesta al historial
-                st.session_state.messages.append({"role": "assistant", "content": bot_response})
+            # La pregunta se agrega al historial y la respuesta se transmite en la próxima ejecución
+            st.button(question, key=f"faq_{i}", on_click=queue_message, args=(question,))
 
 # Información adicional en la barra lateral
 with st.sidebar:
@@ -270,5 +269,6 @@ with st.sidebar:
     st.divider()
     
     if st.button("Reiniciar conversación"):
-        st.session_state.messages = []
-        st.session_state.welcome_shown = False  # Resetear también el flag de bienvenida
\ No newline at end of file
+        st.session_state.messages = CompactHistory()
+        st.session_state.welcome_shown = False  # Resetear también el flag de bienvenida
+        st.session_state.history_pages = 1
\ No newline at end of file
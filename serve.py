@@ -0,0 +1,80 @@
+"""
+Lanza la API REST (api.py) con varios workers de uvicorn.
+
+Con más de un worker se activa el modo compartido (SERVE_MODE=shared): las
+sesiones y la caché de respuestas del modelo se guardan en archivos SQLite
+en modo WAL dentro de SHARED_STATE_DIR, de modo que cualquier worker puede
+atender cualquier petición de un usuario. Las FAQs se compilan en un índice
+binario (bot/faq_index.py) que todos los workers abren con mmap; para
+actualizarlas basta con recompilarlo y los workers lo recargan solos.
+
+Uso:
+    python serve.py [--host 0.0.0.0] [--port 8000] [--workers N]
+"""
+import argparse
+import os
+from typing import List, Optional
+
+import uvicorn
+
+from config import FAQS_PATH, SERVE_WORKERS, SHARED_STATE_DIR
+
+
+def worker_count(requested: int = 0) -> int:
+    """
+    Calcula el número de workers.
+
+    Args:
+        requested: Workers pedidos (0 = uno por núcleo)
+
+    Returns:
+        Número de workers a lanzar
+    """
+    if requested > 0:
+        return requested
+    return os.cpu_count() or 1
+
+
+def prepare_faq_index(index_path: str, faqs_path: str = FAQS_PATH) -> str:
+    """
+    Compila el índice binario de FAQs si no existe o es más antiguo que las FAQs.
+
+    Args:
+        index_path: Ruta del índice binario
+        faqs_path: Ruta del archivo JSON de FAQs
+
+    Returns:
+        Ruta del índice
+    """
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(faqs_path):
+        from bot.faq_index import build_index
+        build_index(faqs_path, index_path)
+    return index_path
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Servidor de la API de Tix-o-bot")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS,
+                        help="Procesos worker (0 = uno por núcleo)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    workers = worker_count(args.workers)
+    if workers > 1:
+        # Los workers heredan el entorno: todos abren los mismos archivos SQLite
+        os.environ.setdefault("SERVE_MODE", "shared")
+        if os.environ["SERVE_MODE"] != "shared":
+            print(f"Aviso: {workers} workers con SERVE_MODE={os.environ['SERVE_MODE']}; "
+                  "cada worker tendrá sus propias sesiones y cachés.")
+        state_dir = os.environ.get("SHARED_STATE_DIR", SHARED_STATE_DIR)
+        os.makedirs(state_dir, exist_ok=True)
+        if not os.environ.get("FAQ_INDEX_PATH"):
+            os.environ["FAQ_INDEX_PATH"] = prepare_faq_index(os.path.join(state_dir, "faqs.idx"))
+
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
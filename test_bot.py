@@ -1,5 +1,9 @@
 from bot.assistant import TixOBot
-from config import BOT_NAME, BOT_PERSONA, DEFAULT_LANGUAGE
+from config import BOT_NAME, BOT_PERSONA, DEFAULT_LANGUAGE, warn_if_unconfigured
+from utils.logs import configure_logging
+
+configure_logging()
+warn_if_unconfigured()
 
 # Instancia del bot
 bot = TixOBot(name=BOT_NAME, persona=BOT_PERSONA, default_language=DEFAULT_LANGUAGE)
@@ -0,0 +1,21 @@
+import pytest
+
+from utils.helpers import detect_language
+
+
+@pytest.mark.parametrize("text, language", [
+    # Mensajes que no comparten vocabulario con las FAQs
+    ("Mi vuelo se retrasó y no sé qué hacer", "es"),
+    ("Tengo una pregunta sobre el estacionamiento", "es"),
+    ("El concierto empieza tarde", "es"),
+    ("Is parking included with the concert?", "en"),
+    ("My order never arrived, can you check?", "en"),
+    ("The show starts late", "en"),
+])
+def test_detect_language_uses_function_words(text, language):
+    assert detect_language(text) == language
+
+
+def test_detect_language_falls_back_to_default_without_signals():
+    assert detect_language("OK", default="es") == "es"
+    assert detect_language("OK", default="en") == "en"
@@ -0,0 +1,124 @@
+import concurrent.futures
+import time
+
+import pytest
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.scaling import free_port
+from bot.llm_dispatcher import LLMDispatcher
+
+API_KEY = "sk-local-fake-key"
+
+
+def make_request(question: str) -> dict:
+    return {"model": "gpt-3.5-turbo", "messages": [{"role": "user", "content": question}], "max_tokens": 50}
+
+
+@pytest.fixture
+def server():
+    """Servidor simulado de OpenAI con latencia suficiente para agrupar y cancelar."""
+    server = FakeOpenAIServer(latency=0.5, seed=1)
+    server.base_url = server.start(free_port())
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def dispatcher(server):
+    """Despachador apuntado al servidor simulado, sin los reintentos propios del SDK."""
+    from openai import AsyncOpenAI
+
+    dispatcher = LLMDispatcher(
+        client_factory=lambda: AsyncOpenAI(api_key=API_KEY, base_url=server.base_url, max_retries=0),
+        max_retries=2, retry_max_wait=0.5,
+    )
+    yield dispatcher
+    dispatcher.stop()
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_identical_requests_share_one_upstream_call(server, dispatcher):
+    futures = [dispatcher.submit(make_request("¿Cómo compro entradas?")) for _ in range(5)]
+    results = [future.result(timeout=10) for future in futures]
+
+    assert all(result is results[0] for result in results)
+    assert server.responses[200] == 1
+    stats = dispatcher.stats()
+    assert stats["upstream_calls"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["inflight"] == 0
+
+
+def test_coalesce_false_makes_separate_calls(server, dispatcher):
+    futures = [dispatcher.submit(make_request("Hola"), coalesce=False) for _ in range(3)]
+    answers = {future.result(timeout=10).choices[0].message.content for future in futures}
+
+    assert len(answers) == 3
+    assert server.responses[200] == 3
+    assert dispatcher.stats()["coalesced"] == 0
+
+
+def test_cancel_keeps_call_while_other_waiters_remain(server, dispatcher):
+    first = dispatcher.submit(make_request("Perdí mis boletos"))
+    second = dispatcher.submit(make_request("Perdí mis boletos"))
+    assert first is second
+    assert dispatcher._jobs[first].waiters == 2
+
+    dispatcher.cancel(first)
+
+    assert dispatcher._jobs[first].waiters == 1
+    assert not first.cancelled()
+    assert first.result(timeout=10).choices[0].message.content
+    assert server.responses[200] == 1
+
+
+def test_cancel_last_waiter_aborts_upstream_call(server, dispatcher):
+    future = dispatcher.submit(make_request("¿Dónde está mi pedido?"))
+    # Esperar a que la llamada llegue al servidor
+    assert wait_until(lambda: server.connections)
+
+    dispatcher.cancel(future)
+
+    with pytest.raises(concurrent.futures.CancelledError):
+        future.result(timeout=5)
+    assert dispatcher.stats()["inflight"] == 0
+    assert future not in dispatcher._jobs
+    # El servidor ve la conexión cerrada al terminar su latencia
+    assert wait_until(lambda: server.cancelled == 1)
+
+
+def test_retry_after_pauses_dispatcher():
+    from openai import AsyncOpenAI
+
+    server = FakeOpenAIServer(latency=0.01, rpm=600, seed=1)
+    base_url = server.start(free_port())
+    # Sin presupuesto: la primera llamada recibe un 429 con Retry-After de ~0.1 s
+    server._budget = 0.0
+    server._updated = time.monotonic()
+    dispatcher = LLMDispatcher(
+        client_factory=lambda: AsyncOpenAI(api_key=API_KEY, base_url=base_url, max_retries=0),
+        max_retries=2, retry_max_wait=0.01,
+    )
+    try:
+        started = time.monotonic()
+        completion = dispatcher.submit(make_request("Ayuda")).result(timeout=10)
+        elapsed = time.monotonic() - started
+    finally:
+        dispatcher.stop()
+        server.stop()
+
+    assert completion.choices[0].message.content
+    assert server.responses[429] == 1
+    assert server.responses[200] == 1
+    assert dispatcher.stats()["retries"] == 1
+    assert dispatcher._paused_until > started
+    # El reintento esperó lo que indicó el servidor, no solo el backoff (máximo 0.01 s)
+    assert elapsed >= 0.09
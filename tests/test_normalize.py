@@ -0,0 +1,30 @@
+import pytest
+
+from bot.knowledge_base import find_best_faq_match
+from bot.normalize import normalize_text
+
+
+@pytest.mark.parametrize("text, language, expected", [
+    ("who are u", "en", "who are u"),
+    ("hello there", "en", "hello there"),
+    ("¿Quién eres tú?", "es", "quien ere tu"),
+    # Con dos o más palabras con contenido se quitan las vacías
+    ("How can I buy tickets?", "en", "buy ticket"),
+    ("¿Cómo compro entradas?", "es", "compro entr"),
+])
+def test_short_questions_keep_stopwords(text, language, expected):
+    assert normalize_text(text, language) == expected
+
+
+@pytest.mark.parametrize("scorer", ["difflib", "tfidf"])
+def test_short_question_matches_its_faq(scorer):
+    answer, confidence = find_best_faq_match("who are u", "en", scorer)
+    expected, _ = find_best_faq_match("Who are you?", "en", scorer)
+    assert answer == expected
+    assert confidence >= 0.8
+
+
+@pytest.mark.parametrize("scorer", ["difflib", "tfidf"])
+def test_extra_stopwords_do_not_make_an_exact_match(scorer):
+    _, confidence = find_best_faq_match("hello there", "en", scorer)
+    assert confidence < 1.0
@@ -0,0 +1,102 @@
+import smtplib
+import time
+
+import pytest
+
+from utils.notifications import HandoffNotifier
+
+SETTINGS = {"user": "bot@tix.do", "password": "secreto", "to": "soporte@tix.do",
+            "server": "localhost", "port": 587, "use_tls": True}
+
+
+class FakeSMTP:
+    """Conexión SMTP simulada que falla mientras `failing` sea verdadero."""
+
+    def __init__(self):
+        self.failing = True
+        self.sent = []
+
+    def sendmail(self, sender, to, message):
+        if self.failing:
+            raise smtplib.SMTPDataError(451, b"Intente de nuevo")
+        self.sent.append(message)
+
+    def noop(self):
+        return (250,)
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def smtp():
+    return FakeSMTP()
+
+
+@pytest.fixture
+def notifier(tmp_path, smtp):
+    """Notificador sin reintentos inmediatos; el hilo trabajador no llega a enviar."""
+    notifier = HandoffNotifier(str(tmp_path / "handoff.db"), settings=SETTINGS, connect=lambda settings: smtp,
+                               max_attempts=3, retry_backoff=10.0, send_retries=1, batch_window=60.0)
+    yield notifier
+    notifier.stop()
+
+
+def row(notifier, item_id):
+    return notifier._conn.execute(
+        "SELECT attempts, status, next_attempt_at, last_error FROM handoff_notifications WHERE id = ?", (item_id,)
+    ).fetchone()
+
+
+def make_due(notifier):
+    notifier._conn.execute("UPDATE handoff_notifications SET next_attempt_at = 0 WHERE status = 'pending'")
+
+
+def test_failed_send_backs_off_exponentially(notifier):
+    ok, _ = notifier.enqueue("Quiero hablar con una persona", "es", [])
+    assert ok
+
+    before = time.time()
+    assert notifier.process_due() == 1
+    attempts, status, next_attempt_at, last_error = row(notifier, 1)
+    assert (attempts, status) == (1, "pending")
+    assert before + 10.0 <= next_attempt_at <= time.time() + 10.0
+    assert "Intente de nuevo" in last_error
+
+    # Antes de que venza la espera no se vuelve a intentar
+    assert notifier.process_due() == 0
+
+    make_due(notifier)
+    before = time.time()
+    assert notifier.process_due() == 1
+    attempts, status, next_attempt_at, _ = row(notifier, 1)
+    assert (attempts, status) == (2, "pending")
+    assert before + 20.0 <= next_attempt_at <= time.time() + 20.0
+    assert notifier.failures == 2
+
+
+def test_alert_fails_after_max_attempts(notifier):
+    notifier.enqueue("Necesito un agente", "es", [])
+    for _ in range(3):
+        make_due(notifier)
+        assert notifier.process_due() == 1
+
+    attempts, status, _, _ = row(notifier, 1)
+    assert (attempts, status) == (3, "failed")
+    assert notifier.pending() == 0
+    make_due(notifier)
+    assert notifier.process_due() == 0
+
+
+def test_alert_is_sent_once_server_recovers(notifier, smtp):
+    notifier.enqueue("Quiero hablar con una persona", "es", [])
+    notifier.process_due()
+    smtp.failing = False
+
+    make_due(notifier)
+    assert notifier.process_due() == 1
+
+    attempts, status, _, _ = row(notifier, 1)
+    assert (attempts, status) == (1, "sent")
+    assert len(smtp.sent) == 1
+    assert notifier.stats()["sent"] == 1
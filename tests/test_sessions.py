@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from bot.sessions import SessionConflict, SessionManager
+
+
+class FakeBot:
+    """Bot mínimo con el estado de una sesión: la lista de turnos."""
+
+    def __init__(self):
+        self.turns = []
+
+    def to_state(self):
+        return {"turns": self.turns}
+
+    def load_state(self, state):
+        self.turns = list(state.get("turns", []))
+
+
+def make_manager(path):
+    return SessionManager(lambda user_id: FakeBot(), db_path=str(path), shared=True, lease_ttl=0.5)
+
+
+def test_save_rejects_stale_version_in_shared_mode(tmp_path):
+    worker_a = make_manager(tmp_path / "sessions.db")
+    worker_b = make_manager(tmp_path / "sessions.db")
+    bot_a = worker_a.get("ana")
+    bot_b = worker_b.get("ana")
+
+    bot_a.turns.append("a")
+    worker_a.save("ana", bot_a)
+    bot_b.turns.append("b")
+    with pytest.raises(SessionConflict):
+        worker_b.save("ana", bot_b)
+
+    # El turno guardado no se pisa y el otro worker recarga la sesión
+    assert worker_b.get("ana").turns == ["a"]
+
+
+def test_claim_is_exclusive_across_managers(tmp_path):
+    worker_a = make_manager(tmp_path / "sessions.db")
+    worker_b = make_manager(tmp_path / "sessions.db")
+
+    async def run():
+        owner = await worker_a.claim("ana")
+        assert not worker_b.store.claim("ana", "otro", worker_b.lease_ttl)
+        worker_a.release("ana", owner)
+        assert await worker_b.claim("ana")
+
+    asyncio.run(run())
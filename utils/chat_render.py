@@ -0,0 +1,90 @@
+import html
+from functools import lru_cache
+from typing import Mapping, Sequence, Tuple
+
+# Plantillas HTML de cada interfaz; {content} es el texto ya escapado. Van en
+# una sola línea: una línea en blanco cortaría el bloque HTML del Markdown.
+MESSAGE_TEMPLATES = {
+    "main": {
+        "user": (
+            '<div class="message-container" style="justify-content: flex-end;">'
+            '<div class="message-content" style="background-color: #e6f7ff;">{content}</div>'
+            '<div class="user-avatar">👤</div></div>'
+        ),
+        "assistant": (
+            '<div class="message-container"><div class="bot-avatar">🤖</div>'
+            '<div class="message-content">{content}</div></div>'
+        ),
+    },
+    "embed": {
+        "user": (
+            '<div class="message-container" style="justify-content: flex-end;">'
+            '<div class="message-content" style="background-color: #c0c9cd;">{content}</div>'
+            '<div class="user-avatar">👤</div></div>'
+        ),
+        "assistant": (
+            '<div class="message-container" style="justify-content: flex-start;">'
+            '<div class="message-content" style="background-color: #000000;">{content}</div>'
+            '<div class="bot-avatar">🤖</div></div>'
+        ),
+    },
+}
+
+# Mensajes formateados que se conservan (compartidos entre sesiones: las
+# respuestas de FAQs y de palabras clave se repiten mucho)
+RENDER_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def message_html(role: str, content: str, style: str = "main") -> str:
+    """
+    Formatea un mensaje del chat como HTML.
+
+    El texto se escapa (el usuario no puede inyectar HTML) y los saltos de
+    línea pasan a <br>. El resultado se cachea, así que los mensajes ya
+    mostrados no se vuelven a formatear en cada ejecución de Streamlit.
+
+    Args:
+        role: "user" o "assistant"
+        content: Texto del mensaje
+        style: Interfaz cuyas plantillas se usan ("main" o "embed")
+
+    Returns:
+        HTML del mensaje
+    """
+    templates = MESSAGE_TEMPLATES[style]
+    template = templates["user"] if role == "user" else templates["assistant"]
+    return template.format(content=html.escape(content).replace("\n", "<br>"))
+
+
+def history_html(messages: Sequence[Mapping[str, str]], style: str = "main") -> str:
+    """
+    Une el HTML de varios mensajes para mostrarlos con un único st.markdown.
+
+    Args:
+        messages: Mensajes con "role" y "content"
+        style: Interfaz cuyas plantillas se usan
+
+    Returns:
+        HTML de todos los mensajes
+    """
+    return "".join(message_html(message["role"], message["content"], style) for message in messages)
+
+
+def visible_window(messages: Sequence[Mapping[str, str]], page_size: int,
+                   pages: int = 1) -> Tuple[int, Sequence[Mapping[str, str]]]:
+    """
+    Devuelve los últimos mensajes del historial que caben en las páginas mostradas.
+
+    Args:
+        messages: Historial completo (lista o CompactHistory)
+        page_size: Mensajes por página (0 = todos)
+        pages: Páginas mostradas, contando desde el final
+
+    Returns:
+        Tupla (mensajes ocultos al principio, mensajes visibles)
+    """
+    if page_size <= 0:
+        return 0, messages[:]
+    start = max(0, len(messages) - page_size * max(1, pages))
+    return start, messages[start:]
@@ -0,0 +1,440 @@
+import argparse
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_LOG_RECORDS = REGISTRY.counter(
+    "tixobot_conversation_log_records_total", "Mensajes escritos en el registro de conversaciones"
+)
+CONVERSATION_LOG_ROTATIONS = REGISTRY.counter(
+    "tixobot_conversation_log_rotations_total", "Segmentos rotados del registro de conversaciones"
+)
+CONVERSATION_LOG_ERRORS = REGISTRY.counter(
+    "tixobot_conversation_log_errors_total", "Errores de escritura del registro de conversaciones"
+)
+
+# Segmentos rotados: <ruta>.<AAAAMMDDTHHMMSS>.<microsegundos>-<pid>[.gz], en UTC; el orden
+# alfabético es el cronológico
+_SEGMENT_TIME_FORMAT = "%Y%m%dT%H%M%S"
+
+
+class _Marker:
+    """Orden para el hilo escritor (flush o rotación) con un evento de respuesta."""
+
+    def __init__(self, action: str):
+        self.action = action
+        self.done = threading.Event()
+
+
+class ConversationLog:
+    """
+    Registro de conversaciones en JSONL, solo de anexado.
+
+    append() solo pone el mensaje en una cola en memoria; un hilo en segundo
+    plano lo serializa, escribe por lotes, vuelca el búfer cada
+    flush_interval segundos y hace fsync cada fsync_interval. Cuando el
+    archivo supera max_bytes o max_age segundos se rota: se renombra con la
+    fecha y se comprime con gzip, y la escritura sigue en un archivo nuevo.
+    El costo de cada mensaje no depende del largo de la conversación ni del
+    tamaño del registro.
+
+    Uso:
+        log = ConversationLog("data/conversations.jsonl")
+        log.append({"conversation_id": "u1", "role": "user", "content": "Hola"})
+        for record in read_log("data/conversations.jsonl"):
+            ...
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, fsync_interval: float = 5.0,
+                 max_bytes: int = 64 * 1024 * 1024, max_age: float = 24 * 3600.0, compress: bool = True,
+                 max_queue: int = 100000):
+        """
+        Inicializa el registro (el hilo se inicia con el primer mensaje).
+
+        Args:
+            path: Ruta del archivo activo
+            flush_interval: Segundos máximos que un mensaje queda en el búfer
+            fsync_interval: Segundos entre fsync (0 = fsync en cada volcado)
+            max_bytes: Tamaño a partir del cual se rota (0 = sin límite)
+            max_age: Segundos a partir de los cuales se rota (0 = sin límite)
+            compress: Si los segmentos rotados se comprimen con gzip
+            max_queue: Mensajes en cola antes de que append() espere al hilo
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self._queue: "queue.Queue[Any]" = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._dirty = False
+        self._flushed_at = 0.0
+        self._synced_at = 0.0
+        self.records = 0
+        self.bytes_written = 0
+        self.rotations = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        """Inicia el hilo escritor si no está corriendo."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+                self._thread.start()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Encola un mensaje para escribirlo (no espera al disco).
+
+        Args:
+            record: Diccionario serializable en JSON; si no trae "ts" se agrega la hora actual
+        """
+        if "ts" not in record:
+            record = {"ts": round(time.time(), 3), **record}
+        if self._thread is None:
+            self.start()
+        self._queue.put(record)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que todo lo encolado hasta ahora esté escrito y sincronizado en disco.
+
+        Args:
+            timeout: Segundos máximos de espera (None = sin límite)
+
+        Returns:
+            True si se completó a tiempo
+        """
+        return self._command("flush", timeout)
+
+    def rotate(self, timeout: Optional[float] = None) -> bool:
+        """
+        Rota el archivo activo aunque no haya llegado a los límites.
+
+        Args:
+            timeout: Segundos máximos de espera (None = sin límite)
+
+        Returns:
+            True si se completó a tiempo
+        """
+        return self._command("rotate", timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Escribe lo pendiente, sincroniza y detiene el hilo.
+
+        Args:
+            timeout: Segundos máximos de espera
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self._command("stop", timeout)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _command(self, action: str, timeout: Optional[float]) -> bool:
+        if self._thread is None or not self._thread.is_alive():
+            if action == "stop":
+                return True
+            self.start()
+        marker = _Marker(action)
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    # Hilo escritor
+
+    def _run(self) -> None:
+        while True:
+            timeout = self.flush_interval if self._dirty else None
+            try:
+                items = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                self._sync(force_fsync=False)
+                continue
+            # Vaciar lo que haya en cola para escribirlo en un solo lote
+            while len(items) < 1000:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines: List[bytes] = []
+            for item in items:
+                if not isinstance(item, _Marker):
+                    lines.append(self._encode(item))
+                    continue
+                self._write(lines)
+                lines = []
+                if item.action == "rotate":
+                    self._rotate()
+                else:
+                    self._sync(force_fsync=True)
+                item.done.set()
+                if item.action == "stop":
+                    self._close_file()
+                    return
+            self._write(lines)
+            if time.monotonic() - self._flushed_at >= self.flush_interval:
+                # Con escrituras continuas la cola nunca se vacía: volcar por tiempo
+                self._sync(force_fsync=False)
+            if self._file is not None and (
+                (self.max_bytes and self._size >= self.max_bytes)
+                or (self.max_age and time.time() - self._opened_at >= self.max_age)
+            ):
+                self._rotate()
+
+    def _encode(self, record: Dict[str, Any]) -> bytes:
+        return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+    def _open(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._opened_at = time.time()
+        self._flushed_at = self._synced_at = time.monotonic()
+
+    def _write(self, lines: List[bytes]) -> None:
+        if not lines:
+            return
+        try:
+            if self._file is None:
+                self._open()
+            data = b"".join(lines)
+            self._file.write(data)
+            self._size += len(data)
+            self._dirty = True
+            self.records += len(lines)
+            self.bytes_written += len(data)
+            CONVERSATION_LOG_RECORDS.inc(len(lines))
+        except OSError as e:
+            self.errors += 1
+            CONVERSATION_LOG_ERRORS.inc()
+            logger.warning("No se pudo escribir el registro de conversaciones: %s", e)
+
+    def _sync(self, force_fsync: bool) -> None:
+        """Vuelca el búfer y hace fsync si toca (o si se pide)."""
+        if self._file is None or not self._dirty:
+            return
+        try:
+            self._file.flush()
+            self._flushed_at = time.monotonic()
+            if force_fsync or time.monotonic() - self._synced_at >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._synced_at = time.monotonic()
+                self._dirty = False
+        except OSError as e:
+            self.errors += 1
+            CONVERSATION_LOG_ERRORS.inc()
+            logger.warning("No se pudo sincronizar el registro de conversaciones: %s", e)
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._sync(force_fsync=True)
+            self._file.close()
+            self._file = None
+
+    def _rotate(self) -> None:
+        if self._file is None:
+            return
+        empty = self._size == 0
+        self._close_file()
+        if empty:
+            return
+        now = time.time()
+        stamp = f"{time.strftime(_SEGMENT_TIME_FORMAT, time.gmtime(now))}.{int(now * 1e6) % 1000000:06d}"
+        segment = f"{self.path}.{stamp}-{os.getpid()}"
+        try:
+            os.replace(self.path, segment)
+            self.rotations += 1
+            CONVERSATION_LOG_ROTATIONS.inc()
+            if self.compress:
+                compress_segment(segment)
+        except OSError as e:
+            self.errors += 1
+            CONVERSATION_LOG_ERRORS.inc()
+            logger.warning("No se pudo rotar el registro de conversaciones: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve los contadores del registro.
+
+        Returns:
+            Diccionario con mensajes y bytes escritos, rotaciones, errores y mensajes en cola
+        """
+        return {
+            "records": self.records,
+            "bytes": self.bytes_written,
+            "rotations": self.rotations,
+            "errors": self.errors,
+            "queued": self._queue.qsize(),
+        }
+
+
+def compress_segment(segment: str) -> str:
+    """
+    Comprime un segmento rotado con gzip y borra el original.
+
+    El .gz se escribe con otro nombre y se renombra al terminar, así que un
+    lector nunca ve un archivo comprimido a medias.
+
+    Args:
+        segment: Ruta del segmento sin comprimir
+
+    Returns:
+        Ruta del segmento comprimido
+    """
+    target = segment + ".gz"
+    tmp_path = f"{target}.tmp-{os.getpid()}"
+    with open(segment, "rb") as source, gzip.open(tmp_path, "wb", compresslevel=6) as output:
+        shutil.copyfileobj(source, output, 1024 * 1024)
+    os.replace(tmp_path, target)
+    os.remove(segment)
+    return target
+
+
+def log_segments(path: str) -> List[str]:
+    """
+    Lista los archivos de un registro en orden cronológico: segmentos rotados y archivo activo.
+
+    Args:
+        path: Ruta del archivo activo
+
+    Returns:
+        Rutas existentes, de la más antigua a la más reciente
+    """
+    segments: Dict[str, str] = {}
+    for candidate in glob.glob(glob.escape(path) + ".*"):
+        if ".tmp-" in candidate:
+            continue
+        base = candidate[:-3] if candidate.endswith(".gz") else candidate
+        # Si quedó el original junto al .gz (corte durante la compresión), vale el .gz
+        if base not in segments or candidate.endswith(".gz"):
+            segments[base] = candidate
+    files = [segments[base] for base in sorted(segments)]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_log(path: str, include_rotated: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre los mensajes de un registro sin cargarlo entero en memoria.
+
+    Acepta el archivo activo de un ConversationLog (con sus segmentos
+    rotados), un segmento suelto (.gz o no) o cualquier transcripción JSONL.
+    Las líneas incompletas o inválidas (por ejemplo, la última si el proceso
+    se cortó a mitad de escritura) se omiten.
+
+    Args:
+        path: Ruta del registro
+        include_rotated: Si se recorren también los segmentos rotados
+
+    Yields:
+        Cada mensaje como diccionario
+    """
+    files = log_segments(path) if include_rotated else [path]
+    for file_path in files:
+        opener = gzip.open if file_path.endswith(".gz") else open
+        try:
+            with opener(file_path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            # Un segmento que se comprimió mientras se listaba
+            if not file_path.endswith(".gz") and os.path.exists(file_path + ".gz"):
+                yield from read_log(file_path + ".gz", include_rotated=False)
+
+
+def summarize(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Calcula estadísticas de uso recorriendo los mensajes una sola vez.
+
+    Args:
+        records: Mensajes (por ejemplo, de read_log)
+
+    Returns:
+        Diccionario con mensajes, conversaciones, mensajes por rol e idioma y rango de fechas
+    """
+    roles: Counter = Counter()
+    languages: Counter = Counter()
+    conversations = set()
+    first = last = None
+    count = 0
+    for record in records:
+        count += 1
+        roles[record.get("role", "")] += 1
+        if record.get("role") == "user":
+            languages[record.get("language", "")] += 1
+        conversations.add(record.get("conversation_id"))
+        ts = record.get("ts")
+        if ts is not None:
+            first = ts if first is None else min(first, ts)
+            last = ts if last is None else max(last, ts)
+    return {
+        "messages": count,
+        "conversations": len(conversations),
+        "messages_per_conversation": round(count / len(conversations), 2) if conversations else 0.0,
+        "by_role": dict(roles),
+        "user_messages_by_language": dict(languages),
+        "first_ts": first,
+        "last_ts": last,
+    }
+
+
+_open_logs: List[ConversationLog] = []
+
+
+def open_log(path: str, **kwargs: Any) -> ConversationLog:
+    """
+    Crea un registro que se cierra (escribiendo lo pendiente) al salir del proceso.
+
+    Args:
+        path: Ruta del archivo activo; "{pid}" se reemplaza por el PID del proceso
+        **kwargs: Opciones de ConversationLog
+
+    Returns:
+        Registro de conversaciones
+    """
+    log = ConversationLog(path.replace("{pid}", str(os.getpid())), **kwargs)
+    if not _open_logs:
+        atexit.register(_close_logs)
+    _open_logs.append(log)
+    return log
+
+
+def _close_logs() -> None:
+    for log in _open_logs:
+        log.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estadísticas de registros de conversaciones")
+    parser.add_argument("paths", nargs="+", help="Archivos activos de los registros (uno por worker)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    records = (record for path in args.paths for record in read_log(path))
+    print(json.dumps(summarize(records), ensure_ascii=False, indent=2))
+    print(f"({time.perf_counter() - started:.2f} s)")
@@ -1,42 +1,70 @@
 import re
 import os
-import json
 import time
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import Dict, List, Any, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Any, Optional
 
+if TYPE_CHECKING:
+    # smtplib y email se importan al enviar el primer correo
+    import smtplib
+    from email.mime.multipart import MIMEMultipart
 
-def detect_language(text: str) -> str:
+
+# Palabras funcionales de cada idioma (artículos, preposiciones, conjunciones,
+# pronombres, interrogativos, auxiliares y saludos), precompiladas para
+# búsquedas O(1). Son independientes del tema, así que sirven igual para las
+# FAQs que para cualquier mensaje. Se omiten las que existen en ambos idiomas
+# ("a", "no", "me", "he", "has"...).
+SPANISH_WORDS = frozenset("""
+    el la los las lo un una unos unas al del ante bajo con contra de desde durante en entre hacia hasta
+    mediante para por según sin sobre tras y o pero sino porque aunque que qué si ni pues como cómo
+    cuando cuándo donde dónde quien quién quienes quiénes cual cuál cuales cuáles cuanto cuánto cuanta
+    cuánta cuantos cuántos cuantas cuántas yo tú tu él ella ellos ellas nosotros nosotras usted ustedes
+    te se nos os le les mí ti mi mis tus su sus nuestro nuestra nuestros nuestras este esta estos estas
+    esto ese esa eso esos esas aquel aquella algo nada alguien nadie todo todos toda todas otro otra
+    es son era fue ser estar está están estoy estás soy eres hay han hemos había tengo tiene tienen
+    puedo puede pueden podría quiero quiere quisiera necesito debo voy va vamos hace hacer
+    sí ya muy más menos también tampoco aquí ahí allí ahora hoy mañana ayer siempre nunca bien mal mucho poco
+    hola gracias adiós favor buenas buenos días
+""".split())
+ENGLISH_WORDS = frozenset("""
+    the an of to in on at for with from by about into over after before between through without under
+    and or but if because so than then i you she it we they him her us them my your his its our their
+    mine yours this that these those what which who whom whose where when why how there here
+    is are was were be been being am do does did done have had will would shall should can could may
+    might must not isn aren doesn didn won cannot get got want need know like go make
+    hello hi hey thanks thank please yes bye u ur pls thx
+""".split())
+# Caracteres que solo aparecen en español
+_SPANISH_CHARS = frozenset("ñáéíóúü¿¡")
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def detect_language(text: str, default: str = "en") -> str:
     """
     Detecta si el texto está en español o inglés.
     
+    Cuenta las palabras funcionales de cada idioma (más una señal si aparece
+    un carácter propio del español) y gana el idioma con más coincidencias.
+    
     Args:
         text: Texto a analizar
+        default: Idioma a devolver si no hay señales o hay empate
         
     Returns:
         Código de idioma ("es" o "en")
     """
-    # Palabras comunes en español
-    spanish_words = ["el", "la", "los", "las", "un", "una", "unos", "unas", "y", "o", "pero",
-                     "porque", "que", "como", "cuando", "donde", "quien", "cual", "este", "esta",
-                    "estos", "estas", "ese", "esa", "esos", "esas", "mi", "tu", "su", "nuestro",
-                    "vuestro", "por", "para", "con", "sin", "sobre", "bajo", "ante", "contra",
-                    "entre", "según", "durante", "mediante", "excepto", "salvo", "incluso", 
-                    "gracias", "hola", "qué", "cómo", "cuándo", "dónde", "porqué", "quién", "cuál"]
-    
-    # Convertir a minúsculas y separar palabras
-    words = re.findall(r'\b\w+\b', text.lower())
-    
-    # Contar palabras en español
-    spanish_count = sum(1 for word in words if word in spanish_words)
-    
-    # Si más del 15% de las palabras son comunes en español, asumimos que es español
-    if len(words) > 0 and spanish_count / len(words) >= 0.15:
+    text = text.lower()
+    words = _WORD_PATTERN.findall(text)
+    spanish_count = sum(1 for word in words if word in SPANISH_WORDS)
+    english_count = sum(1 for word in words if word in ENGLISH_WORDS)
+    if not _SPANISH_CHARS.isdisjoint(text):
+        spanish_count += 1
+    
+    if spanish_count > english_count:
         return "es"
-    else:
+    if english_count > spanish_count:
         return "en"
+    return default
 
 
 def format_time(timestamp: Optional[float] = None) -> str:
@@ -56,71 +84,42 @@ def format_time(timestamp: Optional[float] = None) -> str:
     return time.strftime("%d/%m/%Y %H:%M:%S", time_struct)
 
 
-def save_conversation_log(conversation: List[Dict[str, Any]], filename: str) -> None:
-    """
-    Guarda una conversación en un archivo JSON.
-    
-    Args:
-        conversation: Lista de mensajes
-        filename: Nombre del archivo donde guardar
-    """
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(conversation, f, ensure_ascii=False, indent=2)
-
-
-def load_conversation_log(filename: str) -> List[Dict[str, Any]]:
+def get_email_settings() -> Dict[str, Any]:
     """
-    Carga una conversación desde un archivo JSON.
+    Lee la configuración del correo de soporte desde variables de entorno.
     
-    Args:
-        filename: Nombre del archivo a cargar
-        
     Returns:
-        Lista de mensajes de la conversación
+        Diccionario con host, port, user, password, to y use_tls
     """
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+    return {
+        "host": os.getenv("EMAIL_HOST", "smtp.gmail.com"),
+        "port": int(os.getenv("EMAIL_PORT", "587")),
+        "user": os.getenv("EMAIL_USER", "notificaciones@tixbot.com"),
+        "password": os.getenv("EMAIL_PASS", ""),
+        "to": os.getenv("EMAIL_TO", "info@tix.do"),
+        "use_tls": os.getenv("EMAIL_USE_TLS", "true").lower() in ("1", "true", "yes"),
+    }
 
 
-def send_handoff_email(user_message: str, language: str, conversation_history: List[Dict[str, str]], user_id: str = "Anónimo") -> Tuple[bool, str]:
+def build_handoff_body(user_message: str, language: str, conversation_history: List[Dict[str, str]], user_id: str = "Anónimo", current_time: Optional[str] = None) -> str:
     """
-    Envía un correo electrónico al soporte cuando un usuario solicita hablar con un humano.
+    Construye el texto de la alerta de solicitud de atención humana.
     
     Args:
         user_message: El mensaje del usuario que solicitó hablar con un humano
         language: El idioma detectado del usuario ("es" o "en")
         conversation_history: El historial de conversación reciente
         user_id: Identificador del usuario (si está disponible)
+        current_time: Fecha y hora de la solicitud (usa la hora actual si es None)
         
     Returns:
-        Tuple[bool, str]: (Éxito del envío, Mensaje de estado)
+        Cuerpo del correo
     """
-    try:
-        # Obtener configuración del correo desde variables de entorno
-        email_host = os.getenv("EMAIL_HOST", "smtp.gmail.com")
-        email_port = int(os.getenv("EMAIL_PORT", "587"))
-        email_user = os.getenv("EMAIL_USER", "notificaciones@tixbot.com")
-        email_password = os.getenv("EMAIL_PASS", "")
-        email_to = os.getenv("EMAIL_TO", "info@tix.do")
-        
-        # Si no hay contraseña configurada, no podemos enviar el correo
-        if not email_password:
-            return False, "No se ha configurado EMAIL_PASS en las variables de entorno"
-            
-        # Crear el mensaje
-        msg = MIMEMultipart()
-        msg['From'] = email_user
-        msg['To'] = email_to
-        msg['Subject'] = "Usuario solicitó asistencia humana"
-        
-        # Incluir la fecha y hora actual
-        current_time = format_time()
-        
-        # Construir el cuerpo del mensaje
-        body = f"""
+    # Incluir la fecha y hora actual
+    current_time = current_time or format_time()
+    
+    # Construir el cuerpo del mensaje
+    body = f"""
         ¡Alerta de solicitud de atención humana!
         
         Fecha y hora: {current_time}
@@ -130,34 +129,80 @@ def send_handoff_email(user_message: str, language: str, conversation_history: L
         
         --- Historial de conversación reciente ---
         """
+    
+    # Añadir las últimas 5 interacciones (o menos si no hay tantas)
+    recent_history = conversation_history[-min(5, len(conversation_history)):]
+    for i, entry in enumerate(recent_history):
+        role = "Usuario" if entry["role"] == "user" else "Bot"
+        body += f"\n{i+1}. {role}: {entry['content']}"
+    
+    return body
+
+
+def build_email(subject: str, body: str, settings: Dict[str, Any]) -> "MIMEMultipart":
+    """
+    Crea el mensaje de correo para el soporte.
+    
+    Args:
+        subject: Asunto
+        body: Cuerpo en texto plano
+        settings: Configuración de get_email_settings
         
-        # Añadir las últimas 5 interacciones (o menos si no hay tantas)
-        recent_history = conversation_history[-min(5, len(conversation_history)):]
-        for i, entry in enumerate(recent_history):
-            role = "Usuario" if entry["role"] == "user" else "Bot"
-            body += f"\n{i+1}. {role}: {entry['content']}"
-            
-        body += """
+    Returns:
+        Mensaje listo para enviar
+    """
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    
+    msg = MIMEMultipart()
+    msg['From'] = settings["user"]
+    msg['To'] = settings["to"]
+    msg['Subject'] = subject
+    
+    body += """
         
         Por favor, contacte al usuario lo antes posible.
         
         --
         Enviado automáticamente por Tix-o-bot
         """
+    
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+def open_smtp_connection(settings: Dict[str, Any]) -> "smtplib.SMTP":
+    """
+    Abre una conexión SMTP autenticada.
+    
+    Con use_tls (el valor por defecto) el servidor debe anunciar STARTTLS: si
+    no lo hace, no se envían las credenciales en texto plano. Solo con
+    use_tls=False (el servidor SMTP local de prueba) STARTTLS y el login son
+    opcionales y se usan si el servidor los anuncia.
+    
+    Args:
+        settings: Configuración de get_email_settings
         
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Conectar al servidor SMTP y enviar
-        server = smtplib.SMTP(email_host, email_port)
-        server.starttls()
-        server.login(email_user, email_password)
-        text = msg.as_string()
-        server.sendmail(email_user, email_to, text)
-        server.quit()
-        
-        success_msg = f"Correo enviado exitosamente a {email_to}"
-        return True, success_msg
-        
-    except Exception as e:
-        error_msg = f"Error al enviar correo de handoff: {str(e)}"
-        return False, error_msg
\ No newline at end of file
+    Returns:
+        Conexión abierta
+
+    Raises:
+        smtplib.SMTPNotSupportedError: Si use_tls es True y el servidor no anuncia STARTTLS
+    """
+    import smtplib
+    
+    server = smtplib.SMTP(settings["host"], settings["port"], timeout=30)
+    try:
+        server.ehlo()
+        if settings.get("use_tls", True):
+            if not server.has_extn("starttls"):
+                raise smtplib.SMTPNotSupportedError("El servidor SMTP no anuncia STARTTLS")
+            server.starttls()
+            server.ehlo()
+            server.login(settings["user"], settings["password"])
+        elif server.has_extn("auth"):
+            server.login(settings["user"], settings["password"])
+    except Exception:
+        server.close()
+        raise
+    return server
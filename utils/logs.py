@@ -0,0 +1,202 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, TextIO
+
+from utils.metrics import REGISTRY
+
+LOG_DROPPED = REGISTRY.counter(
+    "tixobot_log_dropped_total", "Registros de log descartados por cola llena"
+)
+
+# Atributos propios de logging.LogRecord; el resto son campos de extra={...}
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatea cada registro como una línea JSON.
+
+    Incluye la hora (UTC, ISO 8601), el nivel, el logger, el mensaje, el PID
+    y los campos pasados con extra= (por ejemplo session_id, stage y
+    latency_ms).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo: hora, nivel, logger, mensaje y campos extra."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = {key: value for key, value in vars(record).items()
+                  if key not in _RECORD_ATTRIBUTES and not key.startswith("_")}
+        if extras:
+            line += " " + " ".join(f"{key}={value}" for key, value in extras.items())
+        return line
+
+
+class DebugSampler(logging.Filter):
+    """Deja pasar solo una fracción de los registros DEBUG; los demás niveles pasan siempre."""
+
+    def __init__(self, rate: float = 1.0):
+        """
+        Args:
+            rate: Fracción de registros DEBUG que se conservan (entre 0 y 1)
+        """
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no bloquea: si la cola está llena descarta el registro.
+
+    El mensaje y la traza de la excepción se resuelven en el hilo que
+    registra (los argumentos pueden cambiar después); el formato JSON y la
+    escritura los hace el hilo del QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.Handler] = None
+_configure_lock = threading.Lock()
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """
+    Interpreta los niveles por módulo.
+
+    Args:
+        spec: Texto como "bot.assistant=DEBUG,utils.notifications=INFO"
+
+    Returns:
+        Diccionario logger -> nivel
+    """
+    levels: Dict[str, int] = {}
+    for item in spec.split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def configure_logging(level: Optional[str] = None, module_levels: Optional[str] = None,
+                      fmt: Optional[str] = None, debug_sample_rate: Optional[float] = None,
+                      path: Optional[str] = None, stream: Optional[TextIO] = None,
+                      queue_size: Optional[int] = None, force: bool = False) -> logging.Handler:
+    """
+    Instala el logging del proceso: QueueHandler en el logger raíz y un
+    QueueListener que formatea y escribe en segundo plano.
+
+    Emitir un log solo encola el registro, así que nunca bloquea la
+    petición en curso por la escritura en stderr o en disco. Es idempotente:
+    las llamadas siguientes no cambian nada salvo con force=True. Los
+    valores no indicados se leen de config.py (LOG_*).
+
+    Args:
+        level: Nivel global ("DEBUG", "INFO", "WARNING"...)
+        module_levels: Niveles por módulo ("bot.assistant=DEBUG,utils=INFO")
+        fmt: "json" o "text"
+        debug_sample_rate: Fracción de registros DEBUG que se conservan
+        path: Archivo de salida (vacío = stderr)
+        stream: Flujo de salida (tiene prioridad sobre path)
+        queue_size: Registros en cola antes de empezar a descartar
+        force: Reinstalar aunque ya esté configurado
+
+    Returns:
+        Handler instalado en el logger raíz
+    """
+    global _listener, _handler
+    from config import LOG_DEBUG_SAMPLE_RATE, LOG_FORMAT, LOG_LEVEL, LOG_LEVELS, LOG_PATH, LOG_QUEUE_SIZE
+
+    with _configure_lock:
+        if _handler is not None and not force:
+            return _handler
+        shutdown_logging()
+
+        path = LOG_PATH if path is None else path
+        if stream is not None:
+            output: logging.Handler = logging.StreamHandler(stream)
+        elif path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            output = logging.FileHandler(path.replace("{pid}", str(os.getpid())), encoding="utf-8")
+        else:
+            output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter() if (fmt or LOG_FORMAT) == "json" else TextFormatter())
+
+        handler = _QueueHandler(queue.Queue(queue_size or LOG_QUEUE_SIZE))
+        handler.addFilter(DebugSampler(LOG_DEBUG_SAMPLE_RATE if debug_sample_rate is None else debug_sample_rate))
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(logging.getLevelName((level or LOG_LEVEL).upper()))
+        for name, module_level in parse_levels(LOG_LEVELS if module_levels is None else module_levels).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        _handler = handler
+        return handler
+
+
+def shutdown_logging() -> None:
+    """Escribe los registros pendientes y detiene el hilo del QueueListener."""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+    if _listener is not None:
+        _listener.stop()
+        for output in _listener.handlers:
+            output.close()
+    _listener = None
+    _handler = None
+
+
+atexit.register(shutdown_logging)
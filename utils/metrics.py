@@ -0,0 +1,301 @@
+import abc
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Límites (en segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    """Base común de las métricas: nombre, ayuda y etiquetas."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """Líneas de muestras en el formato de texto de Prometheus."""
+
+
+class Counter(_Metric):
+    """Contador que solo aumenta."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Incrementa el contador.
+
+        Args:
+            amount: Cantidad a sumar
+            **labels: Valores de las etiquetas
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Devuelve el valor actual para las etiquetas dadas."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        """Devuelve una copia de los valores por combinación de etiquetas."""
+        with self._lock:
+            return dict(self._values)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja, o que se calcula al exportar con una función."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels: str) -> None:
+        """
+        Fija el valor.
+
+        Args:
+            value: Valor nuevo
+            **labels: Valores de las etiquetas
+        """
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {_format_value(self._function())}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Histograma con límites fijos; observar un valor es una búsqueda binaria."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiquetas: [conteos por intervalo (+Inf al final), suma, total]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Registra una observación.
+
+        Args:
+            value: Valor observado
+            **labels: Valores de las etiquetas
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Mide la duración de un bloque en segundos.
+
+        Args:
+            **labels: Valores de las etiquetas
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels: str) -> Tuple[List[int], float, int]:
+        """
+        Devuelve una copia de los conteos por intervalo, la suma y el total.
+
+        Args:
+            **labels: Valores de las etiquetas
+
+        Returns:
+            Tuple (conteos no acumulados, suma, total)
+        """
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return [0] * (len(self.buckets) + 1), 0.0, 0
+            return list(state[0]), state[1], state[2]
+
+    def quantile(self, q: float, **labels: str) -> float:
+        """
+        Estima un percentil a partir de los intervalos (interpolación lineal).
+
+        Args:
+            q: Percentil entre 0 y 1
+            **labels: Valores de las etiquetas
+
+        Returns:
+            Valor estimado (0.0 si no hay observaciones)
+        """
+        counts, _, total = self.snapshot(**labels)
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for index, count in enumerate(counts):
+            upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+            if cumulative + count >= rank and count:
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        return self.buckets[-1]
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        lines = []
+        for key, counts, total_sum, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {total}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas exportadas en el formato de texto de Prometheus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """
+        Registra una métrica (si ya existe una con el mismo nombre, la devuelve).
+
+        Args:
+            metric: Métrica a registrar
+
+        Returns:
+            Métrica registrada
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        Exporta todas las métricas.
+
+        Returns:
+            Texto en el formato de exposición de Prometheus
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registro global del proceso
+REGISTRY = Registry()
+
+
+def timed(histogram: Histogram, **labels: str) -> Callable:
+    """
+    Decorador que mide la duración de una función (síncrona o asíncrona).
+
+    Args:
+        histogram: Histograma donde registrar la duración
+        **labels: Valores de las etiquetas
+
+    Returns:
+        Decorador
+    """
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with histogram.time(**labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
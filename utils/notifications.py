@@ -0,0 +1,383 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from utils.helpers import build_email, build_handoff_body, format_time, get_email_settings, open_smtp_connection
+from utils.metrics import REGISTRY
+
+if TYPE_CHECKING:
+    # smtplib y tenacity se importan en el hilo trabajador, no al arrancar
+    import smtplib
+
+HANDOFF_NOTIFICATIONS = REGISTRY.counter(
+    "tixobot_handoff_notifications_total", "Alertas de handoff procesadas por resultado", ["result"]
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """
+    Conexión SMTP reutilizable entre envíos.
+
+    La conexión se abre (con STARTTLS y login) una sola vez y se comprueba con
+    NOOP si estuvo inactiva; si falla se vuelve a abrir.
+    """
+
+    def __init__(self, settings: Dict[str, Any],
+                 connect: Callable[[Dict[str, Any]], "smtplib.SMTP"] = open_smtp_connection,
+                 idle_check: float = 60.0):
+        """
+        Inicializa el pool.
+
+        Args:
+            settings: Configuración de get_email_settings
+            connect: Función que abre una conexión nueva
+            idle_check: Segundos de inactividad tras los que se verifica la conexión
+        """
+        self.settings = settings
+        self.connect = connect
+        self.idle_check = idle_check
+        self._server: Optional["smtplib.SMTP"] = None
+        self._last_used = 0.0
+        self.connections_opened = 0
+
+    def _connection(self) -> "smtplib.SMTP":
+        import smtplib
+        
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_check:
+            try:
+                if self._server.noop()[0] != 250:
+                    self.reset()
+            except (smtplib.SMTPException, OSError):
+                self.reset()
+        if self._server is None:
+            self._server = self.connect(self.settings)
+            self.connections_opened += 1
+        return self._server
+
+    def send(self, msg) -> None:
+        """
+        Envía un mensaje por la conexión compartida.
+
+        Args:
+            msg: Mensaje de correo
+        """
+        import smtplib
+        
+        server = self._connection()
+        try:
+            server.sendmail(self.settings["user"], self.settings["to"], msg.as_string())
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self.reset()
+            raise
+        self._last_used = time.monotonic()
+
+    def reset(self) -> None:
+        """Descarta la conexión actual."""
+        import smtplib
+        
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        self._server = None
+
+
+class HandoffNotifier:
+    """
+    Cola persistente de notificaciones de handoff atendida en segundo plano.
+
+    Encolar solo inserta una fila en SQLite, así que la respuesta al usuario
+    no espera al servidor de correo. Un hilo trabajador envía las alertas por
+    una conexión SMTP reutilizada, reintenta con espera exponencial (tenacity)
+    y, si hay muchas alertas pendientes a la vez, las agrupa en un resumen.
+    Las alertas no enviadas se conservan en la base y se reanudan al reiniciar.
+
+    Varios workers pueden compartir la misma base: cada uno reclama las
+    alertas que va a enviar (estado 'sending') en una sola transacción, así
+    que ninguna alerta sale dos veces. Si un worker muere con alertas
+    reclamadas, estas vuelven a 'pending' cuando vence su reclamo
+    (claim_timeout).
+    """
+
+    def __init__(self, db_path: str, settings: Optional[Dict[str, Any]] = None,
+                 connect: Callable[[Dict[str, Any]], "smtplib.SMTP"] = open_smtp_connection,
+                 digest_threshold: int = 5, batch_window: float = 1.0, max_attempts: int = 5,
+                 retry_backoff: float = 30.0, send_retries: int = 3, claim_timeout: float = 300.0,
+                 sent_retention: float = 7 * 86400.0):
+        """
+        Inicializa el notificador (el hilo se inicia con start()).
+
+        Args:
+            db_path: Ruta de la base SQLite de la cola
+            settings: Configuración del correo (por defecto get_email_settings())
+            connect: Función que abre una conexión SMTP
+            digest_threshold: Alertas pendientes a partir de las cuales se envía un resumen
+            batch_window: Segundos que se esperan para agrupar alertas cercanas
+            max_attempts: Intentos máximos de cada alerta antes de marcarla como fallida
+            retry_backoff: Segundos base de espera entre intentos de una alerta
+            send_retries: Reintentos inmediatos (con tenacity) de cada envío
+            claim_timeout: Segundos tras los que una alerta reclamada y no
+                resuelta (worker caído) vuelve a estar pendiente
+            sent_retention: Segundos que se conservan las alertas ya enviadas
+        """
+        self.settings = settings or get_email_settings()
+        self.pool = SMTPConnectionPool(self.settings, connect)
+        self.digest_threshold = digest_threshold
+        self.batch_window = batch_window
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.send_retries = send_retries
+        self.claim_timeout = claim_timeout
+        self.sent_retention = sent_retention
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS handoff_notifications ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, payload TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', last_error TEXT)"
+        )
+        self.sent = 0
+        self.digests = 0
+        self.failures = 0
+
+    def enqueue(self, user_message: str, language: str, conversation_history: List[Dict[str, str]],
+                user_id: str = "Anónimo") -> Tuple[bool, str]:
+        """
+        Encola una alerta de handoff sin esperar al servidor de correo.
+
+        Args:
+            user_message: El mensaje del usuario que solicitó hablar con un humano
+            language: El idioma detectado del usuario ("es" o "en")
+            conversation_history: El historial de conversación reciente
+            user_id: Identificador del usuario (si está disponible)
+
+        Returns:
+            Tuple[bool, str]: (Éxito al encolar, Mensaje de estado)
+        """
+        # Si no hay contraseña configurada, no podemos enviar el correo
+        if not self.settings["password"]:
+            return False, "No se ha configurado EMAIL_PASS en las variables de entorno"
+
+        payload = {
+            "user_message": user_message,
+            "language": language,
+            "conversation_history": [dict(entry) for entry in conversation_history[-5:]],
+            "user_id": user_id,
+            "time": format_time(),
+        }
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO handoff_notifications (created_at, payload, next_attempt_at) VALUES (?, ?, ?)",
+                (now, json.dumps(payload, ensure_ascii=False), now),
+            )
+        self.start()
+        self._wakeup.set()
+        return True, f"Notificación de handoff en cola para {self.settings['to']}"
+
+    def start(self) -> None:
+        """Inicia el hilo trabajador si no está corriendo."""
+        if self._thread is None or not self._thread.is_alive():
+            self._release_stale()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="handoff-notifier", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Detiene el hilo trabajador (las alertas pendientes quedan en la cola).
+
+        Args:
+            timeout: Segundos máximos de espera
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.pool.reset()
+
+    def pending(self) -> int:
+        """
+        Cuenta las alertas pendientes de envío.
+
+        Returns:
+            Número de alertas pendientes
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM handoff_notifications WHERE status = 'pending'"
+            ).fetchone()[0]
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(timeout=self.retry_backoff)
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                break
+            # Esperar un poco para agrupar alertas que llegan juntas
+            self._stopping.wait(self.batch_window)
+            try:
+                while self.process_due() and not self._stopping.is_set():
+                    pass
+            except Exception as e:
+                logger.exception("Error inesperado en el notificador de handoff: %s", e)
+
+    def _release_stale(self) -> int:
+        """
+        Devuelve a la cola las alertas reclamadas cuyo reclamo venció.
+
+        Returns:
+            Número de alertas liberadas
+        """
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE handoff_notifications SET status = 'pending' "
+                "WHERE status = 'sending' AND next_attempt_at <= ?", (time.time(),)
+            ).rowcount
+
+    def _due(self, limit: int = 100) -> List[Tuple[int, Dict[str, Any], int]]:
+        """
+        Reclama las alertas pendientes cuyo turno ya llegó.
+
+        La selección y el cambio a 'sending' ocurren en una sola sentencia, de
+        modo que otro worker con la misma base no puede reclamar las mismas
+        filas. El reclamo vence tras claim_timeout segundos.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "UPDATE handoff_notifications SET status = 'sending', next_attempt_at = ? "
+                "WHERE id IN (SELECT id FROM handoff_notifications "
+                "WHERE (status = 'pending' OR status = 'sending') AND next_attempt_at <= ? ORDER BY id LIMIT ?) "
+                "RETURNING id, payload, attempts",
+                (now + self.claim_timeout, now, limit),
+            ).fetchall()
+        return sorted((row[0], json.loads(row[1]), row[2]) for row in rows)
+
+    @staticmethod
+    def _body(payload: Dict[str, Any]) -> str:
+        return build_handoff_body(
+            payload["user_message"], payload["language"], payload["conversation_history"],
+            payload["user_id"], payload["time"]
+        )
+
+    def _send_with_retry(self, msg) -> None:
+        import smtplib
+        from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+        
+        for attempt in Retrying(
+            stop=stop_after_attempt(self.send_retries),
+            wait=wait_random_exponential(multiplier=0.5, max=10),
+            retry=retry_if_exception_type((smtplib.SMTPException, OSError)),
+            reraise=True,
+        ):
+            with attempt:
+                self.pool.send(msg)
+
+    def purge_sent(self) -> int:
+        """
+        Elimina las alertas enviadas hace más de sent_retention segundos.
+
+        Returns:
+            Número de alertas eliminadas
+        """
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM handoff_notifications WHERE status = 'sent' AND created_at < ?",
+                (time.time() - self.sent_retention,)
+            ).rowcount
+
+    def process_due(self) -> int:
+        """
+        Envía las alertas pendientes cuyo turno ya llegó y descarta las
+        enviadas que superaron el período de retención.
+
+        Returns:
+            Número de alertas procesadas
+        """
+        self.purge_sent()
+        due = self._due()
+        if not due:
+            return 0
+
+        if len(due) >= self.digest_threshold:
+            # Pico de solicitudes: un solo correo con todas las alertas
+            subject = f"Resumen: {len(due)} usuarios solicitaron asistencia humana"
+            body = "\n\n".join(
+                f"--- Solicitud {i + 1} de {len(due)} ---" + self._body(payload)
+                for i, (_, payload, _) in enumerate(due)
+            )
+            batches = [(due, build_email(subject, body, self.settings))]
+        else:
+            batches = [
+                ([item], build_email("Usuario solicitó asistencia humana", self._body(item[1]), self.settings))
+                for item in due
+            ]
+
+        for items, msg in batches:
+            ids = [item[0] for item in items]
+            try:
+                self._send_with_retry(msg)
+            except Exception as e:
+                self._mark_failed(items, str(e))
+                continue
+            self._mark_sent(ids)
+            if len(items) > 1:
+                self.digests += 1
+        return len(due)
+
+    def _mark_sent(self, ids: List[int]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE handoff_notifications SET status = 'sent' WHERE id = ?", [(i,) for i in ids]
+            )
+        self.sent += len(ids)
+        HANDOFF_NOTIFICATIONS.inc(len(ids), result="sent")
+
+    def _mark_failed(self, items: List[Tuple[int, Dict[str, Any], int]], error: str) -> None:
+        logger.warning("Error al enviar correo de handoff: %s", error,
+                       extra={"stage": "handoff", "notifications": len(items)})
+        now = time.time()
+        updates = []
+        for item_id, _, attempts in items:
+            attempts += 1
+            status = "failed" if attempts >= self.max_attempts else "pending"
+            next_attempt = now + self.retry_backoff * (2 ** (attempts - 1))
+            updates.append((attempts, status, next_attempt, error, item_id))
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE handoff_notifications SET attempts = ?, status = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE id = ?", updates
+            )
+        self.failures += len(items)
+        HANDOFF_NOTIFICATIONS.inc(len(items), result="failed")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve los contadores del notificador.
+
+        Returns:
+            Diccionario con enviados, resúmenes, fallos, pendientes y conexiones abiertas
+        """
+        return {
+            "pending": self.pending(),
+            "sent": self.sent,
+            "digests": self.digests,
+            "failures": self.failures,
+            "smtp_connections_opened": self.pool.connections_opened,
+        }
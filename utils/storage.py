@@ -0,0 +1,336 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+
+class LRUTTLCache:
+    """
+    Caché en memoria con desalojo LRU y expiración por tiempo (TTL).
+
+    Lleva contadores de aciertos, fallos, desalojos y expiraciones. Es segura
+    para usarse desde varios hilos.
+    """
+
+    def __init__(self, max_items: int = 1000, ttl: Optional[float] = None,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_items: Número máximo de elementos
+            ttl: Segundos de vida de cada elemento desde su último uso (None = sin expiración)
+            on_evict: Función llamada con (clave, valor) al desalojar un elemento por capacidad
+        """
+        self.max_items = max_items
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._items: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._items.get(key)
+            return item is not None and not self._is_expired(item[1])
+
+    def _is_expired(self, touched_at: float) -> bool:
+        return self.ttl is not None and time.monotonic() - touched_at > self.ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Obtiene un elemento y lo marca como usado recientemente.
+
+        Args:
+            key: Clave del elemento
+            default: Valor devuelto si no existe o expiró
+
+        Returns:
+            Valor almacenado o default
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            if self._is_expired(item[1]):
+                del self._items[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._items[key] = (item[0], time.monotonic())
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Guarda un elemento, desalojando el menos usado si se supera la capacidad.
+
+        Args:
+            key: Clave del elemento
+            value: Valor a guardar
+        """
+        evicted = []
+        with self._lock:
+            self._items[key] = (value, time.monotonic())
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                evicted.append(self._items.popitem(last=False))
+                self.evictions += 1
+        if self.on_evict:
+            for old_key, (old_value, _) in evicted:
+                self.on_evict(old_key, old_value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Elimina un elemento.
+
+        Args:
+            key: Clave del elemento
+            default: Valor devuelto si no existe
+
+        Returns:
+            Valor eliminado o default
+        """
+        with self._lock:
+            item = self._items.pop(key, None)
+        return default if item is None else item[0]
+
+    def purge_expired(self) -> int:
+        """
+        Elimina los elementos expirados.
+
+        Returns:
+            Número de elementos eliminados
+        """
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            expired = [key for key, (_, touched_at) in self._items.items() if self._is_expired(touched_at)]
+            for key in expired:
+                del self._items[key]
+            self.expirations += len(expired)
+        return len(expired)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Itera sobre una copia de los pares (clave, valor) no expirados."""
+        with self._lock:
+            snapshot = [(key, value) for key, (value, touched_at) in self._items.items()
+                        if not self._is_expired(touched_at)]
+        return iter(snapshot)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Devuelve los contadores de la caché.
+
+        Returns:
+            Diccionario con tamaño, aciertos, fallos, desalojos y expiraciones
+        """
+        return {
+            "size": len(self._items),
+            "max_items": self.max_items,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SQLiteStore:
+    """
+    Almacén clave-valor persistente sobre SQLite (modo WAL).
+
+    Los valores se guardan como JSON junto con la hora de actualización, de
+    modo que los datos sobreviven a reinicios del proceso. En modo WAL varios
+    procesos pueden abrir el mismo archivo: las lecturas no se bloquean y las
+    escrituras esperan hasta `timeout` segundos a que se libere el archivo.
+    """
+
+    def __init__(self, path: str, table: str = "kv", timeout: float = 5.0):
+        """
+        Abre (o crea) el almacén.
+
+        Args:
+            path: Ruta del archivo SQLite
+            table: Nombre de la tabla
+            timeout: Segundos de espera si otro proceso está escribiendo
+        """
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        # Reclamos entre procesos (ver claim)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table}_claims ("
+            "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Any:
+        """
+        Obtiene un valor.
+
+        Args:
+            key: Clave
+            max_age: Antigüedad máxima en segundos (None = sin límite)
+
+        Returns:
+            Valor deserializado, o None si no existe o es demasiado antiguo
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, updated_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        if max_age is not None and time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[0])
+
+    def updated_at(self, key: str) -> Optional[float]:
+        """
+        Devuelve la hora de la última escritura de una clave sin leer el valor.
+
+        Args:
+            key: Clave
+
+        Returns:
+            Segundos desde la época, o None si la clave no existe
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT updated_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: Any) -> float:
+        """
+        Guarda un valor.
+
+        Args:
+            key: Clave
+            value: Valor serializable a JSON
+
+        Returns:
+            Hora de actualización registrada
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+        updated_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, updated_at) VALUES (?, ?, ?)",
+                (key, payload, updated_at),
+            )
+        return updated_at
+
+    def compare_and_set(self, key: str, value: Any, expected: Optional[float]) -> Optional[float]:
+        """
+        Guarda un valor solo si nadie lo escribió desde la versión leída.
+
+        Args:
+            key: Clave
+            value: Valor serializable a JSON
+            expected: Hora de actualización leída (None si la clave no existía)
+
+        Returns:
+            Nueva hora de actualización, o None si otro proceso escribió antes
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+        # La versión nueva siempre es mayor que la leída, aunque el reloj no haya avanzado
+        updated_at = max(time.time(), (expected or 0.0) + 1e-6)
+        with self._lock:
+            if expected is None:
+                cursor = self._conn.execute(
+                    f"INSERT INTO {self.table} (key, value, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO NOTHING", (key, payload, updated_at),
+                )
+            else:
+                cursor = self._conn.execute(
+                    f"UPDATE {self.table} SET value = ?, updated_at = ? WHERE key = ? AND updated_at = ?",
+                    (payload, updated_at, key, expected),
+                )
+        return updated_at if cursor.rowcount == 1 else None
+
+    def claim(self, key: str, owner: str, ttl: float) -> bool:
+        """
+        Reclama una clave para un solo dueño entre todos los procesos.
+
+        El reclamo vence a los ttl segundos, de modo que un proceso caído no
+        bloquea la clave para siempre.
+
+        Args:
+            key: Clave
+            owner: Identificador único del dueño
+            ttl: Segundos de validez del reclamo
+
+        Returns:
+            True si se obtuvo el reclamo, False si otro dueño lo tiene vigente
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                f"INSERT INTO {self.table}_claims (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE expires_at < ?", (key, owner, now + ttl, now),
+            )
+        return cursor.rowcount == 1
+
+    def release(self, key: str, owner: str) -> None:
+        """
+        Libera un reclamo obtenido con claim (si sigue siendo del mismo dueño).
+
+        Args:
+            key: Clave
+            owner: Identificador usado al reclamar
+        """
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}_claims WHERE key = ? AND owner = ?", (key, owner))
+
+    def delete(self, key: str) -> None:
+        """
+        Elimina un valor.
+
+        Args:
+            key: Clave
+        """
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def purge_older_than(self, max_age: float) -> int:
+        """
+        Elimina los valores con más de max_age segundos sin actualizarse.
+
+        Args:
+            max_age: Antigüedad máxima en segundos
+
+        Returns:
+            Número de filas eliminadas
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE updated_at < ?", (time.time() - max_age,)
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        """Cierra la conexión."""
+        with self._lock:
+            self._conn.close()